@@ -1,18 +1,59 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 import os
+from app.db.pool_metrics import PoolMetrics, measured_pool_class
+from app.db.query_timing import instrument_engine
+from app.settings import (DB_ECHO, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE,
+                          DB_POOL_TIMEOUT, DB_STATEMENT_CACHE_SIZE, REQUEST_METRICS_ENABLED)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# 読み取り用レプリカ(任意)。テストでは両方を同じPostgresに向けてもよい
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
 
 # DATABASE_URLがNoneの場合のデフォルト値を設定
 if DATABASE_URL is None:
     raise ValueError("DATABASE_URL environment variable is not set")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+
+# エンジン(接続プール)を作る。設定値は環境変数(app/settings.py)から
+def create_db_engine(url: str, metrics: PoolMetrics, *,
+                     echo: bool = DB_ECHO,
+                     pool_size: int = DB_POOL_SIZE,
+                     max_overflow: int = DB_MAX_OVERFLOW,
+                     pool_timeout: float = DB_POOL_TIMEOUT,
+                     pool_recycle: int = DB_POOL_RECYCLE,
+                     pool_pre_ping: bool = DB_POOL_PRE_PING,
+                     statement_cache_size: int = DB_STATEMENT_CACHE_SIZE) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=echo,
+        poolclass=measured_pool_class(metrics),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        connect_args={"statement_cache_size": statement_cache_size},
+    )
+    # リクエストごとのSQLの回数・時間を数える(app/db/query_timing.py)
+    if REQUEST_METRICS_ENABLED:
+        instrument_engine(engine.sync_engine)
+    return engine
+
+
+pool_metrics = PoolMetrics()
+engine = create_db_engine(DATABASE_URL, pool_metrics)
 AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+# レプリカのエンジンとセッション。レプリカがなければNone
+replica_pool_metrics = PoolMetrics()
+replica_engine = create_db_engine(DATABASE_REPLICA_URL, replica_pool_metrics) if DATABASE_REPLICA_URL else None
+ReplicaSessionLocal = (
+    async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False) if replica_engine is not None else None
+)
+
 # さまざまなユースケースから使われるDBのセッション開始と自動終了部分の共通化パーツとなる関数
 async def get_db():
     async with AsyncSessionLocal() as session:
         #↑ 非同期コンテキストマネージャーにより、セッションを開始し、終了時に自動的にクローズします（例外が出ても確実に __aexit__() が呼ばれる）
         yield session
-        # ↑yield sessionはFastAPI の Depends() によって依存注入されるオブジェクトとして session を返します
\ No newline at end of file
+        # ↑yield sessionはFastAPI の Depends() によって依存注入されるオブジェクトとして session を返します
@@ -0,0 +1,81 @@
+# DB接続プールの計測
+# app/db/pool_metrics.py
+# 接続プールから接続を取り出すのにかかった時間(空きを待った時間)と、新しい接続を作るのにかかった時間を数える
+# 使用中の接続数などのその時点の値は、stats()を呼んだときにプールから読む
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+from app.db.query_timing import record_pool_wait
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_wait_seconds = 0.0
+        self.checkout_wait_max_seconds = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.connect_seconds = 0.0
+        self.connect_max_seconds = 0.0
+
+    def record_checkout(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.checkout_wait_seconds += seconds
+        self.checkout_wait_max_seconds = max(self.checkout_wait_max_seconds, seconds)
+
+    def record_connect(self, seconds: float) -> None:
+        self.connects += 1
+        self.connect_seconds += seconds
+        self.connect_max_seconds = max(self.connect_max_seconds, seconds)
+
+    def stats(self, pool: Pool) -> dict[str, int | float]:
+        stats: dict[str, int | float] = {
+            "checkouts": self.checkouts,
+            "checkout_wait_avg_ms": _avg_ms(self.checkout_wait_seconds, self.checkouts),
+            "checkout_wait_max_ms": self.checkout_wait_max_seconds * 1000,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "connect_avg_ms": _avg_ms(self.connect_seconds, self.connects),
+            "connect_max_ms": self.connect_max_seconds * 1000,
+        }
+        # QueuePoolなら、その時点の接続数も返す
+        if hasattr(pool, "checkedout"):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return stats
+
+
+def measured_pool_class(metrics: PoolMetrics) -> type[AsyncAdaptedQueuePool]:
+    # 計測つきの接続プールのクラスを作る
+    # (engine.dispose()ではプールが同じクラスで作り直されるので、metricsはインスタンスではなくクラスに持たせる)
+    class MeasuredAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            # プールに空きがなく、新しい接続も作れないときは、ここで空くのを待つ
+            # (新しい接続を作ったときは、その時間も含む)
+            started = time.perf_counter()
+            try:
+                record = super()._do_get()
+            except exc.TimeoutError:
+                metrics.timeouts += 1
+                raise
+            waited = time.perf_counter() - started
+            metrics.record_checkout(waited)
+            # リクエストごとの計測にも足す(Server-Timingのpool)
+            record_pool_wait(waited)
+            return record
+
+        def _create_connection(self):
+            started = time.perf_counter()
+            record = super()._create_connection()
+            metrics.record_connect(time.perf_counter() - started)
+            return record
+
+    return MeasuredAsyncAdaptedQueuePool
+
+
+def _avg_ms(total_seconds: float, count: int) -> float:
+    return total_seconds / count * 1000 if count else 0.0
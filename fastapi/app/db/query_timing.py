@@ -0,0 +1,70 @@
+# リクエストごとのDBの計測
+# app/db/query_timing.py
+# 1つのリクエストで実行したSQLの回数・DBの時間(SQLを送ってから結果を受け取るまで)・接続プールから接続を取り出すのにかかった時間を数える
+# 計測中のリクエストはcontextvarで持つ(app/routers/request_metrics.pyのミドルウェアがリクエストの最初にセットする)
+# SQLAlchemyの同期部分はgreenletで動くが、greenletにはリクエストのcontextが引き継がれるので、イベントの中からも同じRequestTimingが見える
+# リクエストの外(起動時のカタログ読み込み、キャッシュ無効化のLISTENなど)で実行したSQLは数えない
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_START_ATTR = "_query_timing_started"
+
+
+class RequestTiming:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+    def record_query(self, seconds: float) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+
+
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def start_request_timing() -> tuple[RequestTiming, object]:
+    # リクエストの最初に呼ぶ。戻り値のtokenはend_request_timingに渡す
+    timing = RequestTiming()
+    return timing, _current.set(timing)
+
+
+def end_request_timing(token) -> None:
+    _current.reset(token)
+
+
+def current_timing() -> RequestTiming | None:
+    return _current.get()
+
+
+def record_pool_wait(seconds: float) -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.pool_wait_seconds += seconds
+
+
+def instrument_engine(engine: Engine) -> None:
+    # SQLを実行するたびに時間を測る(AsyncEngineならsync_engineを渡す)
+    # 開始時刻はそのSQLの実行コンテキストに持たせる(SQLが失敗してafterが呼ばれなくても、接続に残らない)
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            setattr(context, _START_ATTR, time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        timing = _current.get()
+        started = getattr(context, _START_ATTR, None)
+        if timing is not None and started is not None:
+            timing.record_query(time.perf_counter() - started)
+
+
+def record_asyncpg_query(record) -> None:
+    # asyncpgの接続のquery logger(REPOSITORY_BACKEND=asyncpgのとき)
+    # 呼ばれるのはSQLの完了後のイベントループの次の1周だが、contextはSQLを実行したリクエストのものになる
+    timing = _current.get()
+    if timing is not None:
+        timing.record_query(record.elapsed)
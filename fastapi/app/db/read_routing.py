@@ -0,0 +1,80 @@
+# 読み取りをレプリカに振り分ける
+# app/db/read_routing.py
+# GETのルートはget_read_dbのセッションで読む。レプリカがあり、そのクライアントが最近書き込んでいなければレプリカ、そうでなければプライマリ
+# 書き込みのルート(get_uow)は、commitできたらその時刻を覚えておき、ReadYourWritesMiddlewareが2xxの応答にlast_write_atのCookieとX-Last-Write-Atヘッダをつける
+# (時刻はcommitの後に取るので、commitに時間がかかってもREPLICA_STICKY_SECONDSが短くならない。書き込みに失敗した応答にはつけない)
+# クライアントがそれを送り返してくる間(REPLICA_STICKY_SECONDS)は、自分の書き込みが確実に見えるようプライマリから読む
+import time
+from fastapi import Depends, Request, Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.db.database import AsyncSessionLocal, ReplicaSessionLocal
+from app.settings import REPLICA_STICKY_SECONDS
+
+LAST_WRITE_COOKIE = "last_write_at"
+LAST_WRITE_HEADER = "X-Last-Write-At"
+
+
+def mark_write(request: Request) -> None:
+    # 書き込みをcommitできたときに呼ぶ(UnitOfWorkのafter_commit)。レプリカがなければ何もしない
+    if ReplicaSessionLocal is None:
+        return
+    request.state.last_write_at = time.time()
+
+
+def write_marker_headers(last_write_at: float) -> list[tuple[str, str]]:
+    # 応答につけるCookieとヘッダ
+    value = f"{last_write_at:.3f}"
+    marker = Response()
+    marker.set_cookie(LAST_WRITE_COOKIE, value, max_age=int(REPLICA_STICKY_SECONDS) + 1, httponly=True, samesite="lax")
+    return [("set-cookie", marker.headers["set-cookie"]), (LAST_WRITE_HEADER, value)]
+
+
+class ReadYourWritesMiddleware:
+    # レスポンスのヘッダはget_uowのcommitより前に作られるので、送る直前にミドルウェアでつける
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_marker(message: Message) -> None:
+            if message["type"] == "http.response.start" and 200 <= message["status"] < 300:
+                last_write_at = scope.get("state", {}).get("last_write_at")
+                if last_write_at is not None:
+                    headers = MutableHeaders(scope=message)
+                    for name, value in write_marker_headers(last_write_at):
+                        headers.append(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_marker)
+
+
+def is_sticky(request: Request, now: float | None = None) -> bool:
+    # 最近(REPLICA_STICKY_SECONDS以内に)書き込んだクライアントか
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    if value is None:
+        return False
+    try:
+        last_write_at = float(value)
+    except ValueError:
+        return False
+    return (now if now is not None else time.time()) - last_write_at < REPLICA_STICKY_SECONDS
+
+
+# ルータのDIチェーンで使う。このリクエストの読み取りをレプリカで行うか
+def use_replica(request: Request) -> bool:
+    return ReplicaSessionLocal is not None and not is_sticky(request)
+
+
+def get_read_session_factory(replica: bool = Depends(use_replica)) -> async_sessionmaker[AsyncSession]:
+    return ReplicaSessionLocal if replica else AsyncSessionLocal
+
+
+# 読み取り専用のルートでget_db/get_uowの代わりに使う(commitはしない)
+async def get_read_db(session_factory: async_sessionmaker[AsyncSession] = Depends(get_read_session_factory)):
+    async with session_factory() as session:
+        yield session
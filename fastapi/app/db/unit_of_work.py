@@ -0,0 +1,103 @@
+# DBのトランザクションをリクエスト単位でまとめる(Unit of Work)
+# app/db/unit_of_work.py
+# リポジトリはflushまでしかしないので、1つのリクエストで複数のリポジトリに書き込んでも、commitは最後の1回だけになる
+# 途中で例外(HTTPExceptionを含む)が起きたら、そのリクエストの書き込みはすべてロールバックする
+# commitできたときだけ反映したいこと(メモリ内のカテゴリカタログの更新など)は、after_commitで予約しておく
+from collections.abc import Callable
+from functools import partial
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db.database import get_db
+from app.db.read_routing import mark_write
+
+_FLUSHES_KEY = "flush_count"
+_COMMITS_KEY = "commit_count"
+
+
+@event.listens_for(Session, "after_flush")
+def _count_flush(session: Session, flush_context) -> None:
+    session.info[_FLUSHES_KEY] = session.info.get(_FLUSHES_KEY, 0) + 1
+
+
+@event.listens_for(Session, "after_commit")
+def _count_commit(session: Session) -> None:
+    session.info[_COMMITS_KEY] = session.info.get(_COMMITS_KEY, 0) + 1
+
+
+class UnitOfWork:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._after_commit: list[Callable[[], None]] = []
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        # commitが成功したら呼ぶ(ロールバックしたら呼ばない)
+        self._after_commit.append(callback)
+
+    async def commit(self) -> None:
+        # 何も実行していなければ(トランザクションが始まっていなければ)commitしない
+        if self.session.in_transaction():
+            await self.session.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    async def rollback(self) -> None:
+        self._after_commit.clear()
+        await self.session.rollback()
+
+    # このセッションでのflush・commitの回数(リポジトリが自分でcommitした分も数える)
+    @property
+    def flushes(self) -> int:
+        return self.session.sync_session.info.get(_FLUSHES_KEY, 0)
+
+    @property
+    def commits(self) -> int:
+        return self.session.sync_session.info.get(_COMMITS_KEY, 0)
+
+
+class UnitOfWorkMetrics:
+    # リクエストごとのflush・commitの回数の合計(/internal/db/uowで見る)
+    def __init__(self):
+        self.requests = 0
+        self.commits = 0
+        self.flushes = 0
+        self.rollbacks = 0
+
+    def record(self, uow: UnitOfWork, rolled_back: bool) -> None:
+        self.requests += 1
+        self.commits += uow.commits
+        self.flushes += uow.flushes
+        self.rollbacks += int(rolled_back)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "requests": self.requests,
+            "commits": self.commits,
+            "flushes": self.flushes,
+            "rollbacks": self.rollbacks,
+            "commits_per_request": self.commits / self.requests if self.requests else 0.0,
+            "flushes_per_request": self.flushes / self.requests if self.requests else 0.0,
+        }
+
+
+uow_metrics = UnitOfWorkMetrics()
+
+
+# ルータのDIチェーンでget_dbの代わりに使う。エンドポイントが正常に終わったらcommit、例外ならロールバック
+# commitできたら、しばらくはプライマリから読むようクライアントに印をつける(read_routing)
+async def get_uow(request: Request, db: AsyncSession = Depends(get_db)):
+    uow = UnitOfWork(db)
+    uow.after_commit(partial(mark_write, request))
+    rolled_back = False
+    try:
+        yield uow
+    except Exception:
+        rolled_back = True
+        await uow.rollback()
+        raise
+    else:
+        await uow.commit()
+    finally:
+        uow_metrics.record(uow, rolled_back)
@@ -1,6 +1,8 @@
 # ①ドメイン層 (旧形式ではmodelsディレクトリ内に似ているが違う。ここは業務ルールが入る)
 # app/domain/category/category.py
 class Category:
-    def __init__(self, category_id: int, name: str):
+    def __init__(self, category_id: int, name: str, version: int = 1):
         self.id = category_id
         self.name = name
+        # 更新のたびに+1される(同じIDでもversionが違えば別の内容)
+        self.version = version
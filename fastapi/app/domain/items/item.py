@@ -1,7 +1,9 @@
 # ①ドメイン層 (旧形式ではmodelsディレクトリ内に似ているが違う。ここは業務ルールが入る)
 # app/domain/items/item.py
 class Item:
-    def __init__(self, item_id: int, name: str, category_ids: list[int] | None = None):
+    def __init__(self, item_id: int, name: str, category_ids: list[int] | None = None, version: int = 1):
         self.id = item_id
         self.name = name
         self.category_ids = category_ids
+        # 更新のたびに+1される(同じIDでもversionが違えば別の内容)
+        self.version = version
@@ -1,15 +1,32 @@
 # Items domain value objects
 # app/domain/items/value_objects.py
+import unicodedata
 
 class ItemName:
     """アイテム名の値オブジェクト"""
     
     def __init__(self, value: str):
-        if not value or len(value.strip()) == 0:
+        # 空・長さの検証は、保存する形(正規化した後)で行う(NFKCで「㍿」が「株式会社」になるなど、正規化で長くなることがある)
+        normalized = ItemName.normalize(value) if value else ""
+        if not normalized:
             raise ValueError("アイテム名は空にできません")
-        if len(value) > 200:
+        if len(normalized) > 200:
             raise ValueError("アイテム名は200文字以内である必要があります")
-        self._value = value.strip()
+        self._value = normalized
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        # 保存するときの形。全角英数・半角カナなどの表記ゆれをNFKCでそろえ、前後の空白を取る
+        return unicodedata.normalize("NFKC", value).strip()
+
+    @staticmethod
+    def search_key(value: str) -> str:
+        # 検索するときの形。保存した名前と同じ正規化をして小文字にする
+        # (DBのインデックスはlower(item_name)に張っているので、検索語も同じ形にしないとインデックスが使われない)
+        key = ItemName.normalize(value).lower()
+        if not key:
+            raise ValueError("検索語は空にできません")
+        return key
     
     @property
     def value(self) -> str:
@@ -15,8 +15,33 @@ class ItemUpdateNameDTO(BaseModel):
     # ItemのNameだけを更新する際に使う
     item_name: str
 
+class ItemPatchDTO(BaseModel):
+    # 一部更新(PATCH)で使う。送らなかった項目は変えない(category_idsをnullにすると、すべてのカテゴリを外す)
+    item_name: str | None = None
+    category_ids: List[int] | None = None
+
 class ItemReadDTO(ItemBase):
     item_id: int
     model_config = ConfigDict(from_attributes=True)
     # class Config:
-    #     from_attributes = True
\ No newline at end of file
+    #     from_attributes = True
+
+# 更新(PUT /items/{item_id})の結果
+# 存在しないため紐づけなかったカテゴリIDをrejected_category_idsで返す
+class ItemUpdateResultDTO(ItemReadDTO):
+    rejected_category_ids: List[int] = []
+
+# 一括作成(POST /items/bulk)の結果
+# 1行ごとに検証して、問題のない行だけを作成し、問題のあった行は何番目(index)の行がなぜダメだったかを返す
+class ItemBulkErrorDTO(BaseModel):
+    index: int
+    detail: str
+
+class ItemBulkCreateResultDTO(BaseModel):
+    created: List[ItemReadDTO]
+    errors: List[ItemBulkErrorDTO]
+
+# 一括削除(DELETE /items/?ids=)の結果
+class ItemBulkDeleteResultDTO(BaseModel):
+    deleted: List[int]
+    not_found: List[int]
@@ -0,0 +1,7 @@
+# infrastructure/asyncpg/__init__.py
+from .pool import AsyncpgPools
+from .repositories.category_repo_impl import AsyncpgCategoryRepository
+from .repositories.item_repo_impl import AsyncpgItemRepository
+from .unit_of_work import AsyncpgUnitOfWork
+
+__all__ = ["AsyncpgCategoryRepository", "AsyncpgItemRepository", "AsyncpgPools", "AsyncpgUnitOfWork"]
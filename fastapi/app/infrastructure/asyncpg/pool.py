@@ -0,0 +1,123 @@
+# ④Infrastructure層 = asyncpgの接続プール
+# app/infrastructure/asyncpg/pool.py
+# REPOSITORY_BACKEND=asyncpgのときに使う。SQLAlchemyのエンジンとは別に、asyncpgのプールを直接持つ
+# asyncpgの接続は作成したイベントループでしか使えないので、プールはアプリ(app.state.pg_pools)・イベントループごとに、最初に使うときに作る
+# 接続ごとに、実行したSQLのプリペアドステートメントをDB_STATEMENT_CACHE_SIZE個まで覚えておくので、
+# リポジトリのSQLは(パラメータ以外は)毎回同じ文字列にしておくと、2回目からは解析・計画の分が省ける
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+import asyncpg
+from sqlalchemy.engine import make_url
+from app.db.query_timing import record_asyncpg_query, record_pool_wait
+from app.settings import DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_STATEMENT_CACHE_SIZE, REQUEST_METRICS_ENABLED
+
+# リポジトリに渡す「接続を返す関数」
+ConnectionGetter = Callable[[], Awaitable[asyncpg.Connection]]
+
+
+def to_asyncpg_dsn(url: str) -> str:
+    # DATABASE_URL(postgresql+asyncpg://...)を、asyncpgが受け付ける形(postgresql://...)にする
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+async def create_pg_pool(url: str) -> asyncpg.Pool:
+    # 接続の数はSQLAlchemyのエンジンと同じ設定値に合わせる(常に持つ数ではなく上限として使い、接続は必要になったときに作る)
+    return await asyncpg.create_pool(
+        to_asyncpg_dsn(url),
+        min_size=0,
+        max_size=DB_POOL_SIZE + DB_MAX_OVERFLOW,
+        max_inactive_connection_lifetime=max(DB_POOL_RECYCLE, 0),
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        init=_init_connection,
+    )
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # 新しく作った接続ごとに呼ばれる。リクエストごとのSQLの回数・時間を数える(app/db/query_timing.py)
+    if REQUEST_METRICS_ENABLED:
+        conn.add_query_logger(record_asyncpg_query)
+
+
+class AsyncpgPools:
+    # プライマリと(あれば)レプリカのプール
+    def __init__(self, url: str, replica_url: str | None = None):
+        self.url = url
+        self.replica_url = replica_url
+        # "primary"/"replica" → 作成中・作成済みのプール
+        self._pools: dict[str, asyncio.Future[asyncpg.Pool]] = {}
+
+    async def pool(self, replica: bool = False) -> asyncpg.Pool:
+        # 同時に来たリクエストが別々にプールを作らないよう、作成中のものを共有する(作成に失敗したら次に使うときに作り直す)
+        # 別のイベントループで作ったプールは使えないので作り直す(テストではTestClientごとにイベントループが変わる)
+        name = "replica" if replica and self.replica_url else "primary"
+        future = self._pools.get(name)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = self._pools[name] = asyncio.ensure_future(create_pg_pool(self.replica_url if name == "replica" else self.url))
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            if self._pools.get(name) is future:
+                del self._pools[name]
+            raise
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        # 作成済みのプールの接続数(/internal/db/poolで見る)
+        return {
+            name: {"size": pool.get_size(), "idle": pool.get_idle_size(), "max_size": pool.get_max_size()}
+            for name, pool in self._ready_pools()
+        }
+
+    async def close(self) -> None:
+        # 別のイベントループで作ったプールは閉じられない(そのループごと接続が捨てられている)ので、手放すだけにする
+        loop = asyncio.get_running_loop()
+        for name, pool in self._ready_pools():
+            if self._pools[name].get_loop() is loop:
+                await pool.close()
+        self._pools.clear()
+
+    def _ready_pools(self) -> list[tuple[str, asyncpg.Pool]]:
+        return [
+            (name, future.result()) for name, future in self._pools.items()
+            if future.done() and not future.cancelled() and future.exception() is None
+        ]
+
+
+class LazyConnection:
+    # 最初に呼ばれたときにプールから接続を借り、以降は同じ接続を返す(ConnectionGetterとしてリポジトリに渡す)
+    # キャッシュやまとめ読み込みだけで済んだリクエストは、接続を借りずに終わる
+    def __init__(self, pool: asyncpg.Pool, on_acquire: Callable[[asyncpg.Connection], Awaitable[None]] | None = None):
+        self.pool = pool
+        self.on_acquire = on_acquire
+        self.conn: asyncpg.Connection | None = None
+
+    async def __call__(self) -> asyncpg.Connection:
+        if self.conn is None:
+            started = time.perf_counter()
+            conn = await self.pool.acquire(timeout=DB_POOL_TIMEOUT)
+            record_pool_wait(time.perf_counter() - started)
+            try:
+                if self.on_acquire is not None:
+                    await self.on_acquire(conn)
+            except BaseException:
+                await self.pool.release(conn)
+                raise
+            self.conn = conn
+        return self.conn
+
+    @property
+    def acquired(self) -> bool:
+        # 今、プールから接続を借りているか
+        return self.conn is not None
+
+    async def release(self) -> None:
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            await self.pool.release(conn)
+
+
+def fixed_connection(conn: asyncpg.Connection) -> ConnectionGetter:
+    # すでに借りている接続を、そのままリポジトリに渡すとき
+    async def connection() -> asyncpg.Connection:
+        return conn
+    return connection
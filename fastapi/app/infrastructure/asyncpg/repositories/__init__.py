@@ -0,0 +1 @@
+# infrastructure/asyncpg/repositories/__init__.py
@@ -0,0 +1,78 @@
+# ④Infrastructure層 = 実装(具象)リポジトリ (asyncpg版)
+# app/infrastructure/asyncpg/repositories/category_repo_impl.py
+import asyncpg
+from app.domain.category import Category
+from app.infrastructure.asyncpg.pool import ConnectionGetter
+from app.infrastructure.sqlalchemy.id_allocator import category_id_allocator
+from app.repository.category_repository import CategoryRepository # ②の抽象リポジトリ
+from app.repository.exceptions import VersionConflictError
+
+# IDがNoneならシーケンスで採番する
+_INSERT_CATEGORY = """
+INSERT INTO categories (category_id, category_name) VALUES (COALESCE($1::int4, nextval('public.categories_category_id_seq')), $2)
+RETURNING category_id
+"""
+_SELECT_CATEGORIES = "SELECT category_id, category_name, version FROM categories"
+_GET_BY_ID = _SELECT_CATEGORIES + " WHERE category_id = $1"
+_RESERVE_IDS = "SELECT nextval('{sequence}') FROM generate_series(1, $1)"
+# 比較と更新を1文で行うので、先に読んで行ロック(FOR UPDATE)をとる必要はない(SQLAlchemy版も同じ1文)
+_UPDATE_CATEGORY = """
+UPDATE categories SET category_name = $2, version = version + 1
+WHERE category_id = $1 AND ($3::int4 IS NULL OR version = $3)
+RETURNING version
+"""
+_GET_VERSION = "SELECT version FROM categories WHERE category_id = $1"
+
+
+class AsyncpgCategoryRepository(CategoryRepository):
+    # ②の抽象リポジトリを継承して実装
+    # SQLを実行するだけで、commitはしない。リクエストの最後にAsyncpgUnitOfWorkがまとめてcommitする
+    def __init__(self, connection: ConnectionGetter):
+        self.connection = connection
+
+    async def save(self, category: Category) -> None:
+        conn = await self.connection()
+        category.id = await conn.fetchval(_INSERT_CATEGORY, category.id, category.name)   # ①のエンティティへIDを返す
+
+    async def list_all(self, after: int | None = None, limit: int | None = None) -> list[Category]:
+        # category_idの昇順で、afterより大きいIDのものをlimit件だけ取得する(キーセットページング)
+        conn = await self.connection()
+        args: list = []
+        sql = _SELECT_CATEGORIES
+        if after is not None:
+            args.append(after)
+            sql += f" WHERE category_id > ${len(args)}"
+        sql += " ORDER BY category_id"
+        if limit is not None:
+            args.append(limit)
+            sql += f" LIMIT ${len(args)}"
+        return [_row_to_category(r) for r in await conn.fetch(sql, *args)]
+
+    async def get_by_id(self, category_id: int) -> Category | None:
+        conn = await self.connection()
+        row = await conn.fetchrow(_GET_BY_ID, category_id)
+        return _row_to_category(row) if row is not None else None
+
+    async def next_identifier(self) -> int:
+        # SQLAlchemy版と同じ予約済みIDの置き場を使う
+        return (await category_id_allocator.take(1, self._reserve_ids))[0]
+
+    async def update(self, category: Category, expected_version: int | None = None) -> None:
+        # 存在しなければValueError(SQLAlchemy版と同じ)
+        conn = await self.connection()
+        version = await conn.fetchval(_UPDATE_CATEGORY, category.id, category.name, expected_version)
+        if version is None:
+            current = await conn.fetchval(_GET_VERSION, category.id) if expected_version is not None else None
+            if current is None:
+                raise ValueError(f"Category with ID {category.id} not found.")
+            raise VersionConflictError(current)
+        category.version = version
+
+    async def _reserve_ids(self, size: int) -> list[int]:
+        conn = await self.connection()
+        rows = await conn.fetch(_RESERVE_IDS.format(sequence=category_id_allocator.sequence_name), size)
+        return [r[0] for r in rows]
+
+
+def _row_to_category(row: asyncpg.Record) -> Category:
+    return Category(row["category_id"], row["category_name"], version=row["version"])
@@ -0,0 +1,283 @@
+# ④Infrastructure層 = 実装(具象)リポジトリ (asyncpg版)
+# app/infrastructure/asyncpg/repositories/item_repo_impl.py
+# SQLAlchemyItemRepositoryと同じSQLを、セッション・ORMを通さずasyncpgの接続で直接実行する
+# SQLの文字列はパラメータ以外は毎回同じにしてあるので、接続ごとのプリペアドステートメントのキャッシュに乗る
+# (条件の有無で変わる一覧のSELECTも、組み合わせごとに決まった文字列になる)
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING, NoReturn
+import asyncpg
+from app.domain.items import Item
+from app.infrastructure.asyncpg.pool import ConnectionGetter
+from app.infrastructure.sqlalchemy.id_allocator import item_id_allocator
+from app.infrastructure.sqlalchemy.repositories.item_repo_impl import _escape_like
+from app.repository.exceptions import VersionConflictError
+from app.repository.item_repository import CategoryMatch, ItemRepository, NameSearchMode  # ②の抽象リポジトリ
+
+if TYPE_CHECKING:
+    from app.infrastructure.cache.category_catalog import CategoryCatalog
+
+# Itemと、そのカテゴリIDの配列を1行にして返すSELECT(SQLAlchemy版の_items_with_category_idsと同じ)
+_SELECT_ITEMS = """
+SELECT i.item_id, i.item_name, i.version,
+       array_agg(ic.category_id ORDER BY ic.category_id) FILTER (WHERE ic.category_id IS NOT NULL) AS category_ids
+FROM items i LEFT JOIN item_category ic ON ic.item_id = i.item_id
+"""
+_GET_BY_ID = _SELECT_ITEMS + "WHERE i.item_id = $1 GROUP BY i.item_id"
+_GET_MANY = _SELECT_ITEMS + "WHERE i.item_id = ANY($1::int4[]) GROUP BY i.item_id"
+# 前方一致はSQLAlchemy版の_search_statementと同じく、インデックスの順(COLLATE "C")でlimit件のitem_idを選んでからカテゴリIDを集める
+_SEARCH_PREFIX = """
+SELECT i.item_id, i.item_name, i.version,
+       array_agg(ic.category_id ORDER BY ic.category_id) FILTER (WHERE ic.category_id IS NOT NULL) AS category_ids
+FROM (
+    SELECT item_id FROM items WHERE lower(item_name) COLLATE "C" LIKE $1 ESCAPE '!'
+    ORDER BY lower(item_name) COLLATE "C", item_id LIMIT $2
+) matched
+JOIN items i ON i.item_id = matched.item_id
+LEFT JOIN item_category ic ON ic.item_id = i.item_id
+GROUP BY i.item_id ORDER BY lower(i.item_name) COLLATE "C", i.item_id"""
+_SEARCH_FUZZY = _SELECT_ITEMS + """WHERE lower(i.item_name) % $1
+GROUP BY i.item_id ORDER BY similarity(lower(i.item_name), $1) DESC, i.item_id LIMIT $2"""
+_STREAM_ALL = """
+SELECT i.item_id, i.item_name, i.version, ic.category_id
+FROM items i LEFT JOIN item_category ic ON ic.item_id = i.item_id
+ORDER BY i.item_id, ic.category_id
+"""
+_GET_VERSION = "SELECT version FROM items WHERE item_id = $1"
+_RESERVE_IDS = "SELECT nextval('{sequence}') FROM generate_series(1, $1)"
+_EXISTING_CATEGORY_IDS = "SELECT category_id FROM categories WHERE category_id = ANY($1::int4[])"
+
+# IDがNoneならシーケンスで採番する
+_INSERT_ITEM = "INSERT INTO items (item_id, item_name) VALUES (COALESCE($1::int4, nextval('public.items_item_id_seq')), $2) RETURNING item_id"
+# 一括作成は配列をunnestして1文で入れる(複数行VALUESと違い、件数が増えてもバインド変数は2つのまま)
+_INSERT_ITEMS = "INSERT INTO items (item_id, item_name) SELECT * FROM unnest($1::int4[], $2::varchar[])"
+_INSERT_PAIRS = "INSERT INTO item_category (item_id, category_id) SELECT * FROM unnest($1::int4[], $2::int4[])"
+
+# 一部更新。$2(名前)がNULLなら名前は変えない。$3(バージョン)がNULLならバージョンを確認しない
+_UPDATE_ITEM = """
+UPDATE items SET item_name = COALESCE($2, item_name), version = version + 1
+WHERE item_id = $1 AND ($3::int4 IS NULL OR version = $3)
+RETURNING item_id, item_name, version
+"""
+# カテゴリは変えないので、今のカテゴリIDも同じ文の中で集めて返す
+_UPDATE_ITEM_KEEP_CATEGORIES = f"""
+WITH updated AS ({_UPDATE_ITEM})
+SELECT u.item_id, u.item_name, u.version,
+       (SELECT array_agg(ic.category_id ORDER BY ic.category_id) FROM item_category ic WHERE ic.item_id = u.item_id) AS category_ids
+FROM updated u
+"""
+# Itemに紐づくカテゴリを$2にそろえる(SQLAlchemy版の_replace_categories_statementと同じ)。変わらない組み合わせには触らない
+_REPLACE_CATEGORIES = """
+WITH wanted AS (SELECT category_id FROM categories WHERE category_id = ANY($2::int4[])),
+removed AS (
+    DELETE FROM item_category WHERE item_id = $1 AND category_id NOT IN (SELECT category_id FROM wanted)
+    RETURNING category_id
+),
+added AS (
+    INSERT INTO item_category (item_id, category_id) SELECT $1, category_id FROM wanted
+    ON CONFLICT DO NOTHING
+    RETURNING category_id
+)
+SELECT category_id FROM wanted
+"""
+_DELETE_ITEM = "DELETE FROM items WHERE item_id = $1 AND ($2::int4 IS NULL OR version = $2) RETURNING item_id"
+_DELETE_ITEMS = "DELETE FROM items WHERE item_id = ANY($1::int4[]) RETURNING item_id"
+
+
+class AsyncpgItemRepository(ItemRepository):
+    # ②の抽象リポジトリを継承して実装
+    # SQLを実行するだけで、commitはしない。リクエストの最後にAsyncpgUnitOfWorkがまとめてcommitする
+    # connectionは接続を返す関数。最初にSQLを実行するときにプールから借りるので、キャッシュだけで済めば接続を使わない
+    def __init__(self, connection: ConnectionGetter, category_catalog: "CategoryCatalog | None" = None):
+        self.connection = connection
+        # カテゴリIDの存在チェックに使うメモリ内カタログ(なければ毎回DBで確認する)
+        self.category_catalog = category_catalog
+
+    async def save(self, item: Item) -> None:
+        # 存在するカテゴリIDだけを紐づける(エンティティの状態も実際に紐づいたものにそろえる)
+        conn = await self.connection()
+        existing = await self._existing_category_ids(item.category_ids or [])
+        item.category_ids = [category_id for category_id in dict.fromkeys(item.category_ids or []) if category_id in existing]
+        item.id = await conn.fetchval(_INSERT_ITEM, item.id, item.name)   # ①のエンティティへIDを返す
+        if item.category_ids:
+            await conn.execute(_INSERT_PAIRS, [item.id] * len(item.category_ids), item.category_ids)
+
+    async def save_many(self, items: list[Item]) -> None:
+        # Itemの一括保存。itemsと中間テーブルに、それぞれ1文ずつで入れる
+        if not items:
+            return
+        conn = await self.connection()
+        existing = await self._existing_category_ids([c for item in items for c in item.category_ids or []])
+        for item in items:
+            item.category_ids = [category_id for category_id in dict.fromkeys(item.category_ids or []) if category_id in existing]
+        await conn.execute(_INSERT_ITEMS, [item.id for item in items], [item.name for item in items])
+        pairs = [(item.id, category_id) for item in items for category_id in item.category_ids]
+        if pairs:
+            await conn.execute(_INSERT_PAIRS, [p[0] for p in pairs], [p[1] for p in pairs])
+
+    async def list_all(self, after: int | None = None, limit: int | None = None,
+                       category_ids: list[int] | None = None, match: CategoryMatch = "any") -> list[Item]:
+        # item_idの昇順で、afterより大きいIDのものをlimit件だけ取得する(キーセットページング)
+        # カテゴリでの絞り込みはSQLAlchemy版の_category_filterと同じ(all: GROUP BY + HAVING / any: EXISTS)
+        conn = await self.connection()
+        args: list = []
+        where = []
+        if category_ids:
+            wanted = set(category_ids)
+            args.append(list(wanted))
+            if match == "all":
+                matched = f"SELECT f.item_id FROM item_category f WHERE f.category_id = ANY(${len(args)}::int4[])"
+                if after is not None:
+                    args.append(after)
+                    matched += f" AND f.item_id > ${len(args)}"
+                args.append(len(wanted))
+                where.append(f"i.item_id IN ({matched} GROUP BY f.item_id HAVING count(*) = ${len(args)})")
+            else:
+                where.append(f"EXISTS (SELECT 1 FROM item_category f WHERE f.item_id = i.item_id AND f.category_id = ANY(${len(args)}::int4[]))")
+        if after is not None:
+            args.append(after)
+            where.append(f"i.item_id > ${len(args)}")
+        sql = _SELECT_ITEMS
+        if where:
+            sql += "WHERE " + " AND ".join(where) + " "
+        sql += "GROUP BY i.item_id ORDER BY i.item_id"
+        if limit is not None:
+            args.append(limit)
+            sql += f" LIMIT ${len(args)}"
+        return [_row_to_item(r) for r in await conn.fetch(sql, *args)]
+
+    async def list_by_category(self, category_id: int, after: int | None = None, limit: int | None = None) -> list[Item]:
+        # カテゴリに属するItemの一覧。絞り込み用の中間テーブル(f)は、カテゴリIDを集めるほう(ic)とは別に結合する
+        conn = await self.connection()
+        args: list = [category_id]
+        sql = _SELECT_ITEMS + "JOIN item_category f ON f.item_id = i.item_id WHERE f.category_id = $1"
+        if after is not None:
+            args.append(after)
+            sql += f" AND f.item_id > ${len(args)}"
+        sql += " GROUP BY i.item_id ORDER BY i.item_id"
+        if limit is not None:
+            args.append(limit)
+            sql += f" LIMIT ${len(args)}"
+        return [_row_to_item(r) for r in await conn.fetch(sql, *args)]
+
+    async def search_by_name(self, key: str, mode: NameSearchMode, limit: int) -> list[Item]:
+        # 名前検索(使うインデックスはSQLAlchemy版と同じ)
+        conn = await self.connection()
+        if mode == "prefix":
+            rows = await conn.fetch(_SEARCH_PREFIX, _escape_like(key) + "%", limit)
+        else:
+            rows = await conn.fetch(_SEARCH_FUZZY, key, limit)
+        return [_row_to_item(r) for r in rows]
+
+    async def stream_all(self, chunk_size: int) -> AsyncIterator[list[Item]]:
+        # 全件エクスポート。サーバサイドカーソルでchunk_size行ずつ受け取り、同じitem_idの行をまとめて1つのItemにする
+        # (カーソルはトランザクションの中でしか使えないので、UnitOfWorkの中ならセーブポイント、外なら読み取りだけのトランザクションを張る)
+        conn = await self.connection()
+        chunk: list[Item] = []
+        current: Item | None = None
+        category_ids: list[int] = []
+        async with conn.transaction():
+            async for item_id, item_name, version, category_id in conn.cursor(_STREAM_ALL, prefetch=chunk_size):
+                if current is None or current.id != item_id:
+                    if current is not None:
+                        chunk.append(current)
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                    category_ids = []
+                    current = Item(item_id, item_name, category_ids, version=version)
+                if category_id is not None:
+                    category_ids.append(category_id)
+        if current is not None:
+            chunk.append(current)
+        if chunk:
+            yield chunk
+
+    async def get_by_id(self, item_id: int) -> Item | None:
+        conn = await self.connection()
+        row = await conn.fetchrow(_GET_BY_ID, item_id)
+        return _row_to_item(row) if row is not None else None
+
+    async def get_many(self, item_ids: list[int]) -> list[Item]:
+        if not item_ids:
+            return []
+        conn = await self.connection()
+        found = {row["item_id"]: _row_to_item(row) for row in await conn.fetch(_GET_MANY, list(set(item_ids)))}
+        return [found[item_id] for item_id in dict.fromkeys(item_ids) if item_id in found]
+
+    async def next_identifier(self) -> int:
+        # SQLAlchemy版と同じ予約済みIDの置き場を使う(同じシーケンスなので、どちらから採番しても重複しない)
+        return (await item_id_allocator.take(1, self._reserve_ids))[0]
+
+    async def next_identifiers(self, count: int) -> list[int]:
+        return await item_id_allocator.take(count, self._reserve_ids)
+
+    async def get_version(self, item_id: int) -> int | None:
+        conn = await self.connection()
+        return await conn.fetchval(_GET_VERSION, item_id)
+
+    async def update(self, item: Item, expected_version: int | None = None) -> list[int]:
+        # 名前もカテゴリも置き換える。戻り値は、存在しないため紐づけなかったカテゴリID
+        patched, rejected = await self.patch(item.id, name=item.name, category_ids=item.category_ids or [],
+                                             expected_version=expected_version)
+        item.category_ids = patched.category_ids
+        item.version = patched.version
+        return rejected
+
+    async def patch(self, item_id: int, name: str | None = None, category_ids: list[int] | None = None,
+                    expected_version: int | None = None) -> tuple[Item, list[int]]:
+        # 事前に読み込まず、UPDATE ... RETURNINGと(カテゴリも変えるときだけ)中間テーブルの差分を書き換える文で済ませる
+        conn = await self.connection()
+        if category_ids is None:
+            row = await conn.fetchrow(_UPDATE_ITEM_KEEP_CATEGORIES, item_id, name, expected_version)
+            if row is None:
+                await self._raise_not_updated(item_id, expected_version)
+            return _row_to_item(row), []
+
+        row = await conn.fetchrow(_UPDATE_ITEM, item_id, name, expected_version)
+        if row is None:
+            await self._raise_not_updated(item_id, expected_version)
+        requested = list(dict.fromkeys(category_ids))
+        accepted = {r["category_id"] for r in await conn.fetch(_REPLACE_CATEGORIES, item_id, requested)}
+        item = Item(row["item_id"], row["item_name"], [c for c in requested if c in accepted], version=row["version"])
+        return item, [c for c in requested if c not in accepted]
+
+    async def delete(self, item_id: int, expected_version: int | None = None) -> None:
+        # DELETE ... RETURNINGの1文で削除し、何も返らなければ存在しない(中間テーブルの行はON DELETE CASCADEで消える)
+        conn = await self.connection()
+        if await conn.fetchval(_DELETE_ITEM, item_id, expected_version) is None:
+            await self._raise_not_updated(item_id, expected_version)
+
+    async def delete_many(self, item_ids: list[int]) -> list[int]:
+        if not item_ids:
+            return []
+        conn = await self.connection()
+        deleted = {r["item_id"] for r in await conn.fetch(_DELETE_ITEMS, list(set(item_ids)))}
+        return [item_id for item_id in dict.fromkeys(item_ids) if item_id in deleted]
+
+    async def _raise_not_updated(self, item_id: int, expected_version: int | None) -> NoReturn:
+        # UPDATE/DELETEの対象が0行だったとき、存在しないのか、バージョンが違うのかを調べて送出する
+        current = await self.get_version(item_id) if expected_version is not None else None
+        if current is None:
+            raise ValueError(f"Item with ID {item_id} not found.")
+        raise VersionConflictError(current)
+
+    async def _existing_category_ids(self, category_ids: list[int]) -> set[int]:
+        # カタログにあるIDはDBに問い合わせず、カタログにないIDだけDBで確認する
+        requested = set(category_ids)
+        if not requested:
+            return set()
+        known = self.category_catalog.known_ids(requested) if self.category_catalog is not None else set()
+        unknown = requested - known
+        if not unknown:
+            return known
+        conn = await self.connection()
+        return known | {r["category_id"] for r in await conn.fetch(_EXISTING_CATEGORY_IDS, list(unknown))}
+
+    async def _reserve_ids(self, size: int) -> list[int]:
+        conn = await self.connection()
+        rows = await conn.fetch(_RESERVE_IDS.format(sequence=item_id_allocator.sequence_name), size)
+        return [r[0] for r in rows]
+
+
+def _row_to_item(row: asyncpg.Record) -> Item:
+    return Item(row["item_id"], row["item_name"], list(row["category_ids"] or []), version=row["version"])
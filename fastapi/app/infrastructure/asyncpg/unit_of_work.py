@@ -0,0 +1,98 @@
+# ④Infrastructure層 = asyncpgでのUnit of Work
+# app/infrastructure/asyncpg/unit_of_work.py
+# app/db/unit_of_work.pyのUnitOfWorkのasyncpg版。プールから借りた接続1つで、リクエスト全体を1つのトランザクションにする
+# リポジトリはSQLを実行するだけでcommitはせず、エンドポイントが正常に終わったら最後に1回だけcommitする
+# 接続は最初にSQLを実行するときに借りる(そのときにトランザクションも始める)ので、DBを使わなかったリクエストはcommitもしない
+from collections.abc import Callable
+import asyncpg
+from functools import partial
+from fastapi import Depends, Request
+from asyncpg.transaction import Transaction
+from app.db.read_routing import mark_write, use_replica
+from app.db.unit_of_work import uow_metrics
+from app.infrastructure.asyncpg.pool import LazyConnection
+from app.infrastructure.cache.invalidation_bus import CHANNEL, notify_payloads
+
+_NOTIFY = "SELECT pg_notify($1, $2)"
+
+
+class AsyncpgUnitOfWork:
+    def __init__(self, pool: asyncpg.Pool):
+        self._transaction: Transaction | None = None
+        # リポジトリにはconnectionを渡す
+        self.connection = LazyConnection(pool, on_acquire=self._begin)
+        # commitの前にpg_notifyする、キャッシュの無効化の通知(invalidation_bus.publishのasyncpg版)
+        self._pending: list[tuple[str, list[int]]] = []
+        # commitが成功したら呼ぶもの(UnitOfWork.after_commitと同じ)
+        self._after_commit: list[Callable[[], None]] = []
+        self.commits = 0
+        # asyncpgにはflushがない(uow_metricsの項目をそろえるため)
+        self.flushes = 0
+
+    async def _begin(self, conn: asyncpg.Connection) -> None:
+        self._transaction = conn.transaction()
+        await self._transaction.start()
+
+    def publish(self, kind: str, ids: list[int]) -> None:
+        # CachedItemRepository/CachedCategoryRepositoryのpublishに渡す。commitするときに通知する
+        if ids:
+            self._pending.append((kind, list(ids)))
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        self._after_commit.append(callback)
+
+    async def commit(self) -> None:
+        # 何も実行していなければ(接続を借りていなければ)commitしない
+        if self._transaction is not None:
+            await self._commit_transaction()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    async def _commit_transaction(self) -> None:
+        # NOTIFYはcommitと同じトランザクションの中で実行する(commitされたときにだけ届く)
+        conn = await self.connection()
+        for kind, ids in self._pending:
+            for payload in notify_payloads(kind, ids):
+                await conn.execute(_NOTIFY, CHANNEL, payload)
+        self._pending.clear()
+        await self._transaction.commit()
+        self._transaction = None
+        self.commits += 1
+
+    async def rollback(self) -> None:
+        self._pending.clear()
+        self._after_commit.clear()
+        if self._transaction is not None:
+            await self._transaction.rollback()
+            self._transaction = None
+
+    async def close(self) -> None:
+        await self.connection.release()
+
+
+# REPOSITORY_BACKEND=asyncpgのとき、ルータのDIチェーンでget_uowの代わりに使う
+async def get_asyncpg_uow(request: Request):
+    uow = AsyncpgUnitOfWork(await request.app.state.pg_pools.pool())
+    uow.after_commit(partial(mark_write, request))
+    rolled_back = False
+    try:
+        yield uow
+    except Exception:
+        rolled_back = True
+        await uow.rollback()
+        raise
+    else:
+        await uow.commit()
+    finally:
+        await uow.close()
+        uow_metrics.record(uow, rolled_back)
+
+
+# 読み取り専用のルートでget_read_dbの代わりに使う(トランザクションは張らず、commitもしない)
+async def get_asyncpg_read_connection(request: Request, replica: bool = Depends(use_replica)):
+    connection = LazyConnection(await request.app.state.pg_pools.pool(replica))
+    try:
+        yield connection
+    finally:
+        await connection.release()
@@ -0,0 +1,5 @@
+# infrastructure/batching/__init__.py
+from .batch_loader import BatchLoader
+from .batched_item_repo import BatchedItemRepository
+
+__all__ = ["BatchLoader", "BatchedItemRepository"]
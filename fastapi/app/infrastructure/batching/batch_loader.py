@@ -0,0 +1,86 @@
+# ④Infrastructure層 = まとめ読み込み(DataLoader)
+# app/infrastructure/batching/batch_loader.py
+# 同時に来たload(key)を少しの間ためて、batch_fnを1回だけ呼んでまとめて解決する
+#   - window_secondsが0なら、イベントループの次の1周(call_soon)までに来た分をまとめる
+#   - window_secondsが正なら、最初のload()からその時間だけ待ってまとめる(待つ分、1件あたりの応答は遅くなる)
+#   - 同じキーは1回にまとめる。ためた件数がmax_batch_sizeに達したら、待たずにすぐ問い合わせる
+# アプリ(FastAPIのインスタンス)ごとに1つ作り、app.stateに持たせる(別々のリクエストからのloadもまとめるため)
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    def __init__(self, batch_fn: Callable[[list[K]], Awaitable[dict[K, V]]],
+                 window_seconds: float = 0.0, max_batch_size: int = 500):
+        # batch_fnはキーのリストを受け取り、見つかったものだけを{キー: 値}で返す
+        self.batch_fn = batch_fn
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending: dict[K, asyncio.Future] = {}
+        self._handle: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.loads = 0
+        self.batches = 0
+
+    async def load(self, key: K) -> V | None:
+        # 見つからなければNone
+        # 1つのFutureを複数のリクエストで待つので、1つがキャンセルされても他に影響しないようshieldで待つ
+        return await asyncio.shield(self._future_for(key))
+
+    async def load_many(self, keys: Iterable[K]) -> list[V | None]:
+        futures = [self._future_for(key) for key in keys]
+        return list(await asyncio.gather(*(asyncio.shield(f) for f in futures)))
+
+    def stats(self) -> dict[str, int]:
+        return {"loads": self.loads, "batches": self.batches, "pending": len(self._pending)}
+
+    def _future_for(self, key: K) -> asyncio.Future:
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = future
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._handle is None:
+            if self.window_seconds > 0:
+                self._handle = loop.call_later(self.window_seconds, self._dispatch)
+            else:
+                self._handle = loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self.batches += 1
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[K, asyncio.Future]) -> None:
+        try:
+            values = await self.batch_fn(list(batch))
+        except BaseException as e:
+            # batch_fnが送出する例外は、どのDB・ドライバで読むかによって違う(SQLAlchemy・asyncpg・プールのタイムアウトなど)
+            # どの例外でも待っているリクエストが止まったままにならないよう、全員に渡してからそのまま送出し直す
+            # (キャンセルされたときは、待っている側もキャンセルする)
+            for future in batch.values():
+                if not future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            raise
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
@@ -0,0 +1,87 @@
+# ④Infrastructure層 = まとめ読み込みつきリポジトリ(デコレータ)
+# app/infrastructure/batching/batched_item_repo.py
+# get_by_id/get_manyをBatchLoaderに回し、同時に来た読み込みを1回のIN句のSELECTにまとめる
+# 書き込みなどそれ以外は、包んでいるリポジトリにそのまま任せる
+# ローダーはリクエストとは別の接続で読むので、リクエストがすでに接続を持っているとき(holds_connectionがTrue)はローダーを使わず、
+# 包んでいるリポジトリでその接続のまま読む(1つのリクエストが接続を2つ持つと、プールの大きさと同じ数の同時リクエストで
+# 全員が2つ目の接続を待ち、DB_POOL_TIMEOUTまで止まってしまうため。書き込み中のトランザクションの内容も見える)
+from collections.abc import AsyncIterator, Callable
+from fastapi import Depends, Request
+from app.db.read_routing import use_replica
+from app.domain.items import Item
+from app.infrastructure.batching.batch_loader import BatchLoader
+from app.repository.item_repository import CategoryMatch, ItemRepository, NameSearchMode
+
+
+class BatchedItemRepository(ItemRepository):
+    def __init__(self, inner: ItemRepository, loader: BatchLoader[int, Item], holds_connection: Callable[[], bool] | None = None):
+        self.inner = inner
+        self.loader = loader
+        self.holds_connection = holds_connection
+
+    async def save(self, item: Item) -> None:
+        await self.inner.save(item)
+
+    async def save_many(self, items: list[Item]) -> None:
+        await self.inner.save_many(items)
+
+    async def list_all(self, after: int | None = None, limit: int | None = None,
+                       category_ids: list[int] | None = None, match: CategoryMatch = "any") -> list[Item]:
+        return await self.inner.list_all(after=after, limit=limit, category_ids=category_ids, match=match)
+
+    async def list_by_category(self, category_id: int, after: int | None = None, limit: int | None = None) -> list[Item]:
+        return await self.inner.list_by_category(category_id, after=after, limit=limit)
+
+    async def search_by_name(self, key: str, mode: NameSearchMode, limit: int) -> list[Item]:
+        return await self.inner.search_by_name(key, mode, limit)
+
+    def stream_all(self, chunk_size: int) -> AsyncIterator[list[Item]]:
+        return self.inner.stream_all(chunk_size)
+
+    async def get_by_id(self, item_id: int) -> Item | None:
+        if self._holds_connection():
+            return await self.inner.get_by_id(item_id)
+        return await self.loader.load(item_id)
+
+    async def get_many(self, item_ids: list[int]) -> list[Item]:
+        item_ids = list(dict.fromkeys(item_ids))
+        if self._holds_connection():
+            return await self.inner.get_many(item_ids)
+        return [item for item in await self.loader.load_many(item_ids) if item is not None]
+
+    async def next_identifier(self) -> int:
+        return await self.inner.next_identifier()
+
+    async def next_identifiers(self, count: int) -> list[int]:
+        return await self.inner.next_identifiers(count)
+
+    async def get_version(self, item_id: int) -> int | None:
+        return await self.inner.get_version(item_id)
+
+    async def update(self, item: Item, expected_version: int | None = None) -> list[int]:
+        return await self.inner.update(item, expected_version=expected_version)
+
+    async def patch(self, item_id: int, name: str | None = None, category_ids: list[int] | None = None,
+                    expected_version: int | None = None) -> tuple[Item, list[int]]:
+        return await self.inner.patch(item_id, name=name, category_ids=category_ids, expected_version=expected_version)
+
+    async def delete(self, item_id: int, expected_version: int | None = None) -> None:
+        await self.inner.delete(item_id, expected_version=expected_version)
+
+    async def delete_many(self, item_ids: list[int]) -> list[int]:
+        return await self.inner.delete_many(item_ids)
+
+    def _holds_connection(self) -> bool:
+        return self.holds_connection is not None and self.holds_connection()
+
+
+# ルータのDIチェーンで使う。そのリクエストを処理しているアプリのローダーを返す
+def get_item_loader(request: Request) -> BatchLoader[int, Item]:
+    return request.app.state.item_loader
+
+
+# 読み取り専用のルートで使う。レプリカから読むリクエストなら、レプリカで読むローダーを返す
+def get_read_item_loader(request: Request, replica: bool = Depends(use_replica)) -> BatchLoader[int, Item]:
+    if replica and request.app.state.replica_item_loader is not None:
+        return request.app.state.replica_item_loader
+    return request.app.state.item_loader
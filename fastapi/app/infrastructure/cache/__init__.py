@@ -0,0 +1,9 @@
+# infrastructure/cache/__init__.py
+from .cached_category_repo import CachedCategoryRepository
+from .cached_item_repo import CachedItemRepository
+from .category_catalog import CategoryCatalog, CategorySnapshot
+from .invalidation_bus import InvalidationListener
+from .lru_ttl_cache import LRUTTLCache
+from .repository_caches import RepositoryCaches
+
+__all__ = ["CachedCategoryRepository", "CachedItemRepository", "CategoryCatalog", "CategorySnapshot", "InvalidationListener", "LRUTTLCache", "RepositoryCaches"]
@@ -0,0 +1,63 @@
+# ④Infrastructure層 = キャッシュつきリポジトリ(デコレータ)
+# app/infrastructure/cache/cached_category_repo.py
+# ②の抽象リポジトリを実装した別のリポジトリを包み、get_by_idの結果をキャッシュする
+# カテゴリを書き換えたら、そのカテゴリと、そのカテゴリを参照しているItemのキャッシュも消す
+# fill_cache=Falseなら、キャッシュから読むだけで、読んだ結果はキャッシュに入れない(レプリカから読むとき)
+# on_commitを渡すと、キャッシュ・カテゴリカタログへの反映はcommitが成功してから行う
+# (commit前に反映すると、ロールバックしたときにDBにないカテゴリがカタログに残ってしまう)
+from collections.abc import Callable
+from functools import partial
+from typing import TYPE_CHECKING
+from app.domain.category import Category
+from app.repository.category_repository import CategoryRepository
+
+if TYPE_CHECKING:
+    from app.infrastructure.cache.repository_caches import RepositoryCaches
+
+
+class CachedCategoryRepository(CategoryRepository):
+    def __init__(self, inner: CategoryRepository, caches: "RepositoryCaches",
+                 publish: Callable[[str, list[int]], None] | None = None, fill_cache: bool = True,
+                 on_commit: Callable[[Callable[[], None]], None] | None = None):
+        self.inner = inner
+        self.caches = caches
+        self.publish = publish
+        self.fill_cache = fill_cache
+        self.on_commit = on_commit
+
+    async def save(self, category: Category) -> None:
+        self._publish([category.id])
+        await self.inner.save(category)
+        self._written(category)
+
+    async def list_all(self, after: int | None = None, limit: int | None = None) -> list[Category]:
+        return await self.inner.list_all(after=after, limit=limit)
+
+    async def get_by_id(self, category_id: int) -> Category | None:
+        cached = self.caches.categories.get(category_id)
+        if cached is not None:
+            return Category(category_id=cached[0], name=cached[1], version=cached[2])
+        category = await self.inner.get_by_id(category_id)
+        if category is not None and self.fill_cache:
+            self.caches.categories.set(category_id, (category.id, category.name, category.version))
+        return category
+
+    async def next_identifier(self) -> int:
+        return await self.inner.next_identifier()
+
+    async def update(self, category: Category, expected_version: int | None = None) -> None:
+        self._publish([category.id])
+        await self.inner.update(category, expected_version=expected_version)
+        self._written(category)
+
+    def _written(self, category: Category) -> None:
+        # 書き込んだ時点の内容で反映する(commitまでにエンティティが書き換えられても影響しない)
+        written = partial(self.caches.category_written, Category(category.id, category.name, category.version))
+        if self.on_commit is not None:
+            self.on_commit(written)
+        else:
+            written()
+
+    def _publish(self, category_ids: list[int]) -> None:
+        if self.publish is not None:
+            self.publish("category", category_ids)
@@ -0,0 +1,149 @@
+# ④Infrastructure層 = キャッシュつきリポジトリ(デコレータ)
+# app/infrastructure/cache/cached_item_repo.py
+# ②の抽象リポジトリを実装した別のリポジトリ(SQLAlchemyItemRepositoryなど)を包み、get_by_idの結果をキャッシュする
+# 書き込み(save/update/delete)をしたら、そのItemのキャッシュを消す
+# publishを渡すと、書き込みの前に変更したItemのIDを知らせる(他のワーカーのキャッシュを消すため)
+# fill_cache=Falseなら、キャッシュから読むだけで、読んだ結果はキャッシュに入れない
+# (レプリカから読むとき。反映が遅れた古い内容を、無効化の後にキャッシュへ入れ直してしまわないように)
+# on_commitを渡すと、書き込みの直後に加えて、commitが成功した後にもう一度キャッシュを消す
+# (commitまでの間に同じワーカーの別のリクエストが読むと、commit前の古い行がキャッシュに入り直してしまうため)
+from collections.abc import AsyncIterator, Callable
+from functools import partial
+from typing import TYPE_CHECKING
+from app.domain.items import Item
+from app.repository.item_repository import CategoryMatch, ItemRepository, NameSearchMode
+
+if TYPE_CHECKING:
+    from app.infrastructure.cache.repository_caches import RepositoryCaches
+
+
+class CachedItemRepository(ItemRepository):
+    def __init__(self, inner: ItemRepository, caches: "RepositoryCaches",
+                 publish: Callable[[str, list[int]], None] | None = None, fill_cache: bool = True,
+                 on_commit: Callable[[Callable[[], None]], None] | None = None):
+        self.inner = inner
+        self.caches = caches
+        self.publish = publish
+        self.fill_cache = fill_cache
+        self.on_commit = on_commit
+
+    async def save(self, item: Item) -> None:
+        self._publish([item.id])
+        await self.inner.save(item)
+        self._invalidate([item.id])
+
+    async def save_many(self, items: list[Item]) -> None:
+        self._publish([item.id for item in items])
+        await self.inner.save_many(items)
+        self._invalidate([item.id for item in items])
+
+    async def list_all(self, after: int | None = None, limit: int | None = None,
+                       category_ids: list[int] | None = None, match: CategoryMatch = "any") -> list[Item]:
+        return await self.inner.list_all(after=after, limit=limit, category_ids=category_ids, match=match)
+
+    async def list_by_category(self, category_id: int, after: int | None = None, limit: int | None = None) -> list[Item]:
+        return await self.inner.list_by_category(category_id, after=after, limit=limit)
+
+    async def search_by_name(self, key: str, mode: NameSearchMode, limit: int) -> list[Item]:
+        return await self.inner.search_by_name(key, mode, limit)
+
+    def stream_all(self, chunk_size: int) -> AsyncIterator[list[Item]]:
+        return self.inner.stream_all(chunk_size)
+
+    async def get_by_id(self, item_id: int) -> Item | None:
+        cached = self.caches.items.get(item_id)
+        if cached is not None:
+            return _to_item(cached)
+        item = await self.inner.get_by_id(item_id)
+        if item is not None and self.fill_cache:
+            self.caches.items.set(item_id, _to_cached(item))
+        return item
+
+    async def get_many(self, item_ids: list[int]) -> list[Item]:
+        # キャッシュにないIDだけを、包んでいるリポジトリからまとめて取得する
+        item_ids = list(dict.fromkeys(item_ids))
+        found: dict[int, Item] = {}
+        missing = []
+        for item_id in item_ids:
+            cached = self.caches.items.get(item_id)
+            if cached is not None:
+                found[item_id] = _to_item(cached)
+            else:
+                missing.append(item_id)
+        if missing:
+            for item in await self.inner.get_many(missing):
+                if self.fill_cache:
+                    self.caches.items.set(item.id, _to_cached(item))
+                found[item.id] = item
+        return [found[item_id] for item_id in item_ids if item_id in found]
+
+    async def next_identifier(self) -> int:
+        return await self.inner.next_identifier()
+
+    async def next_identifiers(self, count: int) -> list[int]:
+        return await self.inner.next_identifiers(count)
+
+    async def get_version(self, item_id: int) -> int | None:
+        cached = self.caches.items.get(item_id)
+        if cached is not None:
+            return cached[3]
+        return await self.inner.get_version(item_id)
+
+    async def update(self, item: Item, expected_version: int | None = None) -> list[int]:
+        self._publish([item.id])
+        try:
+            return await self.inner.update(item, expected_version=expected_version)
+        finally:
+            # バージョン違いで失敗したときも、キャッシュが古かった可能性があるので消す
+            self._invalidate([item.id])
+
+    async def patch(self, item_id: int, name: str | None = None, category_ids: list[int] | None = None,
+                    expected_version: int | None = None) -> tuple[Item, list[int]]:
+        self._publish([item_id])
+        try:
+            return await self.inner.patch(item_id, name=name, category_ids=category_ids, expected_version=expected_version)
+        finally:
+            self._invalidate([item_id])
+
+    async def delete(self, item_id: int, expected_version: int | None = None) -> None:
+        self._publish([item_id])
+        await self.inner.delete(item_id, expected_version=expected_version)
+        self._invalidate([item_id])
+
+    async def delete_many(self, item_ids: list[int]) -> list[int]:
+        self._publish(item_ids)
+        deleted = await self.inner.delete_many(item_ids)
+        self._invalidate(item_ids)
+        return deleted
+
+    def _invalidate(self, item_ids: list[int]) -> None:
+        # このリクエストの後の読み取りで古い内容を返さないよう、すぐに消す。commitの後にもう一度消す
+        invalidate = partial(self._invalidate_now, list(item_ids))
+        invalidate()
+        if self.on_commit is not None:
+            self.on_commit(invalidate)
+
+    def _invalidate_now(self, item_ids: list[int]) -> None:
+        for item_id in item_ids:
+            self.caches.invalidate_item(item_id)
+
+    def _publish(self, item_ids: list[int]) -> None:
+        if self.publish is not None:
+            self.publish("item", item_ids)
+
+
+# キャッシュには変更できない形(tuple)で入れ、取り出すたびに新しいItemを作る
+# (ユースケースは取得したItemを書き換えてからupdateするので、同じオブジェクトを返すとキャッシュの中身まで変わってしまう)
+# (ID, 名前, カテゴリIDのtuple, バージョン)
+CachedItem = tuple[int, str, tuple[int, ...] | None, int]
+
+def _to_cached(item: Item) -> CachedItem:
+    return (item.id, item.name, tuple(item.category_ids) if item.category_ids is not None else None, item.version)
+
+def _to_item(cached: CachedItem) -> Item:
+    item_id, name, category_ids, version = cached
+    return Item(item_id=item_id, name=name, category_ids=list(category_ids) if category_ids is not None else None, version=version)
+
+def references_category(cached: CachedItem, category_id: int) -> bool:
+    # キャッシュしたItemが指定のカテゴリを参照しているか
+    return category_id in (cached[2] or ())
@@ -0,0 +1,98 @@
+# ④Infrastructure層 = カテゴリのメモリ内カタログ
+# app/infrastructure/cache/category_catalog.py
+# categoriesテーブルは小さくてほとんど変わらないので、全件をメモリに持っておく。
+# 中身は変更しないスナップショット(CategorySnapshot)で持ち、カテゴリが書き換わったら新しいスナップショットに差し替える。
+# これにより、
+#   - GET /categories/ はDBに問い合わせず、スナップショット作成時にJSONにしておいたバイト列をそのまま返せる
+#   - Itemの書き込み時のカテゴリIDの存在チェックをDBに問い合わせずにできる
+import asyncio
+import bisect
+import hashlib
+import logging
+from collections.abc import Awaitable, Callable
+from app.domain.category import Category
+from app.dto.category_dto import CategoryReadDTO
+
+logger = logging.getLogger(__name__)
+
+
+class CategorySnapshot:
+    # ある時点のカテゴリ全件(作成後は変更しない)
+    def __init__(self, version: int, categories: list[Category]):
+        self.version = version
+        ordered = sorted(categories, key=lambda c: c.id)
+        self.categories: tuple[Category, ...] = tuple(ordered)
+        self.ids: tuple[int, ...] = tuple(c.id for c in ordered)
+        self.id_set: frozenset[int] = frozenset(self.ids)
+        # 1カテゴリ分ずつ、レスポンスと同じ形(CategoryReadDTO)のJSONにしておく
+        self._rows: tuple[bytes, ...] = tuple(
+            CategoryReadDTO(category_id=c.id, category_name=c.name).model_dump_json().encode() for c in ordered
+        )
+        # カタログ全体の内容から作るハッシュ値(一覧のETagに使う)
+        # versionはワーカーごとに数え方が違うが、これは内容が同じならどのワーカーでも同じ値になる
+        self.digest = hashlib.blake2b(b"\n".join(self._rows), digest_size=16).hexdigest()
+
+    def page(self, after: int | None, limit: int) -> tuple[bytes, int | None]:
+        # afterより大きいIDからlimit件分のJSON配列と、次ページがあればその開始位置(このページの最後のID)を返す
+        start = 0 if after is None else bisect.bisect_right(self.ids, after)
+        end = start + limit
+        body = b"[" + b",".join(self._rows[start:end]) + b"]"
+        next_after = self.ids[end - 1] if end < len(self.ids) else None
+        return body, next_after
+
+    def with_category(self, category: Category) -> "CategorySnapshot":
+        # 1件追加・更新した新しいスナップショットを作る
+        others = [c for c in self.categories if c.id != category.id]
+        return CategorySnapshot(self.version + 1, [*others, Category(category.id, category.name, category.version)])
+
+
+class CategoryCatalog:
+    def __init__(self, loader: Callable[[], Awaitable[list[Category]]]):
+        # loaderはDBからカテゴリ全件を読み込む関数
+        self.loader = loader
+        self.snapshot: CategorySnapshot | None = None
+        # 読み込みの順番。後から始めた読み込みがあれば、先に始めた読み込みの結果は使わない
+        self._generation = 0
+        self._reload_tasks: set[asyncio.Task] = set()
+
+    @property
+    def loaded(self) -> bool:
+        return self.snapshot is not None
+
+    async def reload(self) -> None:
+        # DBから全件読み込み直して差し替える
+        self._generation += 1
+        generation = self._generation
+        categories = await self.loader()
+        if generation != self._generation:
+            # 後から始めた読み込みの結果を使う
+            return
+        version = self.snapshot.version + 1 if self.snapshot is not None else 1
+        self.snapshot = CategorySnapshot(version, categories)
+
+    def schedule_reload(self) -> None:
+        # 他のワーカーでカテゴリが変わったときなど、awaitできないところから読み込み直しを予約する
+        task = asyncio.get_running_loop().create_task(self._reload_logging_errors())
+        self._reload_tasks.add(task)
+        task.add_done_callback(self._reload_tasks.discard)
+
+    def apply(self, category: Category) -> None:
+        # このワーカーで書き込んだカテゴリを、DBに問い合わせずに反映する
+        if self.snapshot is None:
+            return
+        self.snapshot = self.snapshot.with_category(category)
+        if self._reload_tasks:
+            # 読み込み中の内容はこの書き込みより古いかもしれないので、読み込み直す
+            self.schedule_reload()
+
+    def known_ids(self, category_ids: set[int]) -> set[int]:
+        # 指定のIDのうち、カタログにあるもの(読み込み前なら空)
+        if self.snapshot is None:
+            return set()
+        return category_ids & self.snapshot.id_set
+
+    async def _reload_logging_errors(self) -> None:
+        try:
+            await self.reload()
+        except Exception:
+            logger.warning("failed to reload category catalog", exc_info=True)
@@ -0,0 +1,108 @@
+# ④Infrastructure層 = プロセス(ワーカー)間のキャッシュ無効化
+# app/infrastructure/cache/invalidation_bus.py
+# uvicornのワーカーが複数あると、他のワーカーで更新されたItem・Categoryのキャッシュが古いまま残ってしまう。
+# PostgresのLISTEN/NOTIFYで「どのItem・Categoryが変わったか」を全ワーカーに知らせ、各ワーカーのキャッシュを消す
+#
+# 送信側: publish()で変更を予約しておくと、そのセッションのcommit直前にpg_notifyを実行する
+#         (NOTIFYはcommitされたときにだけ届くので、ロールバックした変更は通知されない)
+# 受信側: InvalidationListenerがアプリ起動時(lifespan)にバックグラウンドタスクとしてLISTENし、届いたらキャッシュを消す
+import asyncio
+import json
+import logging
+from typing import Any
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+from app.infrastructure.cache.repository_caches import RepositoryCaches
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "repository_invalidation"
+# NOTIFYのペイロードは8000バイトまでなので、IDが多いときは分けて送る
+IDS_PER_NOTIFY = 500
+_PENDING_KEY = "pending_invalidations"
+
+
+def publish(db: AsyncSession, kind: str, ids: list[int]) -> None:
+    # kindは"item"か"category"。このセッションがcommitするときに通知する
+    if ids:
+        db.sync_session.info.setdefault(_PENDING_KEY, []).append((kind, list(ids)))
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session) -> None:
+    # commitと同じトランザクションの中でpg_notifyを実行する
+    for kind, ids in session.info.pop(_PENDING_KEY, []):
+        for payload in notify_payloads(kind, ids):
+            session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+def notify_payloads(kind: str, ids: list[int]) -> list[str]:
+    # pg_notifyのペイロード(IDが多いときはIDS_PER_NOTIFY個ずつに分ける)
+    return [json.dumps({"kind": kind, "ids": ids[i:i + IDS_PER_NOTIFY]}) for i in range(0, len(ids), IDS_PER_NOTIFY)]
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+class InvalidationListener:
+    def __init__(self, caches: RepositoryCaches, engine: AsyncEngine, retry_seconds: float = 1.0):
+        self.caches = caches
+        self.engine = engine
+        self.retry_seconds = retry_seconds
+        # LISTENを開始できたらセットされる(テストで、通知を受け取れる状態になるまで待つのに使う)
+        self.ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # 接続が切れたら、つなぎ直してLISTENし直す
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("cache invalidation listener disconnected", exc_info=True)
+            self.ready.clear()
+            # つながっていなかった間の通知は受け取れていないので、キャッシュを全部捨てる
+            self.caches.clear()
+            await asyncio.sleep(self.retry_seconds)
+
+    async def _listen(self) -> None:
+        # エンジンの接続プールから接続を1つ借り、そのasyncpgの接続でLISTENし続ける
+        conn = await self.engine.connect()
+        try:
+            raw = await conn.get_raw_connection()
+            driver: Any = raw.driver_connection
+            lost = asyncio.Event()
+            driver.add_termination_listener(lambda _conn: lost.set())
+            await driver.add_listener(CHANNEL, self._on_notify)
+            self.ready.set()
+            await lost.wait()
+        finally:
+            # LISTEN中の接続はプールに戻さず捨てる(他のリクエストで通知を受け取ってしまわないように)
+            await conn.invalidate()
+            await conn.close()
+
+    def _on_notify(self, _conn: Any, _pid: int, _channel: str, payload: str) -> None:
+        message = json.loads(payload)
+        if message["kind"] == "item":
+            for item_id in message["ids"]:
+                self.caches.invalidate_item(item_id)
+        elif message["kind"] == "category":
+            for category_id in message["ids"]:
+                self.caches.invalidate_category(category_id)
@@ -0,0 +1,72 @@
+# ④Infrastructure層 = プロセス内キャッシュ
+# app/infrastructure/cache/lru_ttl_cache.py
+# 件数の上限(LRU: 最も長く使われていないものから捨てる)と有効期限(TTL)つきのキャッシュ
+# イベントループ1つの中でだけ使う前提(途中でawaitしないので、ロックは不要)
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+
+class LRUTTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # キー -> (有効期限の時刻, 値)。先頭ほど長く使われていない
+        self._entries: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        # キャッシュのサイズ調整用の統計値
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Any) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Any) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> None:
+        # 値がpredicateに当てはまるものをすべて消す(件数は上限までなので全件見てもよい)
+        for key in [k for k, (_, value) in self._entries.items() if predicate(value)]:
+            self.invalidate(key)
+
+    def clear(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
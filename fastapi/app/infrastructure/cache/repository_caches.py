@@ -0,0 +1,55 @@
+# ④Infrastructure層 = プロセス内キャッシュ
+# app/infrastructure/cache/repository_caches.py
+# アプリ(FastAPIのインスタンス)ごとに1つ作り、app.stateに持たせる。リクエストをまたいで共有するキャッシュ一式
+from fastapi import Request
+from app.domain.category import Category
+from app.infrastructure.cache.cached_item_repo import references_category
+from app.infrastructure.cache.category_catalog import CategoryCatalog
+from app.infrastructure.cache.lru_ttl_cache import LRUTTLCache
+from app.settings import CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+
+
+class RepositoryCaches:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS,
+                 category_catalog: CategoryCatalog | None = None):
+        self.items = LRUTTLCache(max_entries, ttl_seconds)
+        self.categories = LRUTTLCache(max_entries, ttl_seconds)
+        self.category_catalog = category_catalog
+
+    def invalidate_item(self, item_id: int) -> None:
+        self.items.invalidate(item_id)
+
+    def invalidate_category(self, category_id: int) -> None:
+        # 他のワーカーでカテゴリが変わったとき
+        # カテゴリと、そのカテゴリを参照しているItemのキャッシュを消し、カタログは読み込み直す
+        self._invalidate_category(category_id)
+        if self.category_catalog is not None:
+            self.category_catalog.schedule_reload()
+
+    def category_written(self, category: Category) -> None:
+        # このワーカーでカテゴリを書き込んだとき(カタログはDBに問い合わせずに反映する)
+        self._invalidate_category(category.id)
+        if self.category_catalog is not None:
+            self.category_catalog.apply(category)
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.categories.clear()
+        if self.category_catalog is not None:
+            self.category_catalog.schedule_reload()
+
+    def stats(self) -> dict[str, dict[str, int | float]]:
+        stats: dict[str, dict[str, int | float]] = {"items": self.items.stats(), "categories": self.categories.stats()}
+        if self.category_catalog is not None and self.category_catalog.snapshot is not None:
+            snapshot = self.category_catalog.snapshot
+            stats["category_catalog"] = {"version": snapshot.version, "size": len(snapshot.ids)}
+        return stats
+
+    def _invalidate_category(self, category_id: int) -> None:
+        self.categories.invalidate(category_id)
+        self.items.invalidate_where(lambda cached: references_category(cached, category_id))
+
+
+# ルータのDIチェーンで使う。そのリクエストを処理しているアプリのキャッシュを返す
+def get_repository_caches(request: Request) -> RepositoryCaches:
+    return request.app.state.caches
@@ -0,0 +1,6 @@
+# infrastructure/memory/__init__.py
+from .repositories.category_repo_impl import InMemoryCategoryRepository
+from .repositories.item_repo_impl import InMemoryItemRepository
+from .store import InMemoryStore
+
+__all__ = ["InMemoryCategoryRepository", "InMemoryItemRepository", "InMemoryStore"]
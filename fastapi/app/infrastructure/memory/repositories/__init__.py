@@ -0,0 +1 @@
+# infrastructure/memory/repositories/__init__.py
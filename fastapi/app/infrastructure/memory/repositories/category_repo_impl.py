@@ -0,0 +1,41 @@
+# ④Infrastructure層 = 実装(具象)リポジトリ (メモリ内版)
+# app/infrastructure/memory/repositories/category_repo_impl.py
+from app.domain.category import Category
+from app.infrastructure.memory.store import InMemoryStore, page_after
+from app.repository.category_repository import CategoryRepository # ②の抽象リポジトリ
+from app.repository.exceptions import VersionConflictError
+
+
+class InMemoryCategoryRepository(CategoryRepository):
+    # ②の抽象リポジトリを継承して実装
+    def __init__(self, store: InMemoryStore):
+        self.store = store
+
+    async def save(self, category: Category) -> None:
+        if category.id is None:
+            category.id = self.store.next_category_id()
+        self.store.insert_category(category.id, category.name)
+
+    async def list_all(self, after: int | None = None, limit: int | None = None) -> list[Category]:
+        categories = self.store.categories
+        return [
+            Category(category_id, categories[category_id][0], version=categories[category_id][1])
+            for category_id in page_after(self.store.category_ids, after, limit)
+        ]
+
+    async def get_by_id(self, category_id: int) -> Category | None:
+        row = self.store.categories.get(category_id)
+        return Category(category_id, row[0], version=row[1]) if row is not None else None
+
+    async def next_identifier(self) -> int:
+        return self.store.next_category_id()
+
+    async def update(self, category: Category, expected_version: int | None = None) -> None:
+        # 存在しなければValueError(SQLAlchemy版と同じ)
+        row = self.store.categories.get(category.id)
+        if row is None:
+            raise ValueError(f"Category with ID {category.id} not found.")
+        if expected_version is not None and row[1] != expected_version:
+            raise VersionConflictError(row[1])
+        category.version = row[1] + 1
+        self.store.categories[category.id] = (category.name, category.version)
@@ -0,0 +1,154 @@
+# ④Infrastructure層 = 実装(具象)リポジトリ (メモリ内版)
+# app/infrastructure/memory/repositories/item_repo_impl.py
+# SQLAlchemyItemRepositoryと同じ約束ごと(tests/test_repository_contract.py)を、InMemoryStoreの辞書とインデックスで実装する
+# 呼び出しの途中でawaitしないので、1回の呼び出しは他のリクエストに割り込まれない(トランザクションの代わり)
+# 返すItemは毎回新しく作る(呼び出し側が書き換えても、置き場の中身は変わらない)
+import bisect
+import re
+from collections.abc import AsyncIterator
+from typing import NoReturn
+from app.domain.items import Item
+from app.infrastructure.memory.store import InMemoryStore, page_after
+from app.repository.exceptions import VersionConflictError
+from app.repository.item_repository import CategoryMatch, ItemRepository, NameSearchMode  # ②の抽象リポジトリ
+
+# pg_trgmの「%」のしきい値(pg_trgm.similarity_thresholdのデフォルト)
+SIMILARITY_THRESHOLD = 0.3
+
+
+class InMemoryItemRepository(ItemRepository):
+    # ②の抽象リポジトリを継承して実装
+    def __init__(self, store: InMemoryStore):
+        self.store = store
+
+    async def save(self, item: Item) -> None:
+        # 存在するカテゴリIDだけを紐づける(エンティティの状態も実際に紐づいたものにそろえる)
+        if item.id is None:
+            item.id = self.store.next_item_ids(1)[0]
+        item.category_ids = self._existing(item.category_ids or [])
+        self.store.insert_item(item.id, item.name, item.category_ids)
+
+    async def save_many(self, items: list[Item]) -> None:
+        for item in items:
+            await self.save(item)
+
+    async def list_all(self, after: int | None = None, limit: int | None = None,
+                       category_ids: list[int] | None = None, match: CategoryMatch = "any") -> list[Item]:
+        # item_idの昇順で、afterより大きいIDのものをlimit件
+        if not category_ids:
+            return self._items(page_after(self.store.item_ids, after, limit))
+        # カテゴリでの絞り込みは、逆引きのインデックスから対象のIDだけを集める(Item全件は見ない)
+        lists = [self.store.category_items.get(c, []) for c in set(category_ids)]
+        if match == "all":
+            matched = set(min(lists, key=len)).intersection(*lists)
+        else:
+            matched = set().union(*lists)
+        return self._items(page_after(sorted(matched), after, limit))
+
+    async def list_by_category(self, category_id: int, after: int | None = None, limit: int | None = None) -> list[Item]:
+        return self._items(page_after(self.store.category_items.get(category_id, []), after, limit))
+
+    async def search_by_name(self, key: str, mode: NameSearchMode, limit: int) -> list[Item]:
+        if mode == "prefix":
+            # (lower(name), item_id)の昇順のリストで、前方一致する範囲だけを読む
+            names = self.store.names
+            start = bisect.bisect_left(names, (key,))
+            ids = []
+            for name, item_id in names[start:start + limit]:
+                if not name.startswith(key):
+                    break
+                ids.append(item_id)
+            return self._items(ids)
+        # 似ている名前はインデックスがないので全件と比べる(pg_trgmと同じ計算)
+        key_trigrams = _trigrams(key)
+        scored = []
+        for item_id, row in self.store.items.items():
+            score = _similarity(key_trigrams, _trigrams(row.name.lower()))
+            if score >= SIMILARITY_THRESHOLD:
+                scored.append((-score, item_id))
+        return self._items([item_id for _, item_id in sorted(scored)[:limit]])
+
+    async def stream_all(self, chunk_size: int) -> AsyncIterator[list[Item]]:
+        ids = list(self.store.item_ids)
+        for i in range(0, len(ids), chunk_size):
+            yield self._items(ids[i:i + chunk_size])
+
+    async def get_by_id(self, item_id: int) -> Item | None:
+        row = self.store.items.get(item_id)
+        return Item(item_id, row.name, list(row.category_ids), version=row.version) if row is not None else None
+
+    async def get_many(self, item_ids: list[int]) -> list[Item]:
+        return self._items([item_id for item_id in dict.fromkeys(item_ids) if item_id in self.store.items])
+
+    async def next_identifier(self) -> int:
+        return self.store.next_item_ids(1)[0]
+
+    async def next_identifiers(self, count: int) -> list[int]:
+        return self.store.next_item_ids(count)
+
+    async def get_version(self, item_id: int) -> int | None:
+        row = self.store.items.get(item_id)
+        return row.version if row is not None else None
+
+    async def update(self, item: Item, expected_version: int | None = None) -> list[int]:
+        patched, rejected = await self.patch(item.id, name=item.name, category_ids=item.category_ids or [],
+                                             expected_version=expected_version)
+        item.category_ids = patched.category_ids
+        item.version = patched.version
+        return rejected
+
+    async def patch(self, item_id: int, name: str | None = None, category_ids: list[int] | None = None,
+                    expected_version: int | None = None) -> tuple[Item, list[int]]:
+        row = self._row_for_write(item_id, expected_version)
+        if name is not None:
+            self.store.rename_item(item_id, name)
+        row.version += 1
+        if category_ids is None:
+            return Item(item_id, row.name, list(row.category_ids), version=row.version), []
+        requested = list(dict.fromkeys(category_ids))
+        accepted = self._existing(requested)
+        self.store.set_item_categories(item_id, accepted)
+        return Item(item_id, row.name, accepted, version=row.version), [c for c in requested if c not in accepted]
+
+    async def delete(self, item_id: int, expected_version: int | None = None) -> None:
+        self._row_for_write(item_id, expected_version)
+        self.store.delete_item(item_id)
+
+    async def delete_many(self, item_ids: list[int]) -> list[int]:
+        deleted = [item_id for item_id in dict.fromkeys(item_ids) if item_id in self.store.items]
+        for item_id in deleted:
+            self.store.delete_item(item_id)
+        return deleted
+
+    def _items(self, item_ids: list[int]) -> list[Item]:
+        items = self.store.items
+        return [Item(i, items[i].name, list(items[i].category_ids), version=items[i].version) for i in item_ids]
+
+    def _existing(self, category_ids: list[int]) -> list[int]:
+        # 存在するカテゴリIDだけを、重複を除いて指定の順に
+        return [c for c in dict.fromkeys(category_ids) if c in self.store.categories]
+
+    def _row_for_write(self, item_id: int, expected_version: int | None):
+        row = self.store.items.get(item_id)
+        if row is None:
+            _raise_not_found(item_id)
+        if expected_version is not None and row.version != expected_version:
+            raise VersionConflictError(row.version)
+        return row
+
+
+def _raise_not_found(item_id: int) -> NoReturn:
+    raise ValueError(f"Item with ID {item_id} not found.")
+
+
+def _trigrams(value: str) -> set[str]:
+    # pg_trgmと同じく、英数字の並び(単語)ごとに前に空白2つ・後ろに空白1つを付けて、3文字ずつに区切る
+    trigrams = set()
+    for word in re.findall(r"[^\W_]+", value):
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def _similarity(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
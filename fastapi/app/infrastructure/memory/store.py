@@ -0,0 +1,94 @@
+# ④Infrastructure層 = メモリ内のデータ置き場
+# app/infrastructure/memory/store.py
+# REPOSITORY_BACKEND=memoryのときに、DBの代わりにItem・カテゴリを持つ(プロセスを終了すると消える)
+# DBなしでDIチェーン・ユースケース・レスポンスのJSON化にかかる時間を測るためのもの(benchmarks/bench_framework.py)
+# 一覧・絞り込み・検索がDB版と同じ計算量になるよう、テーブルのインデックスに当たるものも持つ
+#   item_ids       : item_idの昇順のリスト(主キーのインデックス。キーセットページングで使う)
+#   names          : (lower(item_name), item_id)の昇順のリスト(lower(item_name)のインデックス。前方一致検索で使う)
+#   category_items : category_id → item_idの昇順のリスト(中間テーブルの(category_id, item_id)のインデックス。逆引きで使う)
+import bisect
+from fastapi import Request
+
+
+class StoredItem:
+    # 1行分。category_idsは昇順
+    __slots__ = ("category_ids", "name", "version")
+
+    def __init__(self, name: str, category_ids: list[int], version: int):
+        self.name = name
+        self.category_ids = category_ids
+        self.version = version
+
+
+class InMemoryStore:
+    def __init__(self):
+        self.items: dict[int, StoredItem] = {}
+        self.item_ids: list[int] = []
+        self.names: list[tuple[str, int]] = []
+        self.category_items: dict[int, list[int]] = {}
+        # category_id → (category_name, version)
+        self.categories: dict[int, tuple[str, int]] = {}
+        self.category_ids: list[int] = []
+        # シーケンスの代わり(最後に払い出したID)
+        self.last_item_id = 0
+        self.last_category_id = 0
+
+    def next_item_ids(self, count: int) -> list[int]:
+        start = self.last_item_id + 1
+        self.last_item_id += count
+        return list(range(start, self.last_item_id + 1))
+
+    def next_category_id(self) -> int:
+        self.last_category_id += 1
+        return self.last_category_id
+
+    def insert_item(self, item_id: int, name: str, category_ids: list[int]) -> None:
+        # IDを指定して入れたときも、シーケンスの代わりの値は追い越されないようにする
+        self.last_item_id = max(self.last_item_id, item_id)
+        self.items[item_id] = StoredItem(name, sorted(category_ids), 1)
+        bisect.insort(self.item_ids, item_id)
+        bisect.insort(self.names, (name.lower(), item_id))
+        for category_id in category_ids:
+            bisect.insort(self.category_items.setdefault(category_id, []), item_id)
+
+    def rename_item(self, item_id: int, name: str) -> None:
+        row = self.items[item_id]
+        _remove(self.names, (row.name.lower(), item_id))
+        row.name = name
+        bisect.insort(self.names, (name.lower(), item_id))
+
+    def set_item_categories(self, item_id: int, category_ids: list[int]) -> None:
+        row = self.items[item_id]
+        for category_id in set(row.category_ids) - set(category_ids):
+            _remove(self.category_items[category_id], item_id)
+        for category_id in set(category_ids) - set(row.category_ids):
+            bisect.insort(self.category_items.setdefault(category_id, []), item_id)
+        row.category_ids = sorted(category_ids)
+
+    def delete_item(self, item_id: int) -> None:
+        row = self.items.pop(item_id)
+        _remove(self.item_ids, item_id)
+        _remove(self.names, (row.name.lower(), item_id))
+        for category_id in row.category_ids:
+            _remove(self.category_items[category_id], item_id)
+
+    def insert_category(self, category_id: int, name: str) -> None:
+        self.last_category_id = max(self.last_category_id, category_id)
+        self.categories[category_id] = (name, 1)
+        bisect.insort(self.category_ids, category_id)
+
+
+def _remove(sorted_list: list, value) -> None:
+    index = bisect.bisect_left(sorted_list, value)
+    if index < len(sorted_list) and sorted_list[index] == value:
+        del sorted_list[index]
+
+
+def page_after(sorted_ids: list[int], after: int | None, limit: int | None) -> list[int]:
+    # 昇順のIDのリストから、afterより大きいものをlimit件(キーセットページング)
+    start = 0 if after is None else bisect.bisect_right(sorted_ids, after)
+    return sorted_ids[start:] if limit is None else sorted_ids[start:start + limit]
+
+
+def get_memory_store(request: Request) -> InMemoryStore:
+    return request.app.state.memory_store
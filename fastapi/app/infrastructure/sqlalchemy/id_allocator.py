@@ -0,0 +1,46 @@
+# ④Infrastructure層 = ID採番
+# app/infrastructure/sqlalchemy/id_allocator.py
+# PostgresのシーケンスからIDを採番する。
+# 「テーブルの最大ID+1」方式と違い、同時に作成しても同じIDが払い出されることはない(nextvalは同時実行でも重複しない)
+# さらにblock_size個ずつまとめてIDを予約しておき、予約分がある間はDBに問い合わせずメモリから払い出す
+from collections import deque
+from collections.abc import Awaitable, Callable
+from functools import partial
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.settings import ID_BLOCK_SIZE
+
+
+class SequenceIdAllocator:
+    def __init__(self, sequence_name: str, block_size: int):
+        self.sequence_name = sequence_name
+        self.block_size = max(1, block_size)
+        # 予約済みで、まだ払い出していないID(プロセス内で共有)
+        self._reserved: deque[int] = deque()
+
+    async def next_ids(self, db: AsyncSession, count: int) -> list[int]:
+        # count個のIDを払い出す。予約が足りないときだけDBからまとめて予約する
+        return await self.take(count, partial(self._reserve, db))
+
+    async def take(self, count: int, reserve: Callable[[int], Awaitable[list[int]]]) -> list[int]:
+        # next_idsの本体。reserve(size)でsize個のIDを予約する(SQLAlchemy以外の接続からも使えるよう、予約の方法は呼び出し側が渡す)
+        # 予約の問い合わせ中に他のリクエストが予約分を使うこともあるので、足りるまで繰り返す
+        # (同時に予約しに行っても、それぞれ別のIDが予約されるだけなので重複はしない)
+        while len(self._reserved) < count:
+            need = count - len(self._reserved)
+            self._reserved.extend(await reserve(max(need, self.block_size)))
+        return [self._reserved.popleft() for _ in range(count)]
+
+    async def _reserve(self, db: AsyncSession, size: int) -> list[int]:
+        # nextvalをsize回呼んで、size個のIDを1回の問い合わせで予約する
+        # (nextvalはトランザクションの外で確定するので、このセッションがロールバックしても他と重複しない)
+        result = await db.execute(
+            text(f"SELECT nextval('{self.sequence_name}') FROM generate_series(1, :size)"),
+            {"size": size},
+        )
+        return list(result.scalars().all())
+
+
+# シーケンスごとに1つ(プロセス内で共有する)
+item_id_allocator = SequenceIdAllocator("public.items_item_id_seq", ID_BLOCK_SIZE)
+category_id_allocator = SequenceIdAllocator("public.categories_category_id_seq", ID_BLOCK_SIZE)
@@ -16,6 +16,8 @@ class CategoryORM(Base):
 
     category_id: Mapped[int] = mapped_column(primary_key=True, index=True)
     category_name: Mapped[str] = mapped_column(String, nullable=False)
+    # 更新のたびに+1するバージョン番号(ETagと、If-Matchによる楽観的排他制御に使う)
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
     # カテゴリに属する商品一覧を取得する場合は↓が必要になる。
     # category対Item = 一対多
     items: Mapped[list["ItemORM"]] = relationship(
@@ -1,11 +1,13 @@
 # 中間テーブル itemとcateogoryの多対多の関係を表す
 # しかし、ItemOrmとかのようにOrmクラスを定義する必要はない。直接sqlalchemyのTableを使って定義する。
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from sqlalchemy import Table, Column, Index, Integer, ForeignKey
 from app.db.base import Base
 
 item_category = Table(
     "item_category",
     Base.metadata,
     Column("item_id", Integer, ForeignKey("items.item_id", ondelete="CASCADE"), primary_key=True),
-    Column("category_id", Integer, ForeignKey("categories.category_id", ondelete="CASCADE"), primary_key=True)
+    Column("category_id", Integer, ForeignKey("categories.category_id", ondelete="CASCADE"), primary_key=True),
+    # カテゴリ→Itemの逆引き用(ddl.sqlと同じ)
+    Index("item_category_category_id_item_id_idx", "category_id", "item_id"),
 )
@@ -16,6 +16,8 @@ class ItemORM(Base):
 
     item_id: Mapped[int] = mapped_column(primary_key=True, index=True)
     item_name: Mapped[str] = mapped_column(String, nullable=False)
+    # 更新のたびに+1するバージョン番号(ETagと、If-Matchによる楽観的排他制御に使う)
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
     # カテゴリは、listとして扱う。
     # relationshipを使って、CategoryORMとの多対多の関係を定義し、直接の相手はCategoryORMではなく、item_categoryという中間テーブルを使う。
     categories: Mapped[list["CategoryORM"]] = relationship(
@@ -1,26 +1,36 @@
 # ④Infrastructure層 = 実装(具象)リポジトリ
 # app/infrastructure/sqlalchemy/repositories/category_repo_impl.py
+from typing import NoReturn
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from app.infrastructure.sqlalchemy.id_allocator import category_id_allocator
 from app.infrastructure.sqlalchemy.models.category_orm import CategoryORM
 from app.domain.category import Category
 from app.repository.category_repository import CategoryRepository # ②の抽象リポジトリ
+from app.repository.exceptions import VersionConflictError
 
 class SQLAlchemyCategoryRepository(CategoryRepository):
     #  ②の抽象リポジトリを継承して実装
+    # 書き込みはflushまでで、commitはしない。リクエストの最後にUnitOfWorkがまとめてcommitする
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def save(self, category: Category) -> None:
         orm = CategoryORM(category_id=category.id, category_name=category.name)
         self.db.add(orm)
-        await self.db.commit()
-        await self.db.refresh(orm)
+        await self.db.flush()
         category.id = orm.category_id   # ①のエンティティへIDを返す
 
-    async def list_all(self) -> list[Category]:
-        res = await self.db.execute(select(CategoryORM))
-        return [Category(r.category_id, r.category_name) for r in res.scalars().all()]
+    async def list_all(self, after: int | None = None, limit: int | None = None) -> list[Category]:
+        # category_idの昇順で、afterより大きいIDのものをlimit件だけ取得する(キーセットページング)
+        stmt = select(CategoryORM).order_by(CategoryORM.category_id)
+        if after is not None:
+            stmt = stmt.filter(CategoryORM.category_id > after)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        res = await self.db.execute(stmt)
+        return [Category(r.category_id, r.category_name, version=r.version) for r in res.scalars().all()]
 
     async def get_by_id(self, category_id: int) -> Category | None:
         # Itemの詳細取得に使う
@@ -30,21 +40,36 @@ class SQLAlchemyCategoryRepository(CategoryRepository):
         row = result.scalar_one_or_none()
         if row is None:
             return None
-        return Category(category_id=row.category_id, name=row.category_name)
+        return Category(category_id=row.category_id, name=row.category_name, version=row.version)
     
     async def next_identifier(self) -> int:
         # カテゴリのIDを生成するためのメソッド
-        # 最新のID値(=categoryテーブルの最大のid値)を持つレコードを取得
-        result = await self.db.execute(select(CategoryORM.category_id).order_by(CategoryORM.category_id.desc()).limit(1))
-        # そのレコードのID値を取得
-        row = result.scalar_one_or_none()
-        # もしレコードが存在しない場合は1を返す
-        # 存在する場合はそのID値に1を足して返す
-        return (row + 1) if row is not None else 1
+        # categoriesテーブルのシーケンスから採番する(予約済みのIDがあればDBには問い合わせない)
+        return (await category_id_allocator.next_ids(self.db, 1))[0]
+
+    async def update(self, category: Category, expected_version: int | None = None) -> None:
+        # カテゴリ名の更新に使う
+        # 事前に読み込まず、UPDATE ... RETURNINGの1文で更新する(SQLAlchemyItemRepository.patchと同じ)
+        # expected_versionの指定があるときは、UPDATEのWHEREにバージョンを入れる(比較と更新が1文なので行ロックは不要)
+        stmt = (
+            update(CategoryORM)
+            .where(CategoryORM.category_id == category.id)
+            .values(category_name=category.name, version=CategoryORM.version + 1)
+            .returning(CategoryORM.version)
+        )
+        if expected_version is not None:
+            stmt = stmt.where(CategoryORM.version == expected_version)
+        version = (await self.db.execute(stmt)).scalar_one_or_none()
+        if version is None:
+            await self._raise_not_updated(category.id, expected_version)
+        category.version = version
 
-    async def update(self, category: Category) -> None:
-        # Itemの更新に使う
-        db_item = await self.db.get(CategoryORM, category.id)
-        if db_item:
-            db_item.category_name = category.name
-            await self.db.commit()
\ No newline at end of file
+    async def _raise_not_updated(self, category_id: int, expected_version: int | None) -> NoReturn:
+        # UPDATEの対象が0行だったとき、存在しないのか、バージョンが違うのかを調べて送出する(調べるのは失敗したときだけ)
+        current = None
+        if expected_version is not None:
+            result = await self.db.execute(select(CategoryORM.version).filter(CategoryORM.category_id == category_id))
+            current = result.scalar_one_or_none()
+        if current is None:
+            raise ValueError(f"Category with ID {category_id} not found.")
+        raise VersionConflictError(current)
@@ -1,122 +1,354 @@
 # ④Infrastructure層 = 実装(具象)リポジトリ
 # app/infrastructure/sqlalchemy/repositories/item_repo_impl.py
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING, NoReturn
+from sqlalchemy import delete, exists, func, insert, literal, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from app.infrastructure.sqlalchemy.id_allocator import item_id_allocator
 from app.infrastructure.sqlalchemy.models.item_orm import ItemORM
 from app.infrastructure.sqlalchemy.models.category_orm import CategoryORM
+from app.infrastructure.sqlalchemy.models.item_category_association import item_category
 from app.domain.items import Item
-from app.repository.item_repository import ItemRepository  # ②の抽象リポジトリ
+from app.repository.exceptions import VersionConflictError
+from app.repository.item_repository import CategoryMatch, ItemRepository, NameSearchMode  # ②の抽象リポジトリ
+
+if TYPE_CHECKING:
+    from app.infrastructure.cache.category_catalog import CategoryCatalog
+
+
+# 複数行INSERTの1文あたりの行数(Postgresの1文あたりのバインド変数の上限(32767個)を超えないようにする)
+BULK_INSERT_BATCH_SIZE = 1000
 
 
 class SQLAlchemyItemRepository(ItemRepository):
     # ②の抽象リポジトリを継承して実装
-    def __init__(self, db: AsyncSession):
+    # 書き込みはflush(またはSQLの実行)までで、commitはしない。リクエストの最後にUnitOfWorkがまとめてcommitする
+    def __init__(self, db: AsyncSession, category_catalog: "CategoryCatalog | None" = None):
         self.db = db
+        # カテゴリIDの存在チェックに使うメモリ内カタログ(なければ毎回DBで確認する)
+        self.category_catalog = category_catalog
 
     async def save(self, item: Item) -> None:
         # Itemの追加など保存時に使う
-            
-        # CategoryORMインスタンスを取得(item.category_idsで直接ItemORMを取得しない。いちいち、リストの長さ分CategoryORMを検索する)
-        categories = []
+        # 存在するカテゴリIDだけを紐づける(エンティティの状態も実際に紐づいたものにそろえる)
+        existing = await self._existing_category_ids(item.category_ids or [])
+        item.category_ids = [category_id for category_id in dict.fromkeys(item.category_ids or []) if category_id in existing]
+
+        orm = ItemORM(item_id=item.id, item_name=item.name)
+        self.db.add(orm)
+        await self.db.flush()
         if item.category_ids:
-            result = await self.db.execute(
-                select(CategoryORM).filter(
-                    CategoryORM.category_id.in_(item.category_ids)
-                )
+            await self.db.execute(
+                insert(item_category).values([{"item_id": item.id, "category_id": c} for c in item.category_ids])
             )
-            categories = result.scalars().all()
-        
-        orm = ItemORM(
-            item_id=item.id,
-            item_name=item.name,
-            categories=categories
-        )
-        
-        self.db.add(orm)
-        await self.db.commit()
-        await self.db.refresh(orm)
         item.id = orm.item_id   # ①のエンティティへIDを返す
 
-    async def list_all(self) -> list[Item]:
+    async def save_many(self, items: list[Item]) -> None:
+        # Itemの一括保存に使う
+        # saveのようにItemごとにINSERT・commitせず、
+        # ①存在するカテゴリIDを確認 ②itemsへ複数行INSERT ③item_categoryへ複数行INSERT をひとつのトランザクションで行う
+        if not items:
+            return
+
+        existing = await self._existing_category_ids([c for item in items for c in item.category_ids or []])
+
+        # saveと同じく、存在しないカテゴリIDは紐づけない(エンティティの状態も実際に紐づいたものにそろえる)
+        # 重複したIDは中間テーブルの主キー違反になるので1つにまとめる
+        for item in items:
+            item.category_ids = [category_id for category_id in dict.fromkeys(item.category_ids or []) if category_id in existing]
+
+        item_rows = [{"item_id": item.id, "item_name": item.name} for item in items]
+        pair_rows = [{"item_id": item.id, "category_id": category_id} for item in items for category_id in item.category_ids or []]
+        for i in range(0, len(item_rows), BULK_INSERT_BATCH_SIZE):
+            await self.db.execute(insert(ItemORM.__table__).values(item_rows[i:i + BULK_INSERT_BATCH_SIZE]))
+        for i in range(0, len(pair_rows), BULK_INSERT_BATCH_SIZE):
+            await self.db.execute(insert(item_category).values(pair_rows[i:i + BULK_INSERT_BATCH_SIZE]))
+
+    async def list_all(self, after: int | None = None, limit: int | None = None,
+                       category_ids: list[int] | None = None, match: CategoryMatch = "any") -> list[Item]:
         # Itemの一覧取得時に使う
-        res = await self.db.execute(
-            select(ItemORM).options(selectinload(ItemORM.categories))
+        # item_idの昇順で、afterより大きいIDのものをlimit件だけ取得する(キーセットページング)
+        # OFFSETと違い、何ページ目でも主キーのインデックスで開始位置に直接たどり着ける
+        return [_row_to_item(r) for r in await self.db.execute(_list_statement(after, limit, category_ids, match))]
+
+    async def list_by_category(self, category_id: int, after: int | None = None, limit: int | None = None) -> list[Item]:
+        # カテゴリに属するItemの一覧(カテゴリ→Itemの逆引き)
+        # 中間テーブルを(category_id, item_id)のインデックスで絞り込み・並べ替えるので、Item全体の件数が増えても、
+        # そのカテゴリの、そのページの分しか読まない
+        # (絞り込み用の中間テーブルは、カテゴリIDを集めるほうとは別名で結合する)
+        in_category = item_category.alias("in_category")
+        stmt = (
+            _items_with_category_ids()
+            .join(in_category, in_category.c.item_id == ItemORM.item_id)
+            .filter(in_category.c.category_id == category_id)
+            .order_by(ItemORM.item_id)
         )
-        items = []
-        for r in res.scalars().all():
-            category_ids = [cat.category_id for cat in r.categories]
-            items.append(Item(r.item_id, r.item_name, category_ids))
-        return items
+        if after is not None:
+            stmt = stmt.filter(in_category.c.item_id > after)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return [_row_to_item(r) for r in await self.db.execute(stmt)]
+
+    async def search_by_name(self, key: str, mode: NameSearchMode, limit: int) -> list[Item]:
+        # 名前検索
+        return [_row_to_item(r) for r in await self.db.execute(_search_statement(key, mode, limit))]
+
+    async def stream_all(self, chunk_size: int) -> AsyncIterator[list[Item]]:
+        # 全件エクスポート時に使う
+        # session.stream()でサーバサイドカーソルを開き、chunk_size行ずつDBから受け取りながらchunk_size件ずつItemを返す
+        # 全件をlistにためないので、件数が増えてもメモリ使用量は一定
+        # selectinloadは使わず、中間テーブルをLEFT JOINしてitem_id順に並べ、同じitem_idの行をまとめて1つのItemにする
+        stmt = (
+            select(ItemORM.item_id, ItemORM.item_name, ItemORM.version, item_category.c.category_id)
+            .outerjoin(item_category, item_category.c.item_id == ItemORM.item_id)
+            .order_by(ItemORM.item_id, item_category.c.category_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.db.stream(stmt)
+        chunk: list[Item] = []
+        current: Item | None = None
+        category_ids: list[int] = []
+        async for rows in result.partitions():
+            for item_id, item_name, version, category_id in rows:
+                if current is None or current.id != item_id:
+                    if current is not None:
+                        chunk.append(current)
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                    category_ids = []
+                    current = Item(item_id, item_name, category_ids, version=version)
+                if category_id is not None:
+                    category_ids.append(category_id)
+        if current is not None:
+            chunk.append(current)
+        if chunk:
+            yield chunk
 
     async def get_by_id(self, item_id: int) -> Item | None:
         # Itemの詳細取得に使う
-        result = await self.db.execute(
-            select(ItemORM)
-            .options(selectinload(ItemORM.categories))
-            .filter(ItemORM.item_id == item_id)
+        row = (await self.db.execute(_items_with_category_ids().filter(ItemORM.item_id == item_id))).one_or_none()
+        return _row_to_item(row) if row is not None else None
+
+    async def get_many(self, item_ids: list[int]) -> list[Item]:
+        # 複数のItemをまとめて取得する(Item1件ごとにget_by_idを呼ぶ代わりに、IN句の1回のSELECTにする)
+        if not item_ids:
+            return []
+        result = await self.db.execute(_items_with_category_ids().filter(ItemORM.item_id.in_(set(item_ids))))
+        found = {row.item_id: _row_to_item(row) for row in result}
+        return [found[item_id] for item_id in dict.fromkeys(item_ids) if item_id in found]
+
+    async def next_identifier(self) -> int:
+        # アイテムのIDを生成するためのメソッド
+        # itemsテーブルのシーケンスから採番する(予約済みのIDがあればDBには問い合わせない)
+        return (await item_id_allocator.next_ids(self.db, 1))[0]
+
+    async def next_identifiers(self, count: int) -> list[int]:
+        # 一括作成用に、count個のIDをまとめて採番する
+        return await item_id_allocator.next_ids(self.db, count)
+
+    async def get_version(self, item_id: int) -> int | None:
+        # ETagの比較用。カテゴリは読まず、バージョンだけを取得する
+        result = await self.db.execute(select(ItemORM.version).filter(ItemORM.item_id == item_id))
+        return result.scalar_one_or_none()
+
+    async def update(self, item: Item, expected_version: int | None = None) -> list[int]:
+        # Itemの更新に使う(名前もカテゴリも置き換える)。戻り値は、存在しないため紐づけなかったカテゴリID
+        patched, rejected = await self.patch(item.id, name=item.name, category_ids=item.category_ids or [],
+                                             expected_version=expected_version)
+        # エンティティの状態を更新（一貫性のためNoneも空リストに統一）
+        item.category_ids = patched.category_ids
+        item.version = patched.version
+        return rejected
+
+    async def patch(self, item_id: int, name: str | None = None, category_ids: list[int] | None = None,
+                    expected_version: int | None = None) -> tuple[Item, list[int]]:
+        # Itemの一部更新。Noneの項目は変えない。戻り値は(更新後のItem, 存在しないため紐づけなかったカテゴリID)
+        # 事前に読み込まず、①itemsのUPDATE ... RETURNING ②(カテゴリも変えるときだけ)中間テーブルの差分だけを書き換える文 で済ませる
+        # expected_versionの指定があるときは、UPDATEのWHEREにバージョンを入れる(比較と更新が1文なので行ロックは不要)
+        values = {"version": ItemORM.version + 1}
+        if name is not None:
+            values["item_name"] = name
+        stmt = (
+            update(ItemORM)
+            .where(ItemORM.item_id == item_id)
+            .values(**values)
+            .returning(ItemORM.item_id, ItemORM.item_name, ItemORM.version)
         )
-        row = result.scalar_one_or_none()
+        if expected_version is not None:
+            stmt = stmt.where(ItemORM.version == expected_version)
+
+        if category_ids is None:
+            # カテゴリは変えないので、今のカテゴリIDも同じ文の中で集めて返す
+            updated = stmt.cte("updated")
+            current_category_ids = (
+                select(func.array_agg(aggregate_order_by(item_category.c.category_id, item_category.c.category_id)))
+                .where(item_category.c.item_id == updated.c.item_id)
+                .scalar_subquery()
+            )
+            row = (await self.db.execute(
+                select(updated.c.item_id, updated.c.item_name, updated.c.version, current_category_ids)
+            )).one_or_none()
+            if row is None:
+                await self._raise_not_updated(item_id, expected_version)
+            return Item(row[0], row[1], list(row[3] or []), version=row[2]), []
+
+        row = (await self.db.execute(stmt)).one_or_none()
         if row is None:
-            return None
-        category_ids = [cat.category_id for cat in row.categories]
-        return Item(
-            item_id=row.item_id,
-            name=row.item_name,
-            category_ids=category_ids
+            await self._raise_not_updated(item_id, expected_version)
+        # カテゴリの更新処理(存在するカテゴリIDだけを紐づけ直す。空リストの場合はすべてのカテゴリを外す)
+        requested = list(dict.fromkeys(category_ids))
+        accepted = set((await self.db.execute(_replace_categories_statement(item_id, requested))).scalars().all())
+        item = Item(row.item_id, row.item_name, [c for c in requested if c in accepted], version=row.version)
+        return item, [c for c in requested if c not in accepted]
+
+    async def delete(self, item_id: int, expected_version: int | None = None) -> None:
+        # Itemの削除に使う
+        # 読み込まずにDELETE ... RETURNINGの1文で削除し、何も返らなければ存在しない(中間テーブルの行はON DELETE CASCADEで消える)
+        stmt = delete(ItemORM).where(ItemORM.item_id == item_id).returning(ItemORM.item_id)
+        if expected_version is not None:
+            stmt = stmt.where(ItemORM.version == expected_version)
+        if (await self.db.execute(stmt)).scalar_one_or_none() is None:
+            await self._raise_not_updated(item_id, expected_version)
+
+    async def delete_many(self, item_ids: list[int]) -> list[int]:
+        # Itemの一括削除。戻り値は実際に削除したID(存在しなかったIDは含まない)
+        if not item_ids:
+            return []
+        result = await self.db.execute(
+            delete(ItemORM).where(ItemORM.item_id.in_(set(item_ids))).returning(ItemORM.item_id)
         )
-    
-    async def next_identifier(self) -> int:
-        # アイテムのIDを生成するためのメソッド
-        # 最新のID値(=itemテーブルの最大のid値)を持つレコードを取得
+        deleted = set(result.scalars().all())
+        return [item_id for item_id in dict.fromkeys(item_ids) if item_id in deleted]
+
+    async def _raise_not_updated(self, item_id: int, expected_version: int | None) -> NoReturn:
+        # UPDATE/DELETEの対象が0行だったとき、存在しないのか、バージョンが違うのかを調べて送出する(調べるのは失敗したときだけ)
+        current = await self.get_version(item_id) if expected_version is not None else None
+        if current is None:
+            raise ValueError(f"Item with ID {item_id} not found.")
+        raise VersionConflictError(current)
+
+    async def _existing_category_ids(self, category_ids: list[int]) -> set[int]:
+        # 指定のカテゴリIDのうち、存在するもの
+        # カタログにあるIDはDBに問い合わせない。カタログにないIDだけDBで確認する
+        # (他のワーカーで作られたばかりで、まだカタログに反映されていないカテゴリもありうるため)
+        requested = set(category_ids)
+        if not requested:
+            return set()
+        known = self.category_catalog.known_ids(requested) if self.category_catalog is not None else set()
+        unknown = requested - known
+        if not unknown:
+            return known
         result = await self.db.execute(
+            select(CategoryORM.category_id).filter(CategoryORM.category_id.in_(unknown))
+        )
+        return known | set(result.scalars().all())
+
+
+def _items_with_category_ids():
+    # Itemと、そのカテゴリIDの配列を1行にして返すSELECT(読み取りはすべてこれを元にする)
+    # ItemORM/CategoryORMのオブジェクトは作らず(identity mapにも入れず)、行のタプルからそのまま①のItemを作る
+    # カテゴリのためにselectinloadで2回目のSELECTを投げる代わりに、LEFT JOIN + GROUP BY + array_aggで1回にまとめる
+    # (カテゴリのないItemはarray_aggがNULLになるよう、FILTERでLEFT JOINのNULL行を除く)
+    category_ids = (
+        func.array_agg(aggregate_order_by(item_category.c.category_id, item_category.c.category_id))
+        .filter(item_category.c.category_id.is_not(None))
+        .label("category_ids")
+    )
+    return (
+        select(ItemORM.item_id, ItemORM.item_name, ItemORM.version, category_ids)
+        .outerjoin(item_category, item_category.c.item_id == ItemORM.item_id)
+        .group_by(ItemORM.item_id)
+    )
+
+
+def _row_to_item(row) -> Item:
+    return Item(row.item_id, row.item_name, list(row.category_ids or []), version=row.version)
+
+
+def _list_statement(after: int | None, limit: int | None, category_ids: list[int] | None, match: CategoryMatch):
+    # list_allのSELECT
+    stmt = _items_with_category_ids().order_by(ItemORM.item_id)
+    if category_ids:
+        stmt = stmt.filter(_category_filter(set(category_ids), match, after))
+    if after is not None:
+        stmt = stmt.filter(ItemORM.item_id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _category_filter(category_ids: set[int], match: CategoryMatch, after: int | None = None):
+    # カテゴリでの絞り込み条件。どちらも中間テーブルだけで判定し、Itemを全件読んでアプリ側で絞り込むことはしない
+    if match == "all":
+        # 指定のカテゴリのうち、紐づいている数が指定の数と同じItem
+        # (中間テーブルの主キーで同じ組み合わせは1行だけなので、count(*)で数えてよい)
+        # GROUP BYの中には外側のitem_id > afterが効かないので、集計する前に同じ条件で絞っておく
+        matched = select(item_category.c.item_id).filter(item_category.c.category_id.in_(category_ids))
+        if after is not None:
+            matched = matched.filter(item_category.c.item_id > after)
+        matched = matched.group_by(item_category.c.item_id).having(func.count() == len(category_ids))
+        return ItemORM.item_id.in_(matched)
+    # どれか1つでも紐づいているItem(EXISTSなので、複数紐づいていても1行にしかならない)
+    # 外側のSELECTはカテゴリIDを集めるために中間テーブルを結合しているので、別名にする
+    # (同じ名前のままだと、EXISTSの中の中間テーブルまで外側の行を指してしまい、FROMがなくなる)
+    in_category = item_category.alias("in_category")
+    return exists().where(
+        in_category.c.item_id == ItemORM.item_id,
+        in_category.c.category_id.in_(category_ids),
+    )
+
+
+def _replace_categories_statement(item_id: int, category_ids: list[int]):
+    # Itemに紐づくカテゴリをcategory_idsにそろえる1文(CTE)。変わらない組み合わせには触らない
+    #   wanted : 指定のうち、実際に存在するカテゴリID(この文の結果として返す)
+    #   removed: 紐づいているが、wantedにないものを削除
+    #   added  : wantedのうち、まだ紐づいていないものを追加(紐づき済みはON CONFLICTで何もしない)
+    wanted = select(CategoryORM.category_id).filter(CategoryORM.category_id.in_(category_ids)).cte("wanted")
+    removed = (
+        delete(item_category)
+        .where(item_category.c.item_id == item_id, item_category.c.category_id.not_in(select(wanted.c.category_id)))
+        .returning(item_category.c.category_id)
+        .cte("removed")
+    )
+    added = (
+        pg_insert(item_category)
+        .from_select(["item_id", "category_id"], select(literal(item_id), wanted.c.category_id))
+        .on_conflict_do_nothing()
+        .returning(item_category.c.category_id)
+        .cte("added")
+    )
+    return select(wanted.c.category_id).add_cte(removed, added)
+
+
+def _search_statement(key: str, mode: NameSearchMode, limit: int):
+    # 名前検索のSELECT。どちらもlower(item_name)の式インデックス(ddl.sql)を使う
+    #   prefix: (lower(item_name) COLLATE "C", item_id)のB-treeで前方一致の範囲を名前順に読み、limit件で止める(完全一致が先頭に来る)
+    #           インデックスと同じ照合順序・並びにしないと、前方一致する行をすべて読んで並べ替えてからlimit件にしてしまう
+    #           カテゴリIDを集めるGROUP BYの後では並びが崩れるので、先にサブクエリでlimit件のitem_idを選んでから集める
+    #   fuzzy : pg_trgmのGINで「%」(類似度がしきい値以上)の候補を絞り、類似度の高い順に返す
+    name_key = func.lower(ItemORM.item_name)
+    if mode == "prefix":
+        name_c = name_key.collate("C")
+        matched = (
             select(ItemORM.item_id)
-            .order_by(ItemORM.item_id.desc())
-            .limit(1)
+            .filter(name_c.like(_escape_like(key) + "%", escape="!"))
+            .order_by(name_c, ItemORM.item_id)
+            .limit(limit)
+            .subquery("matched")
         )
-        # そのレコードのID値を取得
-        row = result.scalar_one_or_none()
-        # もしレコードが存在しない場合は1を返す
-        # 存在する場合はそのID値に1を足して返す
-        return (row + 1) if row is not None else 1
-
-    async def update(self, item: Item) -> None:
-        # Itemの更新に使う
-        # まず既存のアイテムを関係データと一緒に取得
-        result = await self.db.execute(
-            select(ItemORM)
-            .options(selectinload(ItemORM.categories))
-            .filter(ItemORM.item_id == item.id)
+        return (
+            _items_with_category_ids()
+            .join(matched, matched.c.item_id == ItemORM.item_id)
+            .order_by(name_c, ItemORM.item_id)
         )
-        db_item = result.scalar_one_or_none()
-         
-        if db_item:
-            db_item.item_name = item.name
-            
-            # カテゴリの更新処理
-            if item.category_ids is not None and len(item.category_ids) > 0:
-                # 新しいカテゴリを取得
-                category_result = await self.db.execute(
-                    select(CategoryORM).filter(
-                        CategoryORM.category_id.in_(item.category_ids)
-                    )
-                )
-                categories = list(category_result.scalars().all())
-                db_item.categories = categories
-                # エンティティの状態を更新
-                item.category_ids = [cat.category_id for cat in categories]
-            else:
-                # category_idsがNoneまたは空リストの場合、すべてのカテゴリを削除
-                db_item.categories = []
-                # エンティティの状態を更新（一貫性のため空リストに統一）
-                item.category_ids = []
-            
-            await self.db.commit()
-
-    async def delete(self, item_id: int) -> Item | None:
-        # Itemの削除に使う
-        item = await self.db.get(ItemORM, item_id)
-        if item is None:
-            raise ValueError(f"Item with ID {item_id} not found.")
-        await self.db.delete(item)
-        await self.db.commit()
\ No newline at end of file
+    stmt = _items_with_category_ids().limit(limit)
+    return stmt.filter(name_key.op("%")(key)).order_by(func.similarity(name_key, key).desc(), ItemORM.item_id)
+
+
+def _escape_like(value: str) -> str:
+    # LIKEのパターンで特別な意味を持つ文字を、ただの文字として扱う
+    # (エスケープ文字は「!」。「\」だとstandard_conforming_stringsの設定でリテラルの解釈が変わるため)
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
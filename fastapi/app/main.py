@@ -1,19 +1,139 @@
+import logging
+from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.db.database import DATABASE_REPLICA_URL, DATABASE_URL, AsyncSessionLocal, ReplicaSessionLocal, engine
+from app.db.read_routing import ReadYourWritesMiddleware
+from app.domain.category import Category
+from app.domain.items import Item
+from app.infrastructure.asyncpg import AsyncpgItemRepository, AsyncpgPools
+from app.infrastructure.asyncpg.pool import fixed_connection
+from app.infrastructure.batching import BatchLoader
+from app.infrastructure.cache import CategoryCatalog, InvalidationListener, RepositoryCaches
+from app.infrastructure.memory import InMemoryCategoryRepository, InMemoryStore
+from app.infrastructure.sqlalchemy.repositories.category_repo_impl import SQLAlchemyCategoryRepository
+from app.infrastructure.sqlalchemy.repositories.item_repo_impl import SQLAlchemyItemRepository
+from app.routers.admission_control import AdmissionControl, AdmissionControlMiddleware, AdmissionLimiter
 from app.routers.categories import router as category_router
+from app.routers.internal import router as internal_router
 from app.routers.items import router as item_router
+from app.routers.request_metrics import RequestMetrics, RequestMetricsMiddleware, router as metrics_router
+from app.settings import (ADMISSION_CONNECTION_BUDGET, ADMISSION_CONTROL_ENABLED, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_READ_LIMIT,
+                          ADMISSION_RETRY_AFTER_SECONDS, ADMISSION_WRITE_LIMIT, DB_POOL_TIMEOUT, INVALIDATION_BUS_ENABLED,
+                          ITEM_LOADER_MAX_BATCH_SIZE, ITEM_LOADER_WINDOW_MICROSECONDS, REPOSITORY_BACKEND, REQUEST_METRICS_ENABLED)
+
+logger = logging.getLogger(__name__)
+
+
+# アプリの起動時・終了時の処理
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # カテゴリカタログを読み込んでおく(失敗してもアプリは起動し、カタログなしでDBから返す)
+    try:
+        await app.state.category_catalog.reload()
+    except Exception:
+        logger.warning("failed to load category catalog", exc_info=True)
+    # 他のワーカーからのキャッシュ無効化の通知をバックグラウンドで受け取り始める
+    listener = InvalidationListener(app.state.caches, engine)
+    app.state.invalidation_listener = listener
+    # (REPOSITORY_BACKEND=memoryのときはワーカーごとに別のデータなので、通知を受け取る意味がない)
+    if INVALIDATION_BUS_ENABLED and REPOSITORY_BACKEND != "memory":
+        listener.start()
+    yield
+    await listener.stop()
+    await app.state.pg_pools.close()
+
+
+# アプリを組み立てる。キャッシュなどの状態はアプリごとに持つので、テストでは複数作って別々のワーカーに見立てられる
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+
+    # REPOSITORY_BACKEND=memoryのときにDBの代わりに使う置き場(dependency_overridesでメモリ内版に差し替えたときも、これを使う)
+    app.state.memory_store = InMemoryStore()
+    # カテゴリ全件をメモリに持つカタログ(起動時に読み込み、カテゴリの書き込みで差し替える)
+    app.state.category_catalog = CategoryCatalog(
+        partial(load_categories_memory, app.state.memory_store) if REPOSITORY_BACKEND == "memory" else load_categories)
+    # リクエストをまたいで使うItem・Categoryのキャッシュ(get_item_repo/get_category_repoで使う)
+    app.state.caches = RepositoryCaches(category_catalog=app.state.category_catalog)
+    # REPOSITORY_BACKEND=asyncpgのときに使うasyncpgの接続プール(最初に使うときに作る)
+    app.state.pg_pools = AsyncpgPools(DATABASE_URL, DATABASE_REPLICA_URL)
+    if REPOSITORY_BACKEND == "asyncpg":
+        load_primary, load_replica = partial(load_items_pg, app.state.pg_pools, False), partial(load_items_pg, app.state.pg_pools, True)
+    else:
+        load_primary, load_replica = partial(load_items, AsyncSessionLocal), partial(load_items, ReplicaSessionLocal)
+    # 同時に来たItemの詳細取得を1回のSELECTにまとめるローダー(別々のリクエストからの分もまとめる)
+    app.state.item_loader = BatchLoader(load_primary,
+                                        window_seconds=ITEM_LOADER_WINDOW_MICROSECONDS / 1_000_000,
+                                        max_batch_size=ITEM_LOADER_MAX_BATCH_SIZE)
+    # レプリカから読むリクエスト用(レプリカがなければNone)
+    app.state.replica_item_loader = BatchLoader(load_replica,
+                                                window_seconds=ITEM_LOADER_WINDOW_MICROSECONDS / 1_000_000,
+                                                max_batch_size=ITEM_LOADER_MAX_BATCH_SIZE) if ReplicaSessionLocal is not None else None
+
+    # カテゴリ用ルータとitem用ルータをappに追加
+    app.include_router(category_router)
+    app.include_router(item_router)
+    # 運用向けの内部エンドポイント
+    app.include_router(internal_router)
+
+    # 同時に処理するリクエストの数を、読み取り・書き込みそれぞれで制限する(超えた分は待たせ、待ちきれなければ503)
+    # RequestMetricsMiddlewareより内側に入れる(待ち行列で待った時間・503もリクエストの時間として集計される)
+    app.state.admission_control = AdmissionControl(
+        read=AdmissionLimiter(ADMISSION_READ_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT),
+        write=AdmissionLimiter(ADMISSION_WRITE_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT),
+        retry_after_seconds=ADMISSION_RETRY_AFTER_SECONDS,
+        connection_budget=ADMISSION_CONNECTION_BUDGET,
+    )
+    if ADMISSION_CONTROL_ENABLED:
+        app.add_middleware(AdmissionControlMiddleware, admission=app.state.admission_control)
+
+    # 書き込みをcommitできた2xxの応答に、しばらくプライマリから読むための印をつける(レプリカがあるときだけ)
+    if ReplicaSessionLocal is not None:
+        app.add_middleware(ReadYourWritesMiddleware)
+
+    # リクエストごとのSQLの回数・DBの時間・ハンドラの時間をServer-Timingヘッダで返し、ルートごとに集計して/metricsで返す
+    app.state.request_metrics = RequestMetrics()
+    if REQUEST_METRICS_ENABLED:
+        app.add_middleware(RequestMetricsMiddleware, metrics=app.state.request_metrics)
+        app.include_router(metrics_router)
+
+    # ↓app.routerとは関係のないルート
+    app.get("/")(root)
+    return app
+
+
+# カテゴリカタログの読み込みに使う(リクエストとは別に、自分でセッションを開く)
+async def load_categories() -> list[Category]:
+    async with AsyncSessionLocal() as db:
+        return await SQLAlchemyCategoryRepository(db).list_all()
+
+
+# load_categoriesのメモリ内版
+async def load_categories_memory(store: InMemoryStore) -> list[Category]:
+    return await InMemoryCategoryRepository(store).list_all()
+
+
+# Itemのまとめ読み込みに使う(複数のリクエストの分をまとめて読むので、どのリクエストのセッションでもなく自分で開く)
+async def load_items(session_factory: async_sessionmaker[AsyncSession], item_ids: list[int]) -> dict[int, Item]:
+    async with session_factory() as db:
+        return {item.id: item for item in await SQLAlchemyItemRepository(db).get_many(item_ids)}
+
+
+# load_itemsのasyncpg版(接続を待つ時間の上限はSQLAlchemyのpool_timeoutと同じ)
+async def load_items_pg(pools: AsyncpgPools, replica: bool, item_ids: list[int]) -> dict[int, Item]:
+    pool = await pools.pool(replica)
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        return {item.id: item for item in await AsyncpgItemRepository(fixed_connection(conn)).get_many(item_ids)}
 
-app = FastAPI()
 
-# カテゴリ用ルータとitem用ルータをappに追加
-app.include_router(category_router)
-app.include_router(item_router)
-
-# ↓app.routerとは関係のないルート
-@app.get("/")
 async def root():
     return {"message": "Hello FastAPI + PostgreSQL + Docker Compose!"}
 
 
+app = create_app()
+
+
 # import uuid
 # def get_token():
 #     token = str(uuid.uuid4())
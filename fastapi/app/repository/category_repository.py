@@ -7,10 +7,12 @@ class CategoryRepository(ABC):
     @abstractmethod
     async def save(self, category: Category) -> None: ...
     @abstractmethod
-    async def list_all(self) -> list[Category]: ...
+    async def list_all(self, after: int | None = None, limit: int | None = None) -> list[Category]: ...
     @abstractmethod
     async def get_by_id(self, category_id: int) -> Category | None: ...
     @abstractmethod
     async def next_identifier(self) -> int: ...
+    # expected_versionを指定した場合、現在のバージョンと違えばVersionConflictErrorを送出する
+    # 存在しなければValueErrorを送出する(ItemRepository.updateと同じ)
     @abstractmethod
-    async def update(self, category: Category) -> None: ...
\ No newline at end of file
+    async def update(self, category: Category, expected_version: int | None = None) -> None: ...
\ No newline at end of file
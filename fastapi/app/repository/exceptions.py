@@ -0,0 +1,9 @@
+# ②抽象リポジトリで使う例外
+# app/repository/exceptions.py
+
+class VersionConflictError(Exception):
+    """更新・削除しようとした行のバージョンが、指定されたもの(=クライアントが読んだときのもの)と違う"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"version conflict (current version: {current_version})")
+        self.current_version = current_version
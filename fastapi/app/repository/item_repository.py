@@ -1,18 +1,53 @@
 # ②抽象リポジトリクラス
 # app/repository/item_repository.py
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from typing import Literal
 from app.domain.items import Item    #  ①のエンティティに依存
 
+# カテゴリでの絞り込み方。all: 指定のカテゴリすべてに属する / any: どれか1つ以上に属する
+CategoryMatch = Literal["all", "any"]
+# 名前検索の方法。prefix: 前方一致 / fuzzy: 似ている名前(類似度の高い順)
+NameSearchMode = Literal["prefix", "fuzzy"]
+
 class ItemRepository(ABC):
     @abstractmethod
     async def save(self, item: Item) -> None: ...
     @abstractmethod
-    async def list_all(self) -> list[Item]: ...
+    async def save_many(self, items: list[Item]) -> None: ...
+    # category_idsを指定すると、matchの方法でカテゴリで絞り込む
+    @abstractmethod
+    async def list_all(self, after: int | None = None, limit: int | None = None,
+                       category_ids: list[int] | None = None, match: CategoryMatch = "any") -> list[Item]: ...
+    # category_idのカテゴリに属するItemを、item_idの昇順でafterより後ろからlimit件
+    @abstractmethod
+    async def list_by_category(self, category_id: int, after: int | None = None, limit: int | None = None) -> list[Item]: ...
+    # keyはItemName.search_keyで正規化した検索語
+    @abstractmethod
+    async def search_by_name(self, key: str, mode: NameSearchMode, limit: int) -> list[Item]: ...
+    @abstractmethod
+    def stream_all(self, chunk_size: int) -> AsyncIterator[list[Item]]: ...
     @abstractmethod
     async def get_by_id(self, item_id:int) -> Item | None: ...
+    # 見つかったItemだけを、item_idsの順に返す(同じIDは1つにまとめる)
+    @abstractmethod
+    async def get_many(self, item_ids: list[int]) -> list[Item]: ...
     @abstractmethod
     async def next_identifier(self) -> int: ...
     @abstractmethod
-    async def update(self, item: Item) -> None: ...
+    async def next_identifiers(self, count: int) -> list[int]: ...
+    @abstractmethod
+    async def get_version(self, item_id: int) -> int | None: ...
+    # expected_versionを指定した場合、現在のバージョンと違えばVersionConflictErrorを送出する
+    # Itemが存在しなければValueError。戻り値は、存在しないため紐づけなかったカテゴリID
+    @abstractmethod
+    async def update(self, item: Item, expected_version: int | None = None) -> list[int]: ...
+    # 一部更新。Noneの項目は変えない。戻り値は(更新後のItem, 紐づけなかったカテゴリID)。エラーはupdateと同じ
+    @abstractmethod
+    async def patch(self, item_id: int, name: str | None = None, category_ids: list[int] | None = None,
+                    expected_version: int | None = None) -> tuple[Item, list[int]]: ...
+    @abstractmethod
+    async def delete(self, item_id: int, expected_version: int | None = None) -> None: ...
+    # 戻り値は実際に削除したID
     @abstractmethod
-    async def delete(self, item_id: int) -> None: ...
\ No newline at end of file
+    async def delete_many(self, item_ids: list[int]) -> list[int]: ...
\ No newline at end of file
@@ -0,0 +1,145 @@
+# ⑤プレゼンテーション層 (全ルート共通のミドルウェア)
+# app/routers/admission_control.py
+# アクセスが急に増えたとき、リクエストが接続プールの空きを待って積み上がり(DB_POOL_TIMEOUTまで待つ)、全員のレイテンシが悪くなるのを防ぐ
+# 読み取り(GET/HEAD/OPTIONS)と書き込み(それ以外)に分けて、同時に処理するリクエストの数に上限を設ける
+#   ・2つの上限の合計は接続の予算(connection_budget)以下にする(書き込みの分は読み取りから切り出す)
+#   ・上限を超えた分は、queue_size個まで来た順に待たせる(待ち行列)
+#   ・待ち行列がいっぱいなら、すぐに503を返す
+#   ・queue_timeout秒待っても順番が来なければ、503を返す
+# どちらもRetry-Afterヘッダをつけて、接続(ソケット)を持ったまま待たせずに返す
+# (429はクライアントごとの回数制限に使うもの。これはサーバ全体が混んでいるので503にしている)
+# /metricsと/internal/は、混んでいるときこそ状態を見たいので制限しない
+# 数はプロセス(ワーカー)ごと。待ち行列の長さ・断った数は/metricsで返す
+import asyncio
+from collections import deque
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.routers.request_metrics import Histogram
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+EXEMPT_PATH_PREFIXES = ("/metrics", "/internal/")
+
+
+class AdmissionLimiter:
+    # 同時に処理するリクエストをlimit個までにし、超えた分はqueue_size個まで来た順に待たせる
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        # 待ち行列で待った時間(すぐに処理を始めたリクエストは0)
+        self.queue_wait = Histogram()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        # 処理してよければTrue(最後にrelease()を呼ぶ)。断るときはFalse
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._admit(0.0)
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.rejected_queue_full += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            # asyncio.waitはタイムアウトしてもwaiterをキャンセルしない(release()から順番を渡された直後でも取りこぼさない)
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # 待っている間にクライアントが切断した。順番を渡されていたら次に回す
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            self.rejected_timeout += 1
+            return False
+        self._admit(time.perf_counter() - started)
+        return True
+
+    def release(self) -> None:
+        # 待っているリクエストがあれば、in_flightを減らさずにそのまま順番を渡す(後から来たリクエストに割り込まれない)
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+            return
+        self.in_flight -= 1
+
+    def _admit(self, waited: float) -> None:
+        self.admitted += 1
+        self.queue_wait.observe(waited)
+
+
+class AdmissionControl:
+    # 読み取り・書き込みそれぞれのAdmissionLimiter
+    # 2つは同じ接続プールを使うので、上限の合計がconnection_budgetを超える設定はValueErrorにする
+    # (超えると、両方が混んだときに処理中のリクエストが接続プールの空きを待ち、DB_POOL_TIMEOUTまで積み上がる)
+    def __init__(self, read: AdmissionLimiter, write: AdmissionLimiter, retry_after_seconds: int, connection_budget: int | None = None):
+        if connection_budget is not None and read.limit + write.limit > connection_budget:
+            raise ValueError(f"admission limits exceed the connection budget: read {read.limit} + write {write.limit} > {connection_budget}")
+        self.limiters = {"read": read, "write": write}
+        self.retry_after_seconds = retry_after_seconds
+
+    def limiter_for(self, method: str, path: str) -> AdmissionLimiter | None:
+        # 制限しないパスならNone
+        if path.startswith(EXEMPT_PATH_PREFIXES):
+            return None
+        return self.limiters["read" if method in READ_METHODS else "write"]
+
+    def render(self) -> str:
+        # Prometheusのテキスト形式(/metricsでRequestMetricsの後ろにつなげる)
+        lines: list[str] = []
+        for name, kind, help_text, value in (
+            ("http_admission_in_flight", "gauge", "Requests being handled", lambda limiter: limiter.in_flight),
+            ("http_admission_queue_depth", "gauge", "Requests waiting for a slot", lambda limiter: limiter.queued),
+            ("http_admission_limit", "gauge", "Maximum concurrent requests", lambda limiter: limiter.limit),
+            ("http_admission_admitted_total", "counter", "Requests admitted", lambda limiter: limiter.admitted),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f'{name}{{class="{route_class}"}} {value(limiter)}' for route_class, limiter in self.limiters.items()]
+        name = "http_admission_rejected_total"
+        lines += [f"# HELP {name} Requests rejected with 503", f"# TYPE {name} counter"]
+        for route_class, limiter in self.limiters.items():
+            lines.append(f'{name}{{class="{route_class}",reason="queue_full"}} {limiter.rejected_queue_full}')
+            lines.append(f'{name}{{class="{route_class}",reason="timeout"}} {limiter.rejected_timeout}')
+        name = "http_admission_queue_wait_seconds"
+        lines += [f"# HELP {name} Time spent waiting in the admission queue", f"# TYPE {name} histogram"]
+        for route_class, limiter in self.limiters.items():
+            h = limiter.queue_wait
+            lines += [f'{name}_bucket{{class="{route_class}",le="{le}"}} {count}' for le, count in h.cumulative()]
+            lines += [f'{name}_sum{{class="{route_class}"}} {h.sum}', f'{name}_count{{class="{route_class}"}} {sum(h.counts)}']
+        return "\n".join(lines) + "\n"
+
+
+class AdmissionControlMiddleware:
+    # RequestMetricsMiddlewareと同じく、BaseHTTPMiddlewareを使わないASGIのミドルウェア
+    def __init__(self, app: ASGIApp, admission: AdmissionControl):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.admission.limiter_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        if not await limiter.acquire():
+            response = JSONResponse({"detail": "Server is busy. Retry later."}, status_code=503,
+                                    headers={"Retry-After": str(self.admission.retry_after_seconds)})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
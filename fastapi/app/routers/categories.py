@@ -1,30 +1,86 @@
 # ⑤プレゼンテーション層
 # app/routers/categories.py
-from fastapi import APIRouter, Depends, HTTPException
+from functools import partial
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.dto.category_dto import CategoryCreateDTO, CategoryReadDTO, CategoryUpdateDTO
-from app.db.database import get_db
+from app.dto.item_dto import ItemReadDTO
+from app.db.read_routing import get_read_db, use_replica
+from app.db.unit_of_work import UnitOfWork, get_uow
+from app.infrastructure.asyncpg import AsyncpgCategoryRepository, AsyncpgUnitOfWork
+from app.infrastructure.asyncpg.pool import LazyConnection
+from app.infrastructure.asyncpg.unit_of_work import get_asyncpg_read_connection, get_asyncpg_uow
+from app.infrastructure.cache import CachedCategoryRepository, RepositoryCaches
+from app.infrastructure.cache.invalidation_bus import publish as publish_invalidation
+from app.infrastructure.cache.repository_caches import get_repository_caches
+from app.infrastructure.memory import InMemoryCategoryRepository, InMemoryStore
+from app.infrastructure.memory.store import get_memory_store
 from app.infrastructure.sqlalchemy.repositories.category_repo_impl import SQLAlchemyCategoryRepository
+from app.repository.exceptions import VersionConflictError
+from app.routers.etag import content_etag, expected_version, if_none_match, make_etag
+from app.routers.items import get_item_read_repo, item_list_response
+from app.routers.json_response import encode_categories
+from app.routers.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.settings import FAST_JSON_RESPONSES, REPOSITORY_BACKEND
 from app.usecases.category.create_category import CreateCategoryUseCase
 from app.usecases.category.list_categories import ListCategoriesUseCase
 from app.usecases.category.get_category import GetCategoryUseCase
+from app.usecases.category.list_category_items import ListCategoryItemsUseCase
 from app.usecases.category.update_category import UpdateCategoryUseCase
 
 router = APIRouter(prefix="/categories")
 
 # DIチェーン
-def get_category_repo(db: AsyncSession = Depends(get_db)):
-    return SQLAlchemyCategoryRepository(db)
+def get_sqlalchemy_category_repo(uow: UnitOfWork = Depends(get_uow),
+                                 caches: RepositoryCaches = Depends(get_repository_caches)):
+    # get_by_idをキャッシュするデコレータで包む。カテゴリの更新時は、そのカテゴリを参照するItemのキャッシュも消す
+    # 書き込んだときは、同じセッションのcommitで他のワーカーにもキャッシュの無効化を通知する
+    # commitはリポジトリではなく、リクエストの最後にUnitOfWorkが1回だけ行う
+    db = uow.session
+    return CachedCategoryRepository(SQLAlchemyCategoryRepository(db), caches, publish=partial(publish_invalidation, db),
+                                    on_commit=uow.after_commit)
+
+# 読み取り専用のルート用。レプリカがあればレプリカから読む(最近書き込んだクライアントはプライマリ)
+# レプリカから読んだ内容は反映が遅れているかもしれないので、共有のキャッシュには入れない
+def get_sqlalchemy_category_read_repo(db: AsyncSession = Depends(get_read_db),
+                                      caches: RepositoryCaches = Depends(get_repository_caches),
+                                      replica: bool = Depends(use_replica)):
+    return CachedCategoryRepository(SQLAlchemyCategoryRepository(db), caches, fill_cache=not replica)
+
+# REPOSITORY_BACKEND=asyncpgのとき(app/routers/items.pyと同じ)
+def get_asyncpg_category_repo(uow: AsyncpgUnitOfWork = Depends(get_asyncpg_uow),
+                              caches: RepositoryCaches = Depends(get_repository_caches)):
+    return CachedCategoryRepository(AsyncpgCategoryRepository(uow.connection), caches, publish=uow.publish,
+                                    on_commit=uow.after_commit)
+
+def get_asyncpg_category_read_repo(connection: LazyConnection = Depends(get_asyncpg_read_connection),
+                                   caches: RepositoryCaches = Depends(get_repository_caches),
+                                   replica: bool = Depends(use_replica)):
+    return CachedCategoryRepository(AsyncpgCategoryRepository(connection), caches, fill_cache=not replica)
+
+# REPOSITORY_BACKEND=memoryのとき(書き込みと読み取りで同じものを使う)
+def get_memory_category_repo(store: InMemoryStore = Depends(get_memory_store),
+                             caches: RepositoryCaches = Depends(get_repository_caches)):
+    return CachedCategoryRepository(InMemoryCategoryRepository(store), caches)
+
+if REPOSITORY_BACKEND == "asyncpg":
+    get_category_repo, get_category_read_repo = get_asyncpg_category_repo, get_asyncpg_category_read_repo
+elif REPOSITORY_BACKEND == "memory":
+    get_category_repo = get_category_read_repo = get_memory_category_repo
+else:
+    get_category_repo, get_category_read_repo = get_sqlalchemy_category_repo, get_sqlalchemy_category_read_repo
 
 def get_create_uc(repo=Depends(get_category_repo)):
     return CreateCategoryUseCase(repo)
 
-def get_list_uc(repo=Depends(get_category_repo)):
+def get_list_uc(repo=Depends(get_category_read_repo)):
     return ListCategoriesUseCase(repo)
-def get_get_uc(repo=Depends(get_category_repo)):
+def get_get_uc(repo=Depends(get_category_read_repo)):
     return GetCategoryUseCase(repo)
 def get_update_uc(repo=Depends(get_category_repo)):
     return UpdateCategoryUseCase(repo)
+def get_list_items_uc(repo=Depends(get_category_read_repo), item_repo=Depends(get_item_read_repo)):
+    return ListCategoryItemsUseCase(repo, item_repo)
 
 # エンドポイント
 
@@ -36,26 +92,86 @@ async def create(dto: CategoryCreateDTO,
     return CategoryReadDTO(category_id=category.id, category_name=category.name)
 
 
+# 一覧はカーソル方式のページング。次ページがあればX-Next-Cursorヘッダにカーソルを入れて返す
+# カテゴリカタログを読み込み済みなら、DBに問い合わせず、JSONにしておいたバイト列をそのまま返す
+# そのときのETagはスナップショットの内容のハッシュ。どのワーカーでも同じ内容なら同じETagになる
 @router.get("/", response_model=list[CategoryReadDTO])
-async def list_all(uc: ListCategoriesUseCase = Depends(get_list_uc)):
-    categories = await uc.execute()
+async def list_all(response: Response,
+                   after: str | None = Query(None, description="前ページのX-Next-Cursorヘッダの値"),
+                   limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                   if_none_match_header: str | None = Header(None, alias="If-None-Match"),
+                   caches: RepositoryCaches = Depends(get_repository_caches),
+                   uc: ListCategoriesUseCase = Depends(get_list_uc)):
+    after_id = decode_cursor(after)
+    catalog = caches.category_catalog
+    if catalog is not None and catalog.snapshot is not None:
+        snapshot = catalog.snapshot
+        etag = f'"categories-{snapshot.digest}"'
+        if if_none_match(if_none_match_header, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        body, next_after = snapshot.page(after_id, limit)
+        headers = {"ETag": etag}
+        if next_after is not None:
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(next_after)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # カタログをまだ読み込めていないときはDBから返す。ETagはこのページの内容(JSONと次ページの位置)のハッシュ
+    # (DBには毎回問い合わせるが、変わっていなければ本文は送らない)
+    categories, next_after = await uc.execute(after_id, limit)
+    body = encode_categories(categories)
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(next_after)} if next_after is not None else {}
+    etag = content_etag("categories-page", body, headers.get(NEXT_CURSOR_HEADER, "").encode())
+    if if_none_match(if_none_match_header, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    headers["ETag"] = etag
+    if FAST_JSON_RESPONSES:
+        return Response(content=body, media_type="application/json", headers=headers)
+    response.headers.update(headers)
     return [CategoryReadDTO(category_id=c.id, category_name=c.name) for c in categories]
 
 
+# カテゴリに属するItemの一覧(逆引き)。ページングは/items/と同じカーソル方式
+@router.get("/{category_id}/items", response_model=list[ItemReadDTO])
+async def list_items(category_id: int,
+                     response: Response,
+                     after: str | None = Query(None, description="前ページのX-Next-Cursorヘッダの値"),
+                     limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                     uc: ListCategoryItemsUseCase = Depends(get_list_items_uc)):
+    result = await uc.execute(category_id, decode_cursor(after), limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    items, next_after = result
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(next_after)} if next_after is not None else {}
+    return item_list_response(items, response, headers)
+
+
+# カテゴリはキャッシュから読めるので、そのまま読み込んでからETagを比べる
 @router.get("/{category_id}", response_model=CategoryReadDTO)
 async def get_category(category_id: int, 
+                       response: Response,
+                       if_none_match_header: str | None = Header(None, alias="If-None-Match"),
                        uc: GetCategoryUseCase = Depends(get_get_uc)):
     category = await uc.execute(category_id)
     if category is None:
         raise HTTPException(status_code=404, detail="Category not found")
+    etag = make_etag("category", category.id, category.version)
+    if if_none_match(if_none_match_header, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return CategoryReadDTO(category_id=category.id, category_name=category.name)
 
 
 @router.put("/{category_id}", response_model=CategoryReadDTO)
 async def update_category(category_id: int,
                       dto: CategoryUpdateDTO,
+                      response: Response,
+                      if_match: str | None = Header(None, alias="If-Match"),
                       uc: UpdateCategoryUseCase = Depends(get_update_uc)):
-    category = await uc.execute(category_id, dto.category_name)
+    try:
+        category = await uc.execute(category_id, dto.category_name, expected_version(if_match, "category", category_id))
+    except VersionConflictError:
+        raise HTTPException(status_code=412, detail="Category has been modified")
     if category is None:
         raise HTTPException(status_code=404, detail="Category not found")
+    response.headers["ETag"] = make_etag("category", category.id, category.version)
     return CategoryReadDTO(category_id=category.id, category_name=category.name)
\ No newline at end of file
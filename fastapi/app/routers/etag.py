@@ -0,0 +1,43 @@
+# ⑤プレゼンテーション層 (条件付きリクエストで共通の部品)
+# app/routers/etag.py
+# ETagは「リソースの種類・ID・バージョン」から作る。内容が変わればバージョンが上がるので、ETagも変わる
+#   - GET で If-None-Match が今のETagと同じなら、304 Not Modified を返して本文を送らない
+#   - PUT/DELETE で If-Match を指定されたら、そのETagのバージョンのときだけ更新する(違えば 412 Precondition Failed)
+# バージョンのない一覧は、返す内容そのもののハッシュから作る(content_etag)
+import hashlib
+import re
+
+from fastapi import HTTPException
+
+
+def make_etag(kind: str, resource_id: int, version: int) -> str:
+    return f'"{kind}-{resource_id}-v{version}"'
+
+
+def content_etag(kind: str, *parts: bytes) -> str:
+    # 内容(レスポンスの本文と、次ページの位置などのヘッダ)が同じなら、どのワーカーでも同じ値になる強いETag
+    digest = hashlib.blake2b(b"\n".join(parts), digest_size=16).hexdigest()
+    return f'"{kind}-{digest}"'
+
+
+def if_none_match(header: str | None, etag: str) -> bool:
+    # If-None-Matchのどれかが今のETagと同じならTrue(=304を返してよい)
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Matchは弱い比較(W/の有無は無視する)
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def expected_version(header: str | None, kind: str, resource_id: int) -> int | None:
+    # If-Matchから、クライアントが前提にしているバージョンを取り出す(指定なし・"*"ならNone)
+    if header is None or header.strip() == "*":
+        return None
+    pattern = re.compile(rf'^"{re.escape(kind)}-{resource_id}-v(\d+)"$')
+    for tag in header.split(","):
+        # If-Matchは強い比較なので、弱いETag(W/)は一致しない扱い
+        match = pattern.match(tag.strip())
+        if match:
+            return int(match.group(1))
+    raise HTTPException(status_code=412, detail="Precondition Failed")
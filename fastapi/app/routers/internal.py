@@ -0,0 +1,45 @@
+# ⑤プレゼンテーション層 (運用向けの内部エンドポイント)
+# app/routers/internal.py
+# キャッシュなどの稼働状況を確認するためのもの。業務用のAPIではない
+from fastapi import APIRouter, Depends, Request
+from app.db.database import engine, pool_metrics, replica_engine, replica_pool_metrics
+from app.db.unit_of_work import uow_metrics
+from app.infrastructure.batching import BatchLoader
+from app.infrastructure.batching.batched_item_repo import get_item_loader
+from app.infrastructure.cache import RepositoryCaches
+from app.infrastructure.cache.repository_caches import get_repository_caches
+
+router = APIRouter(prefix="/internal")
+
+
+# Item・Categoryのキャッシュのヒット数・ミス数・追い出し数など
+@router.get("/cache")
+async def cache_stats(caches: RepositoryCaches = Depends(get_repository_caches)):
+    return caches.stats()
+
+
+# Itemのまとめ読み込みの回数(loads÷batchesが、1回のSELECTにまとまった平均件数)
+@router.get("/loader")
+async def loader_stats(loader: BatchLoader = Depends(get_item_loader)):
+    return loader.stats()
+
+
+# DB接続プールの状態(使用中・あふれ分の接続数と、接続の取り出し待ち・接続作成にかかった時間)
+# ワーカー数とDB_POOL_SIZE/DB_MAX_OVERFLOWの調整に使う
+# レプリカがあれば、レプリカのプールの状態もreplicaに入れて返す
+# REPOSITORY_BACKEND=asyncpgでasyncpgのプールを作っていれば、その接続数もasyncpgに入れて返す
+@router.get("/db/pool")
+async def db_pool_stats(request: Request):
+    stats = pool_metrics.stats(engine.pool)
+    if replica_engine is not None:
+        stats["replica"] = replica_pool_metrics.stats(replica_engine.pool)
+    pg_pools = request.app.state.pg_pools.stats()
+    if pg_pools:
+        stats["asyncpg"] = pg_pools
+    return stats
+
+
+# リクエストあたりのcommit・flushの回数(UnitOfWorkでcommitが1回にまとまっているかの確認用)
+@router.get("/db/uow")
+async def db_uow_stats():
+    return uow_metrics.stats()
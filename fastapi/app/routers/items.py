@@ -1,81 +1,380 @@
 # ⑤プレゼンテーション層
 # app/routers/items.py
-from fastapi import APIRouter, Body, Depends, HTTPException
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import partial
+import csv
+import io
+import json
+from typing import Literal
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.dto.item_dto import ItemCreateDTO, ItemReadDTO, ItemUpdateDTO, ItemUpdateNameDTO
-from app.db.database import get_db
+from app.domain.items import Item
+from app.dto.item_dto import (ItemBulkCreateResultDTO, ItemBulkDeleteResultDTO, ItemBulkErrorDTO, ItemCreateDTO, ItemPatchDTO,
+                              ItemReadDTO, ItemUpdateDTO, ItemUpdateNameDTO, ItemUpdateResultDTO)
+from app.db.read_routing import get_read_db, get_read_session_factory, use_replica
+from app.db.unit_of_work import UnitOfWork, get_uow
+from app.infrastructure.asyncpg import AsyncpgItemRepository, AsyncpgUnitOfWork
+from app.infrastructure.asyncpg.pool import LazyConnection
+from app.infrastructure.asyncpg.unit_of_work import get_asyncpg_read_connection, get_asyncpg_uow
+from app.infrastructure.batching import BatchedItemRepository, BatchLoader
+from app.infrastructure.batching.batched_item_repo import get_item_loader, get_read_item_loader
+from app.infrastructure.cache import CachedItemRepository, RepositoryCaches
+from app.infrastructure.cache.invalidation_bus import publish as publish_invalidation
+from app.infrastructure.cache.repository_caches import get_repository_caches
+from app.infrastructure.memory import InMemoryItemRepository, InMemoryStore
+from app.infrastructure.memory.store import get_memory_store
 from app.infrastructure.sqlalchemy.repositories.item_repo_impl import SQLAlchemyItemRepository
+from app.repository.exceptions import VersionConflictError
+from app.repository.item_repository import ItemRepository
+from app.routers.etag import expected_version, if_none_match, make_etag
+from app.routers.json_response import ItemListJSONResponse
+from app.routers.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.settings import FAST_JSON_RESPONSES, REPOSITORY_BACKEND
 from app.usecases.item.create_item import CreateItemUseCase
+from app.usecases.item.bulk_create_items import BulkCreateItemsUseCase
 from app.usecases.item.list_items import ListItemsUseCase
 from app.usecases.item.get_item import GetItemUseCase
+from app.usecases.item.get_items import GetItemsUseCase
+from app.usecases.item.search_items import SearchItemsUseCase
 from app.usecases.item.update_item import UpdateItemUseCase
 from app.usecases.item.update_item_name import UpdateItemNameUseCase
 from app.usecases.item.delete_item import DeleteItemUseCase
+from app.usecases.item.delete_items import DeleteItemsUseCase
+from app.usecases.item.patch_item import PatchItemUseCase
+from app.usecases.item.export_items import ExportItemsUseCase
 
 router = APIRouter(prefix="/items")
 
 # DIチェーン
-def get_item_repo(db: AsyncSession = Depends(get_db)):
-    return SQLAlchemyItemRepository(db)
+def get_sqlalchemy_item_repo(uow: UnitOfWork = Depends(get_uow),
+                             caches: RepositoryCaches = Depends(get_repository_caches),
+                             loader: BatchLoader = Depends(get_item_loader)):
+    # get_by_idをキャッシュするデコレータで包む(ユースケースからは同じ②のリポジトリに見える)
+    # キャッシュになかった分は、同時に来た他のリクエストの分とまとめて1回のSELECTで読む
+    # (このリクエストのセッションがすでに接続を持っていれば、まとめずにその接続で読む)
+    # 書き込んだときは、同じセッションのcommitで他のワーカーにもキャッシュの無効化を通知し、commitの後に自分のキャッシュをもう一度消す
+    # カテゴリIDの存在チェックはメモリ内のカテゴリカタログで行う
+    # commitはリポジトリではなく、リクエストの最後にUnitOfWorkが1回だけ行う
+    db = uow.session
+    repo = SQLAlchemyItemRepository(db, category_catalog=caches.category_catalog)
+    return CachedItemRepository(BatchedItemRepository(repo, loader, holds_connection=db.in_transaction), caches,
+                                publish=partial(publish_invalidation, db), on_commit=uow.after_commit)
+
+# 読み取り専用のルート用。レプリカがあればレプリカから読む(最近書き込んだクライアントはプライマリ)
+# レプリカから読んだ内容は反映が遅れているかもしれないので、共有のキャッシュには入れない
+def get_sqlalchemy_item_read_repo(db: AsyncSession = Depends(get_read_db),
+                                  caches: RepositoryCaches = Depends(get_repository_caches),
+                                  loader: BatchLoader = Depends(get_read_item_loader),
+                                  replica: bool = Depends(use_replica)):
+    repo = SQLAlchemyItemRepository(db, category_catalog=caches.category_catalog)
+    return CachedItemRepository(BatchedItemRepository(repo, loader, holds_connection=db.in_transaction), caches, fill_cache=not replica)
+
+# REPOSITORY_BACKEND=asyncpgのとき。包むデコレータはSQLAlchemy版と同じで、中身だけasyncpgの接続で読み書きする
+def get_asyncpg_item_repo(uow: AsyncpgUnitOfWork = Depends(get_asyncpg_uow),
+                          caches: RepositoryCaches = Depends(get_repository_caches),
+                          loader: BatchLoader = Depends(get_item_loader)):
+    repo = AsyncpgItemRepository(uow.connection, category_catalog=caches.category_catalog)
+    return CachedItemRepository(BatchedItemRepository(repo, loader, holds_connection=lambda: uow.connection.acquired), caches,
+                                publish=uow.publish, on_commit=uow.after_commit)
+
+def get_asyncpg_item_read_repo(connection: LazyConnection = Depends(get_asyncpg_read_connection),
+                               caches: RepositoryCaches = Depends(get_repository_caches),
+                               loader: BatchLoader = Depends(get_read_item_loader),
+                               replica: bool = Depends(use_replica)):
+    repo = AsyncpgItemRepository(connection, category_catalog=caches.category_catalog)
+    return CachedItemRepository(BatchedItemRepository(repo, loader, holds_connection=lambda: connection.acquired), caches,
+                                fill_cache=not replica)
+
+# REPOSITORY_BACKEND=memoryのとき。DBへの問い合わせがないので、まとめ読み込み(BatchLoader)では包まない
+# 書き込みと読み取りで同じものを使う。DBなしで測るときは、app.dependency_overridesでget_item_repo/get_item_read_repoをこれに差し替えてもよい
+def get_memory_item_repo(store: InMemoryStore = Depends(get_memory_store),
+                         caches: RepositoryCaches = Depends(get_repository_caches)):
+    return CachedItemRepository(InMemoryItemRepository(store), caches)
+
+# どの実装を使うかはREPOSITORY_BACKENDの設定で起動時に決める
+# (リクエストごとに分岐すると、使わないほうのセッション・接続の依存関係まで毎回解決されてしまうため)
+if REPOSITORY_BACKEND == "asyncpg":
+    get_item_repo, get_item_read_repo = get_asyncpg_item_repo, get_asyncpg_item_read_repo
+elif REPOSITORY_BACKEND == "memory":
+    get_item_repo = get_item_read_repo = get_memory_item_repo
+else:
+    get_item_repo, get_item_read_repo = get_sqlalchemy_item_repo, get_sqlalchemy_item_read_repo
 
 def get_create_uc(repo=Depends(get_item_repo)):
     return CreateItemUseCase(repo)
 
-def get_list_uc(repo=Depends(get_item_repo)):
+def get_bulk_create_uc(repo=Depends(get_item_repo)):
+    return BulkCreateItemsUseCase(repo)
+
+def get_list_uc(repo=Depends(get_item_read_repo)):
     return ListItemsUseCase(repo)
 
-def get_get_uc(repo=Depends(get_item_repo)):
+def get_get_uc(repo=Depends(get_item_read_repo)):
     return GetItemUseCase(repo)
 
+def get_get_many_uc(repo=Depends(get_item_read_repo)):
+    return GetItemsUseCase(repo)
+
+def get_search_uc(repo=Depends(get_item_read_repo)):
+    return SearchItemsUseCase(repo)
+
 def get_update_uc(repo=Depends(get_item_repo)):
     return UpdateItemUseCase(repo)
 
 def get_update_name_uc(repo=Depends(get_item_repo)):
     return UpdateItemNameUseCase(repo)
 
+def get_patch_uc(repo=Depends(get_item_repo)):
+    return PatchItemUseCase(repo)
+
 def get_delete_uc(repo=Depends(get_item_repo)):
     return DeleteItemUseCase(repo)
 
+def get_delete_many_uc(repo=Depends(get_item_repo)):
+    return DeleteItemsUseCase(repo)
+
+# エクスポートはレスポンスを送り終わるまでDBのカーソルを開いておく必要があるが、
+# Depends(get_db)のセッションはレスポンスの送信前に閉じられてしまう。
+# そのため、リポジトリそのものではなく「リポジトリを開く関数」を注入し、ストリームの中で開く
+# (開いたリポジトリは、ストリームの間だけ使う自分のセッション・接続を持つ。読み取りだけなので、レプリカがあればレプリカから読む)
+def get_sqlalchemy_export_repo_factory(session_factory=Depends(get_read_session_factory)):
+    @asynccontextmanager
+    async def open_repo() -> AsyncIterator[ItemRepository]:
+        async with session_factory() as db:
+            yield SQLAlchemyItemRepository(db)
+    return open_repo
+
+def get_asyncpg_export_repo_factory(request: Request, replica: bool = Depends(use_replica)):
+    pools = request.app.state.pg_pools
+
+    @asynccontextmanager
+    async def open_repo() -> AsyncIterator[ItemRepository]:
+        connection = LazyConnection(await pools.pool(replica))
+        try:
+            yield AsyncpgItemRepository(connection)
+        finally:
+            await connection.release()
+    return open_repo
+
+# REPOSITORY_BACKEND=memoryのときは、メモリ内の置き場から書き出す(開くもの・閉じるものはない)
+def get_memory_export_repo_factory(store: InMemoryStore = Depends(get_memory_store)):
+    @asynccontextmanager
+    async def open_repo() -> AsyncIterator[ItemRepository]:
+        yield InMemoryItemRepository(store)
+    return open_repo
+
+if REPOSITORY_BACKEND == "asyncpg":
+    get_export_repo_factory = get_asyncpg_export_repo_factory
+elif REPOSITORY_BACKEND == "memory":
+    get_export_repo_factory = get_memory_export_repo_factory
+else:
+    get_export_repo_factory = get_sqlalchemy_export_repo_factory
+
+# エクスポートで1回に書き出す件数(DBから受け取る件数も同じ)
+EXPORT_CHUNK_SIZE = 1000
+
 # エンドポイント
 # 各メソッドの引数dtoはスキーマの型、ucでユースケースの型を指定。ただし、ucについてはDependsでユースケースをラップし、fastapiまかせにする
 @router.post("/", response_model=ItemReadDTO)
 async def create(dto: ItemCreateDTO,
                  uc: CreateItemUseCase = Depends(get_create_uc)):
     category_ids = dto.category_ids or []
-    item = await uc.execute(dto.item_name, category_ids)
+    try:
+        item = await uc.execute(dto.item_name, category_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     return ItemReadDTO(item_id=item.id, item_name=item.name, category_ids=item.category_ids)
 
+# 一括作成で1リクエストに含められる件数の上限
+MAX_BULK_CREATE_ITEMS = 10000
+
+# Itemの一括作成
+# 1件ずつPOST /items/ を呼ぶ代わりに、複数行INSERTでまとめて作成する。検証エラーの行はerrorsに何番目の行かとともに返す
+@router.post("/bulk", response_model=ItemBulkCreateResultDTO)
+async def bulk_create(dtos: list[ItemCreateDTO],
+                      uc: BulkCreateItemsUseCase = Depends(get_bulk_create_uc)):
+    if len(dtos) > MAX_BULK_CREATE_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many items (max {MAX_BULK_CREATE_ITEMS})")
+    items, errors = await uc.execute([(dto.item_name, dto.category_ids or []) for dto in dtos])
+    return ItemBulkCreateResultDTO(
+        created=[ItemReadDTO(item_id=item.id, item_name=item.name, category_ids=item.category_ids) for item in items],
+        errors=[ItemBulkErrorDTO(index=index, detail=detail) for index, detail in errors],
+    )
+
+# 一覧はカーソル方式のページング。次ページがあればX-Next-Cursorヘッダにカーソルを入れて返すので、それをafterに渡して次を取得する
+# ids=1,2,3 を指定したときは、そのIDのItemだけをまとめて返す(存在しないIDは含めない。ページングはしない)
+# category_ids=1,2 を指定したときは、カテゴリで絞り込む(match=all: すべてに属する / any: どれかに属する)。ページングもできる
 @router.get("/", response_model=list[ItemReadDTO])
-async def list_all(uc: ListItemsUseCase = Depends(get_list_uc)):
-    items = await uc.execute()
-    return [
-        ItemReadDTO(item_id=item.id, item_name=item.name, category_ids=item.category_ids)
+async def list_all(response: Response,
+                   after: str | None = Query(None, description="前ページのX-Next-Cursorヘッダの値"),
+                   limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                   ids: str | None = Query(None, description="カンマ区切りのitem_id"),
+                   category_ids: str | None = Query(None, description="カンマ区切りのcategory_id"),
+                   match: Literal["all", "any"] = Query("any", description="category_idsの絞り込み方"),
+                   uc: ListItemsUseCase = Depends(get_list_uc),
+                   get_many_uc: GetItemsUseCase = Depends(get_get_many_uc)):
+    headers = {}
+    if ids is not None:
+        items = await get_many_uc.execute(_parse_ids(ids, "ids"))
+    else:
+        filter_ids = _parse_ids(category_ids, "category_ids") if category_ids is not None else None
+        items, next_after = await uc.execute(decode_cursor(after), limit, filter_ids, match)
+        if next_after is not None:
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(next_after)
+    return item_list_response(items, response, headers)
+
+# Itemの一括削除。DELETE ... RETURNINGの1文で削除し、存在しなかったIDはnot_foundで返す
+@router.delete("/", response_model=ItemBulkDeleteResultDTO)
+async def delete_many(ids: str = Query(..., description="カンマ区切りのitem_id"),
+                      uc: DeleteItemsUseCase = Depends(get_delete_many_uc)):
+    deleted, not_found = await uc.execute(_parse_ids(ids, "ids"))
+    return ItemBulkDeleteResultDTO(deleted=deleted, not_found=not_found)
+
+def item_list_response(items: list[Item], response: Response | None = None, headers: dict[str, str] | None = None):
+    # Itemの一覧の返し方(FAST_JSON_RESPONSES)。レスポンスのクラスで返すときは、注入されたresponseのヘッダは使われないので直接渡す
+    if FAST_JSON_RESPONSES:
+        return ItemListJSONResponse(items, headers=headers)
+    if headers:
+        response.headers.update(headers)
+    return [ItemReadDTO(item_id=item.id, item_name=item.name, category_ids=item.category_ids) for item in items]
+
+def _parse_ids(ids: str, name: str) -> list[int]:
+    try:
+        parsed = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be comma separated integers")
+    if len(parsed) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many {name} (max {MAX_PAGE_SIZE})")
+    return parsed
+
+# 名前検索で返す件数の上限
+MAX_SEARCH_LIMIT = 100
+
+# 名前検索。mode=prefixは前方一致(名前順)、mode=fuzzyは似ている名前(類似度の高い順)
+# /{item_id}より先に定義する(でないと"search"がitem_idとして扱われる)
+@router.get("/search", response_model=list[ItemReadDTO])
+async def search(q: str = Query(..., min_length=1, max_length=200),
+                 mode: Literal["prefix", "fuzzy"] = Query("fuzzy"),
+                 limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT),
+                 uc: SearchItemsUseCase = Depends(get_search_uc)):
+    try:
+        items = await uc.execute(q, mode, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return item_list_response(items)
+
+# 全件エクスポート(NDJSON or CSV)
+# 全件のlistを作らず、DBから受け取ったchunk単位でそのままレスポンスに書き出す
+# ※ "/{item_id}" より前に定義しないと、"export"がitem_idとして解釈されてしまう
+@router.get("/export")
+async def export_items(format: Literal["ndjson", "csv"] = Query("ndjson"),
+                       open_repo=Depends(get_export_repo_factory)):
+    encode = _encode_ndjson if format == "ndjson" else _encode_csv
+
+    async def body():
+        if format == "csv":
+            yield b"item_id,item_name,category_ids\r\n"
+        async with open_repo() as repo:
+            uc = ExportItemsUseCase(repo)
+            async for items in uc.execute(EXPORT_CHUNK_SIZE):
+                yield encode(items)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="items.{format}"'},
+    )
+
+def _encode_ndjson(items: list[Item]) -> bytes:
+    # 1行1Item(JSON)。キーはItemReadDTOと同じにする
+    return "".join(
+        json.dumps({"item_id": item.id, "item_name": item.name, "category_ids": item.category_ids}, ensure_ascii=False) + "\n"
         for item in items
-    ]
+    ).encode()
 
+def _encode_csv(items: list[Item]) -> bytes:
+    # category_idsは1列に「;」区切りで入れる
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for item in items:
+        writer.writerow([item.id, item.name, ";".join(str(c) for c in item.category_ids or [])])
+    return buf.getvalue().encode()
+
+# 詳細取得はETagつきで返す。If-None-Matchが今のETagと同じなら、Itemとカテゴリを読み込まずに304を返す
 @router.get("/{item_id}", response_model=ItemReadDTO)
 async def get_item(item_id: int,
+                   response: Response,
+                   if_none_match_header: str | None = Header(None, alias="If-None-Match"),
                    uc: GetItemUseCase = Depends(get_get_uc)):
+    if if_none_match_header is not None:
+        version = await uc.current_version(item_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        etag = make_etag("item", item_id, version)
+        if if_none_match(if_none_match_header, etag):
+            return Response(status_code=304, headers={"ETag": etag})
     item = await uc.execute(item_id)
     if item is None:
         raise HTTPException(status_code=404, detail="Item not found")
+    response.headers["ETag"] = make_etag("item", item.id, item.version)
     return ItemReadDTO(
         item_id=item.id,
         item_name=item.name,
         category_ids=item.category_ids
     )
 
-@router.put("/{item_id}", response_model=ItemReadDTO)
+# 更新系はIf-Matchに対応する。指定されたETagのバージョンから変わっていたら412を返す(楽観的排他制御)
+# 存在しないカテゴリIDはエラーにせず紐づけないで、rejected_category_idsで返す
+@router.put("/{item_id}", response_model=ItemUpdateResultDTO)
 async def update_item(item_id: int,
                       dto: ItemUpdateDTO,
+                      response: Response,
+                      if_match: str | None = Header(None, alias="If-Match"),
                       uc: UpdateItemUseCase = Depends(get_update_uc)):
-    item = await uc.execute(item_id, dto.item_name, dto.category_ids)
-    if item is None:
+    try:
+        result = await uc.execute(item_id, dto.item_name, dto.category_ids, expected_version(if_match, "item", item_id))
+    except VersionConflictError:
+        raise HTTPException(status_code=412, detail="Item has been modified")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if result is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    return ItemReadDTO(
+    item, rejected_category_ids = result
+    response.headers["ETag"] = make_etag("item", item.id, item.version)
+    return ItemUpdateResultDTO(
         item_id=item.id,
         item_name=item.name,
-        category_ids=item.category_ids
+        category_ids=item.category_ids,
+        rejected_category_ids=rejected_category_ids
+    )
+
+# Itemの一部更新。送った項目だけを変える(UPDATE ... RETURNINGの1文。カテゴリも変えるときはもう1文)
+@router.patch("/{item_id}", response_model=ItemUpdateResultDTO)
+async def patch_item(item_id: int,
+                     dto: ItemPatchDTO,
+                     response: Response,
+                     if_match: str | None = Header(None, alias="If-Match"),
+                     uc: PatchItemUseCase = Depends(get_patch_uc)):
+    # category_idsを送らなかった場合は変えない。nullを送った場合はすべてのカテゴリを外す
+    category_ids = (dto.category_ids or []) if "category_ids" in dto.model_fields_set else None
+    try:
+        result = await uc.execute(item_id, dto.item_name, category_ids, expected_version(if_match, "item", item_id))
+    except VersionConflictError:
+        raise HTTPException(status_code=412, detail="Item has been modified")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    item, rejected_category_ids = result
+    response.headers["ETag"] = make_etag("item", item.id, item.version)
+    return ItemUpdateResultDTO(
+        item_id=item.id,
+        item_name=item.name,
+        category_ids=item.category_ids,
+        rejected_category_ids=rejected_category_ids
     )
 
 # Itemの一部更新(商品名のみ更新のルート)
@@ -83,14 +382,21 @@ async def update_item(item_id: int,
 @router.put("/{item_id}/name_body", response_model=ItemReadDTO)
 async def update_name_body(
     item_id: int,
+    response: Response,
     new_name: str = Body(..., embed=True),
+    if_match: str | None = Header(None, alias="If-Match"),
     uc: UpdateItemNameUseCase = Depends(get_update_name_uc)
 ):
     try:
-        item = await uc.execute(item_id, new_name)
-    except ValueError:
+        item = await uc.execute(item_id, new_name, expected_version(if_match, "item", item_id))
+    except VersionConflictError:
+        raise HTTPException(status_code=412, detail="Item has been modified")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if item is None:
         raise HTTPException(status_code=404, detail="Item not found")
 
+    response.headers["ETag"] = make_etag("item", item.id, item.version)
     return ItemReadDTO(
         item_id=item.id,
         item_name=item.name,
@@ -104,13 +410,20 @@ async def update_name_body(
 async def update_name_dto(
     item_id: int,
     dto: ItemUpdateNameDTO,
+    response: Response,
+    if_match: str | None = Header(None, alias="If-Match"),
     uc: UpdateItemNameUseCase = Depends(get_update_name_uc)
 ):
     try:
-        item = await uc.execute(item_id, dto.item_name)
-    except ValueError:
+        item = await uc.execute(item_id, dto.item_name, expected_version(if_match, "item", item_id))
+    except VersionConflictError:
+        raise HTTPException(status_code=412, detail="Item has been modified")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if item is None:
         raise HTTPException(status_code=404, detail="Item not found")
 
+    response.headers["ETag"] = make_etag("item", item.id, item.version)
     return ItemReadDTO(
         item_id=item.id,
         item_name=item.name,
@@ -118,10 +431,14 @@ async def update_name_dto(
     )
 
 @router.delete("/{item_id}", status_code=204)
-async def delete_item(item_id: int, uc: DeleteItemUseCase = Depends(get_delete_uc)):
+async def delete_item(item_id: int,
+                      if_match: str | None = Header(None, alias="If-Match"),
+                      uc: DeleteItemUseCase = Depends(get_delete_uc)):
     try:
-        await uc.execute(item_id)
+        await uc.execute(item_id, expected_version(if_match, "item", item_id))
+    except VersionConflictError:
+        raise HTTPException(status_code=412, detail="Item has been modified")
     except ValueError:
         raise HTTPException(status_code=404, detail="str(e)")
     # なにも返さなくていい。(他のユースケースだと、レコードをDTOで返すが、削除だと不要)
-    return None
\ No newline at end of file
+    return None
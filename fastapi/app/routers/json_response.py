@@ -0,0 +1,49 @@
+# ⑤プレゼンテーション層 (一覧系エンドポイントで共通のレスポンス部品)
+# app/routers/json_response.py
+# 一覧のレスポンスを、①のエンティティ(Item/Category)のlistから直接JSONのバイト列にする
+# いつもの返し方(DTOのlistを返す)だと、1件ごとにDTOを作って検証し、FastAPIがresponse_modelでもう一度検証・変換してからJSONにする
+# ここでは検証はせず、TypeAdapterのdump_json(pydantic-coreでのJSON化)を1回呼ぶだけにする
+# レスポンスのクラスとして返すとresponse_modelでの変換は行われないが、OpenAPIのスキーマはresponse_modelのままになる
+# キーの順番はDTO(ItemReadDTO/CategoryReadDTO)と同じにして、いつもの返し方と同じバイト列にする
+from typing_extensions import TypedDict
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+from app.domain.category import Category
+from app.domain.items import Item
+
+
+class _ItemJSON(TypedDict):
+    item_name: str
+    category_ids: list[int] | None
+    item_id: int
+
+
+class _CategoryJSON(TypedDict):
+    category_name: str
+    category_id: int
+
+
+_items_adapter = TypeAdapter(list[_ItemJSON])
+_categories_adapter = TypeAdapter(list[_CategoryJSON])
+
+
+def encode_items(items: list[Item]) -> bytes:
+    return _items_adapter.dump_json(
+        [{"item_name": i.name, "category_ids": i.category_ids, "item_id": i.id} for i in items]
+    )
+
+
+def encode_categories(categories: list[Category]) -> bytes:
+    return _categories_adapter.dump_json(
+        [{"category_name": c.name, "category_id": c.id} for c in categories]
+    )
+
+
+class ItemListJSONResponse(Response):
+    # Itemのlistをそのまま渡す(headersにX-Next-Cursorなども渡せる)
+    media_type = "application/json"
+
+    def render(self, content: list[Item]) -> bytes:
+        return encode_items(content)
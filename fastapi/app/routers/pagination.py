@@ -0,0 +1,36 @@
+# ⑤プレゼンテーション層 (一覧系エンドポイントで共通のページング部品)
+# app/routers/pagination.py
+# カーソル(キーセット)方式のページングで使う。
+# クライアントには「最後に返した行のID」をそのまま見せず、中身を意識させない不透明な文字列(カーソル)として渡す。
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+
+# 1ページあたりの件数。limit未指定時はDEFAULT、指定時もMAXを超えられない(=テーブル全件を一度に取得させない)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# 次ページのカーソルを返すレスポンスヘッダ名(レスポンスボディの形はlistのまま変えない)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    # 最後に返した行のIDをカーソル文字列にする
+    raw = json.dumps({"after": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> int | None:
+    # カーソル文字列から「このIDより後ろ」のID値を取り出す。未指定ならNone(=先頭ページ)
+    if cursor is None:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        after = json.loads(base64.urlsafe_b64decode(padded.encode()))["after"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(after, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after
@@ -0,0 +1,133 @@
+# ⑤プレゼンテーション層 (全ルート共通のミドルウェアと/metrics)
+# app/routers/request_metrics.py
+# リクエストごとに、SQLの回数・DBの時間・接続プールから接続を取り出すのにかかった時間(app/db/query_timing.py)と、
+# ハンドラの時間(ミドルウェアに入ってからレスポンスのヘッダを返すまで)を測り、
+#   ・Server-Timingヘッダで返す(ブラウザの開発者ツールなどで、遅いのがSQLかPythonかを見分けられる)
+#   ・ルートごとのヒストグラムに集計し、/metricsでPrometheusの形式で返す
+# BaseHTTPMiddlewareはリクエストごとにタスク・ストリームを作るので、それを使わないASGIのミドルウェアにしている
+# 集計はプロセス(ワーカー)ごと。Prometheusからワーカーごとに取得して合算する
+from bisect import bisect_left
+import time
+
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.query_timing import RequestTiming, end_request_timing, start_request_timing
+
+# ヒストグラムの区切り(秒)。DBの時間も同じ区切りで数える
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# どのルートにも一致しなかったリクエスト(404)のroute(パスをそのままラベルにすると、種類が増え続けるため)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def server_timing(timing: RequestTiming, handler_seconds: float) -> str:
+    return (
+        f'db;dur={timing.db_seconds * 1000:.2f};desc="{timing.queries} queries", '
+        f"pool;dur={timing.pool_wait_seconds * 1000:.2f}, "
+        f"handler;dur={handler_seconds * 1000:.2f}"
+    )
+
+
+class Histogram:
+    def __init__(self):
+        # counts[i]はBUCKETS[i]以下(で、BUCKETS[i-1]より大きい)の件数。最後は+Infの分
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total, lines = 0, []
+        for le, count in zip([*map(str, BUCKETS), "+Inf"], self.counts):
+            total += count
+            lines.append((le, total))
+        return lines
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.duration = Histogram()
+        self.db = Histogram()
+        self.queries = 0
+        self.pool_wait_seconds = 0.0
+
+
+class RequestMetrics:
+    # (method, route) → RouteMetrics。routeは"/items/{item_id}"のようなルートの定義のパス
+    def __init__(self):
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+
+    def record(self, method: str, route: str, timing: RequestTiming, seconds: float) -> None:
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        metrics.duration.observe(seconds)
+        metrics.db.observe(timing.db_seconds)
+        metrics.queries += timing.queries
+        metrics.pool_wait_seconds += timing.pool_wait_seconds
+
+    def render(self) -> str:
+        # Prometheusのテキスト形式
+        lines: list[str] = []
+        for name, help_text, histogram in (
+            ("http_request_duration_seconds", "Time spent handling the request", lambda m: m.duration),
+            ("http_request_db_seconds", "Time spent in SQL per request", lambda m: m.db),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (method, route), metrics in sorted(self.routes.items()):
+                labels = f'method="{method}",route="{_escape(route)}"'
+                h = histogram(metrics)
+                lines += [f'{name}_bucket{{{labels},le="{le}"}} {count}' for le, count in h.cumulative()]
+                lines += [f"{name}_sum{{{labels}}} {h.sum}", f"{name}_count{{{labels}}} {sum(h.counts)}"]
+        for name, help_text, value in (
+            ("http_request_db_queries_total", "SQL statements executed", lambda m: m.queries),
+            ("http_request_db_pool_wait_seconds_total", "Time spent waiting for a pool connection", lambda m: m.pool_wait_seconds),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (method, route), metrics in sorted(self.routes.items()):
+                lines.append(f'{name}{{method="{method}",route="{_escape(route)}"}} {value(metrics)}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing, token = start_request_timing()
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", server_timing(timing, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request_timing(token)
+            # ルーティングが終わると、一致したルートがscope["route"]に入っている
+            route = scope.get("route")
+            self.metrics.record(scope["method"], getattr(route, "path", UNMATCHED_ROUTE), timing, time.perf_counter() - started)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    # 同時実行数の制限(app/routers/admission_control.py)の待ち行列の長さ・断った数も一緒に返す
+    state = request.app.state
+    return PlainTextResponse(state.request_metrics.render() + state.admission_control.render(), media_type="text/plain; version=0.0.4")
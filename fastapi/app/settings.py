@@ -0,0 +1,84 @@
+# アプリ全体の設定値
+# app/settings.py
+# DATABASE_URLと同じく環境変数から読み込む。未設定ならデフォルト値を使う
+import os
+
+# ---ID採番---
+# 1回のDB問い合わせ(シーケンスのnextval)でまとめて予約しておくIDの個数
+# 1ならIDごとにnextvalを呼ぶ。2以上ならプロセス内に予約したIDがある間はDBに問い合わせずに採番できる
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "50"))
+
+# ---キャッシュ---
+# get_by_idの結果をプロセス内にキャッシュする件数の上限(Item, Categoryそれぞれ)。0ならキャッシュしない
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# キャッシュの有効期限(秒)。他のプロセスで更新された場合も、最長この時間で最新になる
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+# 他のワーカーでの更新をPostgresのLISTEN/NOTIFYで受け取り、キャッシュを消すか(接続プールの接続を1つ使い続ける)
+INVALIDATION_BUS_ENABLED = os.getenv("INVALIDATION_BUS_ENABLED", "true").lower() == "true"
+
+# ---まとめ読み込み(DataLoader)---
+# Itemの詳細取得を、この時間(マイクロ秒)だけためてからIN句の1回のSELECTにまとめる
+# 0なら待たずに、イベントループの次の1周までに来た分だけをまとめる
+ITEM_LOADER_WINDOW_MICROSECONDS = int(os.getenv("ITEM_LOADER_WINDOW_MICROSECONDS", "0"))
+# 1回のSELECTにまとめるIDの個数の上限。ここまでたまったら待たずに問い合わせる
+ITEM_LOADER_MAX_BATCH_SIZE = int(os.getenv("ITEM_LOADER_MAX_BATCH_SIZE", "500"))
+
+# ---DB接続(エンジン・接続プール)---
+# 実行したSQLをログに出すか(出すとSQLごとにログの処理が入り、負荷が高いときは遅くなる)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+# プロセスごとに常に持っておく接続の数と、それを超えて一時的に作ってよい接続の数
+# 全ワーカーの(DB_POOL_SIZE + DB_MAX_OVERFLOW)の合計が、Postgresのmax_connectionsを超えないようにする
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# 空きの接続を待つ秒数。過ぎたらエラーにする
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# この秒数より古い接続は、次に使うときに作り直す(-1なら作り直さない)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# 接続をプールから取り出すたびに、生きているか確認するか(確認のたびに1往復増える)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# asyncpgが接続ごとに覚えておくプリペアドステートメントの数(pgbouncerのトランザクションモード経由なら0にする)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# ---読み取り用レプリカ---
+# DATABASE_REPLICA_URLを設定すると、GETのルートはレプリカから読む(未設定ならすべてプライマリ=DATABASE_URL)
+# 書き込んだクライアントは、この秒数の間はプライマリから読む(レプリカへの反映遅れで、自分の書き込みが見えなくなるのを防ぐ)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+# ---リポジトリの実装---
+# sqlalchemy: SQLAlchemyのセッション(AsyncSession)で読み書きする
+# asyncpg   : SQLAlchemyを通さず、asyncpgの接続プールでSQLを直接実行する(セッション・ORMの処理がない分、1リクエストあたりのCPUが少ない)
+# memory    : DBを使わず、プロセスのメモリ内に持つ(再起動で消える。DBなしでフレームワーク側の処理時間を測るためのもの)
+# どれも同じ②のリポジトリ(ItemRepository/CategoryRepository)を実装しているので、ユースケースから見た動きは同じ
+REPOSITORY_BACKEND = os.getenv("REPOSITORY_BACKEND", "sqlalchemy")
+if REPOSITORY_BACKEND not in ("sqlalchemy", "asyncpg", "memory"):
+    raise ValueError(f"REPOSITORY_BACKEND must be 'sqlalchemy', 'asyncpg' or 'memory' (got {REPOSITORY_BACKEND!r})")
+
+# ---レスポンスのJSON化---
+# 一覧系のGET(/items/, /items/search, /categories/, /categories/{id}/items)を、DTOを作らずにエンティティから直接JSONにする
+# falseならDTOのlistを返し、FastAPIがresponse_modelで検証・変換する(どちらでもレスポンスのバイト列・OpenAPIのスキーマは同じ)
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() == "true"
+
+# ---リクエストごとの計測---
+# リクエストごとのSQLの回数・DBの時間・接続の取り出し待ち・ハンドラの時間を、Server-Timingヘッダで返し、/metricsでルートごとに集計する
+REQUEST_METRICS_ENABLED = os.getenv("REQUEST_METRICS_ENABLED", "true").lower() == "true"
+
+# ---同時実行数の制限(アドミッション制御)---
+# 同時に処理するリクエストの数に上限を設け、超えた分は待ち行列で待たせ、待ちきれなければ503(Retry-After付き)ですぐに返す
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+# 読み取りと書き込みは同じ接続プールを使うので、2つの上限は1つの接続の予算を分け合う
+#   不変条件: ADMISSION_READ_LIMIT + ADMISSION_WRITE_LIMIT <= ADMISSION_CONNECTION_BUDGET <= DB_POOL_SIZE + DB_MAX_OVERFLOW
+# (満たさない設定ではAdmissionControlがValueErrorにする。満たせば、処理中のリクエストが接続プールの空きを待つことはない)
+# 予算は接続プールの最大から、キャッシュ無効化の通知を受け取り続ける接続(INVALIDATION_BUS_ENABLED)の1つを除いた数
+# まとめ読み込み(DataLoader)の接続は数えない。ローダーは自分の接続を持っていないリクエストからしか使わないので
+# (BatchedItemRepositoryのholds_connection)、1つのリクエストが同時に使う接続は、自分の接続かローダーの接続のどちらか1つまで
+ADMISSION_CONNECTION_BUDGET = DB_POOL_SIZE + DB_MAX_OVERFLOW - (1 if INVALIDATION_BUS_ENABLED else 0)
+# 書き込みの上限。書き込みはトランザクションの間ずっと接続を使うので、デフォルトは常に持っている接続の数(DB_POOL_SIZE)まで
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", str(DB_POOL_SIZE)))
+# 読み取り(GET/HEAD/OPTIONS)の上限。デフォルトは予算から書き込みの分を除いた残り
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", str(ADMISSION_CONNECTION_BUDGET - ADMISSION_WRITE_LIMIT)))
+# 読み取り・書き込みそれぞれで、上限を超えて待たせてよいリクエストの数。超えたらすぐに503を返す
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "50"))
+# 待ち行列で待つ秒数。過ぎたら503を返す(DB_POOL_TIMEOUTよりずっと短くする)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1"))
+# 503のRetry-Afterヘッダの秒数
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
@@ -7,5 +7,10 @@ class ListCategoriesUseCase:
     def __init__(self, repo: CategoryRepository):
         self.repo = repo
 
-    async def execute(self) -> list[Category]:
-        return await self.repo.list_all()
+    async def execute(self, after: int | None, limit: int) -> tuple[list[Category], int | None]:
+        # limit+1件取得して、limit件を超えた分があれば「次のページがある」と判断する
+        categories = await self.repo.list_all(after=after, limit=limit + 1)
+        if len(categories) > limit:
+            categories = categories[:limit]
+            return categories, categories[-1].id
+        return categories, None
@@ -0,0 +1,21 @@
+# ③ユースケース
+# app/usecases/category/list_category_items.py
+from app.domain.items import Item
+from app.repository.category_repository import CategoryRepository
+from app.repository.item_repository import ItemRepository
+
+class ListCategoryItemsUseCase:
+    def __init__(self, category_repo: CategoryRepository, item_repo: ItemRepository):
+        self.category_repo = category_repo
+        self.item_repo = item_repo
+
+    async def execute(self, category_id: int, after: int | None, limit: int) -> tuple[list[Item], int | None] | None:
+        # カテゴリが存在しなければNone
+        if await self.category_repo.get_by_id(category_id) is None:
+            return None
+        # ListItemsUseCaseと同じく、limit+1件取得して次のページがあるか判断する
+        items = await self.item_repo.list_by_category(category_id, after=after, limit=limit + 1)
+        if len(items) > limit:
+            items = items[:limit]
+            return items, items[-1].id
+        return items, None
@@ -8,15 +8,13 @@ class UpdateCategoryUseCase:
         # 引数のrepoの型は②抽象リポジトリクラス(=④リポジトリ実装のインターフェース)である。
         self.repo = repo
 
-    async def execute(self, category_id: int, name: str) -> Category | None:
-        # 更新対象のCategoryを取得(repoは②=④を継承しているのでいきなりget_by_idができる)
-        category = await self.repo.get_by_id(category_id)
-        if category is None:
+    async def execute(self, category_id: int, name: str, expected_version: int | None = None) -> Category | None:
+        # expected_versionを指定した場合、そのバージョンのときだけ更新する(違えばリポジトリがVersionConflictErrorを送出する)
+        # 名前を置き換えるだけなので、更新前のCategoryは読み込まない(存在しなければリポジトリがValueErrorを送出する)
+        category = Category(category_id, name)
+        try:
+            # 実際に更新するのは以下(④で内容は実装している(もっとも④では②を継承しているからupdateメソッドを作成せざるをえないのだが))
+            await self.repo.update(category, expected_version=expected_version)
+        except ValueError:
             return None
-
-        # 値を更新（エンティティ自体を更新）
-        category.name = name
-        
-        # 実際に更新するのは以下(④で内容は実装している(もっとも④では②を継承しているからupdateメソッドを作成せざるをえないのだが))
-        await self.repo.update(category)
         return category
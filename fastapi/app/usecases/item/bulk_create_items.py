@@ -0,0 +1,33 @@
+# ③ユースケース
+# app/usecases/item/bulk_create_items.py
+from app.domain.items import CategoryId, Item, ItemName
+from app.repository.item_repository import ItemRepository
+
+class BulkCreateItemsUseCase:
+    def __init__(self, repo: ItemRepository):
+        self.repo = repo
+
+    async def execute(self, rows: list[tuple[str, list[int]]]) -> tuple[list[Item], list[tuple[int, str]]]:
+        # rowsは(アイテム名, カテゴリIDのリスト)のリスト
+        # 戻り値は(作成したアイテム, (rowsの何番目か, エラー内容)のリスト)
+        # 値オブジェクトで1行ずつ検証し、エラーの行は作成せずに報告する(他の行の作成は止めない)
+        valid: list[tuple[ItemName, list[CategoryId]]] = []
+        errors: list[tuple[int, str]] = []
+        for index, (name, category_ids) in enumerate(rows):
+            try:
+                valid.append((ItemName(name), [CategoryId(c) for c in category_ids]))
+            except ValueError as e:
+                errors.append((index, str(e)))
+
+        if not valid:
+            return [], errors
+
+        # IDは必要な個数をまとめて採番する(1件ごとに採番のクエリを投げない)
+        new_item_ids = await self.repo.next_identifiers(len(valid))
+        items = [
+            Item(item_id=item_id, name=name.value, category_ids=[c.value for c in category_ids])
+            for item_id, (name, category_ids) in zip(new_item_ids, valid)
+        ]
+        # 作成したアイテムをリポジトリにまとめて保存
+        await self.repo.save_many(items)
+        return items, errors
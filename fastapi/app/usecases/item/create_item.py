@@ -1,6 +1,6 @@
 # ③ユースケース
 # app/usecases/item/create_item.py
-from app.domain.items import Item
+from app.domain.items import Item, ItemName
 from app.repository.item_repository import ItemRepository
 
 class CreateItemUseCase:
@@ -8,6 +8,8 @@ class CreateItemUseCase:
         self.repo = repo
 
     async def execute(self, name: str, category_ids: list[int]) -> Item:
+        # 名前は検索と同じ形で探せるよう、正規化して保存する(空・長すぎる名前はIDを取る前にValueError)
+        name = ItemName(name).value
         # 新しいアイテムを作成する前に、次のIDを取得
         new_item_id = await self.repo.next_identifier()
         # 次にアイテムモデル(=エンティティ)からアイテムを作成
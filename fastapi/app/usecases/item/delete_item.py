@@ -6,6 +6,6 @@ class DeleteItemUseCase:
     def __init__(self, repo: ItemRepository):
         self.repo = repo
 
-    async def execute(self, item_id: int) -> Item | None:
-        await self.repo.delete(item_id)
-        return None
\ No newline at end of file
+    async def execute(self, item_id: int, expected_version: int | None = None) -> Item | None:
+        await self.repo.delete(item_id, expected_version=expected_version)
+        return None
@@ -0,0 +1,13 @@
+# ③ユースケース
+# app/usecases/item/delete_items.py
+from app.repository.item_repository import ItemRepository
+
+class DeleteItemsUseCase:
+    def __init__(self, repo: ItemRepository):
+        self.repo = repo
+
+    async def execute(self, item_ids: list[int]) -> tuple[list[int], list[int]]:
+        # 戻り値は(削除したID, 存在しなかったID)
+        deleted = await self.repo.delete_many(item_ids)
+        deleted_set = set(deleted)
+        return deleted, [item_id for item_id in dict.fromkeys(item_ids) if item_id not in deleted_set]
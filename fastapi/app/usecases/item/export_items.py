@@ -0,0 +1,14 @@
+# ③ユースケース
+# app/usecases/item/export_items.py
+from collections.abc import AsyncIterator
+from app.domain.items import Item
+from app.repository.item_repository import ItemRepository
+
+class ExportItemsUseCase:
+    def __init__(self, repo: ItemRepository):
+        self.repo = repo
+
+    async def execute(self, chunk_size: int) -> AsyncIterator[list[Item]]:
+        # 全Itemをchunk_size件ずつ順に返す(全件をメモリに載せない)
+        async for items in self.repo.stream_all(chunk_size):
+            yield items
@@ -8,3 +8,7 @@ class GetItemUseCase:
 
     async def execute(self, item_id: int) -> Item | None:
         return await self.repo.get_by_id(item_id)
+
+    async def current_version(self, item_id: int) -> int | None:
+        # Itemを読み込まずにバージョンだけを返す(ETagが変わっていないかの確認用)
+        return await self.repo.get_version(item_id)
@@ -0,0 +1,12 @@
+# ③ユースケース
+# app/usecases/item/get_items.py
+from app.domain.items import Item
+from app.repository.item_repository import ItemRepository
+
+class GetItemsUseCase:
+    def __init__(self, repo: ItemRepository):
+        self.repo = repo
+
+    async def execute(self, item_ids: list[int]) -> list[Item]:
+        # 存在しないIDは結果に含めない
+        return await self.repo.get_many(item_ids)
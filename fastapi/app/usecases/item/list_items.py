@@ -1,10 +1,17 @@
 # ③ユースケース
 # app/usecases/item/list_items
 from app.domain.items import Item
-from app.repository.item_repository import ItemRepository
+from app.repository.item_repository import CategoryMatch, ItemRepository
 class ListItemsUseCase:
     def __init__(self, repo: ItemRepository):
         self.repo = repo
 
-    async def execute(self) -> list[Item]:
-        return await self.repo.list_all()
\ No newline at end of file
+    async def execute(self, after: int | None, limit: int,
+                      category_ids: list[int] | None = None, match: CategoryMatch = "any") -> tuple[list[Item], int | None]:
+        # limit+1件取得して、limit件を超えた分があれば「次のページがある」と判断する(件数を数えるCOUNTクエリは不要)
+        items = await self.repo.list_all(after=after, limit=limit + 1, category_ids=category_ids, match=match)
+        if len(items) > limit:
+            items = items[:limit]
+            # 次ページはこのページの最後のIDより後ろから始まる
+            return items, items[-1].id
+        return items, None
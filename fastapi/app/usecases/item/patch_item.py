@@ -0,0 +1,22 @@
+# ③ユースケース
+# app/usecases/item/patch_item.py
+from app.domain.items import Item, ItemName
+from app.repository.item_repository import ItemRepository
+
+class PatchItemUseCase:
+    def __init__(self, repo: ItemRepository):
+        self.repo = repo
+
+    async def execute(self, item_id: int, name: str | None, category_ids: list[int] | None,
+                      expected_version: int | None = None) -> tuple[Item, list[int]] | None:
+        # Noneの項目は変えない(カテゴリをすべて外すときは空リスト)
+        # 戻り値は(更新後のItem, 存在しないため紐づけなかったカテゴリID)。Itemが存在しなければNone
+        # 名前が空・長すぎるときはValueErrorを送出する(Itemが存在しないときと区別するため、tryの外で検証する)
+        new_name = ItemName(name).value if name is not None else None
+        try:
+            return await self.repo.patch(item_id,
+                                         name=new_name,
+                                         category_ids=category_ids,
+                                         expected_version=expected_version)
+        except ValueError:
+            return None
@@ -0,0 +1,12 @@
+# ③ユースケース
+# app/usecases/item/search_items.py
+from app.domain.items import Item, ItemName
+from app.repository.item_repository import ItemRepository, NameSearchMode
+
+class SearchItemsUseCase:
+    def __init__(self, repo: ItemRepository):
+        self.repo = repo
+
+    async def execute(self, query: str, mode: NameSearchMode, limit: int) -> list[Item]:
+        # 検索語は保存した名前と同じ形に正規化してから検索する(空ならValueError)
+        return await self.repo.search_by_name(ItemName.search_key(query), mode, limit)
@@ -1,6 +1,6 @@
 # ③ユースケース
 # app/usecases/item/update_item.py
-from app.domain.items import Item
+from app.domain.items import Item, ItemName
 from app.repository.item_repository import ItemRepository
 
 class UpdateItemUseCase:
@@ -8,15 +8,16 @@ class UpdateItemUseCase:
         # 引数のrepoの型は②抽象リポジトリクラス(=④リポジトリ実装のインターフェース)である。
         self.repo = repo
 
-    async def execute(self, item_id: int, name: str, category_ids: list[int] | None) -> Item | None:
-        # 更新対象のItemを取得(repoは②=④を継承しているのでいきなりget_by_idができる)
-        item = await self.repo.get_by_id(item_id)
-        if item is None:
+    async def execute(self, item_id: int, name: str, category_ids: list[int] | None,
+                      expected_version: int | None = None) -> tuple[Item, list[int]] | None:
+        # expected_versionを指定した場合、そのバージョンのときだけ更新する(違えばリポジトリがVersionConflictErrorを送出する)
+        # 名前もカテゴリも全部置き換えるので、更新前のItemは読み込まない(存在しなければリポジトリがValueErrorを送出する)
+        # 名前が空・長すぎるときのValueErrorは、存在しない場合と区別できるよう、tryの外でそのまま送出する
+        item = Item(item_id=item_id, name=ItemName(name).value, category_ids=category_ids)
+        try:
+            # 実際に更新するのは以下(④で内容は実装している(もっとも④では②を継承しているからupdateメソッドを作成せざるをえないのだが))
+            rejected_category_ids = await self.repo.update(item, expected_version=expected_version)
+        except ValueError:
             return None
-
-        # 値を更新（エンティティ自体を更新）
-        item.name = name
-        item.category_ids = category_ids
-                # 実際に更新するのは以下(④で内容は実装している(もっとも④では②を継承しているからupdateメソッドを作成せざるをえないのだが))
-        await self.repo.update(item)
-        return item
+        # 更新したItemと、存在しないため紐づけなかったカテゴリID
+        return item, rejected_category_ids
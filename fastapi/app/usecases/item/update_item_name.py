@@ -1,17 +1,18 @@
 # ③ユースケース
 # app/usecases/item/update_item_name.py
 from app.repository.item_repository import ItemRepository
-from app.domain.items import Item
+from app.domain.items import Item, ItemName
 
 class UpdateItemNameUseCase:
     def __init__(self, repo: ItemRepository):
         self.repo = repo
 
-    async def execute(self, item_id: int, new_name: str) -> Item:
-        item = await self.repo.get_by_id(item_id)
-        if item is None:
-            raise ValueError("Item not found")
-
-        item.name = new_name
-        await self.repo.update(item)
+    async def execute(self, item_id: int, new_name: str, expected_version: int | None = None) -> Item | None:
+        # 名前だけを変える(カテゴリは変えない)ので、読み込まずに一部更新する
+        # Itemが存在しなければNone。名前が空・長すぎるときはValueErrorを送出する(PatchItemUseCaseと同じ)
+        name = ItemName(new_name).value
+        try:
+            item, _ = await self.repo.patch(item_id, name=name, expected_version=expected_version)
+        except ValueError:
+            return None
         return item
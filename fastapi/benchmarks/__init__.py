@@ -0,0 +1 @@
+# fastapi/benchmarks/__init__.py
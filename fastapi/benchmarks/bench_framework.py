@@ -0,0 +1,156 @@
+# fastapi/benchmarks/bench_framework.py
+# エンドポイントごとに、フレームワーク側(ルーティング・DIチェーン・DTOの検証・JSON化・ミドルウェア)にかかる時間を、1リクエストあたりのマイクロ秒で測る
+# リポジトリはapp.dependency_overridesでメモリ内版(app/infrastructure/memory)に差し替えるので、DBは使わない(DBの速さに左右されない)
+#   http  : httpxのASGITransportで同じプロセスのapp.main:appを呼ぶ(ネットワークは通らない。httpxのクライアント側の処理も含む)
+#   direct: 同じリポジトリで③のユースケースを直接呼ぶ(アプリの本来の処理だけ)
+#   overhead_us = http - direct(フレームワーク側の時間)
+# 比較の基準として、何もしないGET /(root)の時間も出す(これより下はhttpx・Starletteの最低限の処理)
+# 1リクエストずつ順に呼ぶ(同時実行はしない)ので、リリースごとの変化を追いやすい。CPU時間(process_time)も出す
+#
+# 実行例(fastapiディレクトリで。DATABASE_URLは接続しないので何でもよい):
+#   DATABASE_URL=postgresql+asyncpg://u:p@localhost/db python -m benchmarks.bench_framework --items 10000 --requests 2000
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections.abc import Awaitable, Callable
+from functools import partial
+
+import httpx
+
+from app.infrastructure.cache import CachedCategoryRepository, CachedItemRepository
+from app.infrastructure.memory import InMemoryCategoryRepository, InMemoryItemRepository, InMemoryStore
+from app.main import app, load_categories_memory
+from app.routers import categories, items
+from app.usecases.category.get_category import GetCategoryUseCase
+from app.usecases.category.list_categories import ListCategoriesUseCase
+from app.usecases.category.list_category_items import ListCategoryItemsUseCase
+from app.usecases.item.create_item import CreateItemUseCase
+from app.usecases.item.get_item import GetItemUseCase
+from app.usecases.item.list_items import ListItemsUseCase
+from app.usecases.item.patch_item import PatchItemUseCase
+from app.usecases.item.search_items import SearchItemsUseCase
+
+PAGE_SIZE = 100
+
+
+def use_memory_repositories() -> InMemoryStore:
+    # REPOSITORY_BACKENDの設定によらず、4つのリポジトリをメモリ内版に差し替える
+    app.dependency_overrides[items.get_item_repo] = items.get_memory_item_repo
+    app.dependency_overrides[items.get_item_read_repo] = items.get_memory_item_repo
+    app.dependency_overrides[categories.get_category_repo] = categories.get_memory_category_repo
+    app.dependency_overrides[categories.get_category_read_repo] = categories.get_memory_category_repo
+    # カテゴリカタログもメモリ内の置き場から読み込む
+    store = app.state.memory_store
+    app.state.category_catalog.loader = partial(load_categories_memory, store)
+    return store
+
+
+def seed(store: InMemoryStore, category_count: int, item_count: int) -> None:
+    rng = random.Random(0)
+    for category_id in range(1, category_count + 1):
+        store.insert_category(category_id, f"category-{category_id}")
+    for item_id in range(1, item_count + 1):
+        store.insert_item(item_id, f"item-{item_id}", rng.sample(range(1, category_count + 1), min(2, category_count)))
+
+
+# エンドポイント → (HTTPで呼ぶ, ユースケースを直接呼ぶ)。どちらもi回目の呼び出しで同じ引数を使う
+Call = Callable[[int], Awaitable[object]]
+
+
+def endpoints(client: httpx.AsyncClient, store: InMemoryStore, item_count: int, category_count: int) -> dict[str, tuple[Call, Call]]:
+    caches = app.state.caches
+    item_repo = CachedItemRepository(InMemoryItemRepository(store), caches)
+    category_repo = CachedCategoryRepository(InMemoryCategoryRepository(store), caches)
+
+    def item_id(i: int) -> int:
+        return i % item_count + 1
+
+    def category_id(i: int) -> int:
+        return i % category_count + 1
+
+    return {
+        "GET /": (lambda i: client.get("/"), lambda i: asyncio.sleep(0)),
+        "GET /items/{item_id}": (
+            lambda i: client.get(f"/items/{item_id(i)}"),
+            lambda i: GetItemUseCase(item_repo).execute(item_id(i)),
+        ),
+        "GET /items/": (
+            lambda i: client.get("/items/", params={"limit": PAGE_SIZE}),
+            lambda i: ListItemsUseCase(item_repo).execute(None, PAGE_SIZE),
+        ),
+        "GET /items/?category_ids": (
+            lambda i: client.get("/items/", params={"limit": PAGE_SIZE, "category_ids": str(category_id(i))}),
+            lambda i: ListItemsUseCase(item_repo).execute(None, PAGE_SIZE, category_ids=[category_id(i)]),
+        ),
+        "GET /items/search": (
+            lambda i: client.get("/items/search", params={"q": f"item-{item_id(i)}", "mode": "prefix"}),
+            lambda i: SearchItemsUseCase(item_repo).execute(f"item-{item_id(i)}", "prefix", 20),
+        ),
+        "GET /categories/": (
+            lambda i: client.get("/categories/"),
+            lambda i: ListCategoriesUseCase(category_repo).execute(None, PAGE_SIZE),
+        ),
+        "GET /categories/{category_id}": (
+            lambda i: client.get(f"/categories/{category_id(i)}"),
+            lambda i: GetCategoryUseCase(category_repo).execute(category_id(i)),
+        ),
+        "GET /categories/{category_id}/items": (
+            lambda i: client.get(f"/categories/{category_id(i)}/items", params={"limit": PAGE_SIZE}),
+            lambda i: ListCategoryItemsUseCase(category_repo, item_repo).execute(category_id(i), None, PAGE_SIZE),
+        ),
+        "POST /items/": (
+            lambda i: client.post("/items/", json={"item_name": f"new-{i}", "category_ids": [category_id(i)]}),
+            lambda i: CreateItemUseCase(item_repo).execute(f"new-{i}", [category_id(i)]),
+        ),
+        "PATCH /items/{item_id}": (
+            lambda i: client.patch(f"/items/{item_id(i)}", json={"item_name": f"item-{item_id(i)}"}),
+            lambda i: PatchItemUseCase(item_repo).execute(item_id(i), f"item-{item_id(i)}", None),
+        ),
+    }
+
+
+async def measure(call: Call, requests: int) -> tuple[float, float]:
+    # 1回あたりの(経過時間, CPU時間)をマイクロ秒で
+    for i in range(min(requests, 100)):   # 温める(キャッシュ・スキーマの準備など)
+        await call(i)
+    wall, cpu = time.perf_counter(), time.process_time()
+    for i in range(requests):
+        await call(i)
+    return (time.perf_counter() - wall) * 1e6 / requests, (time.process_time() - cpu) * 1e6 / requests
+
+
+async def main(item_count: int, category_count: int, requests: int) -> dict:
+    store = use_memory_repositories()
+    seed(store, category_count, item_count)
+    await app.state.category_catalog.reload()
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for name, (http, direct) in endpoints(client, store, item_count, category_count).items():
+            response = await http(0)
+            if response.status_code >= 400:
+                raise SystemExit(f"{name}: {response.status_code} {response.text}")
+            http_us, http_cpu_us = await measure(http, requests)
+            direct_us, _ = await measure(direct, requests)
+            results[name] = {
+                "http_us": round(http_us, 1),
+                "http_cpu_us": round(http_cpu_us, 1),
+                "direct_us": round(direct_us, 1),
+                "overhead_us": round(http_us - direct_us, 1),
+            }
+    return {"items": item_count, "categories": category_count, "requests": requests, "endpoints": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="エンドポイントごとに呼ぶ回数")
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル(指定しなくても標準出力には出す)")
+    args = parser.parse_args()
+    report = asyncio.run(main(args.items, args.categories, args.requests))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,69 @@
+# fastapi/benchmarks/bench_serialization.py
+# GET /items/ などの一覧のレスポンスを作る時間を、10000件あたりのミリ秒で比較する(DBは使わない)
+#   dto : ItemReadDTOのlistを作り、FastAPIと同じくresponse_modelで検証・変換してからJSONResponseでJSONにする(FAST_JSON_RESPONSES=false)
+#   fast: ①のItemのlistから、ItemListJSONResponseで直接JSONにする(FAST_JSON_RESPONSES=true)
+# 両方のバイト列が同じであることも確認する
+#
+# 実行例(fastapiディレクトリで):
+#   python -m benchmarks.bench_serialization --items 10000 --repeat 20
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.domain.items import Item
+from app.dto.item_dto import ItemReadDTO
+from app.routers.json_response import ItemListJSONResponse
+
+# FastAPIがresponse_model=list[ItemReadDTO]のルートに作るのと同じフィールド
+RESPONSE_FIELD = create_model_field("Response_list_items", list[ItemReadDTO], mode="serialization")
+
+
+def make_items(count: int) -> list[Item]:
+    rng = random.Random(0)
+    return [Item(i, f"item-{i}", sorted(rng.sample(range(1, 100), rng.randint(0, 3))), version=1) for i in range(1, count + 1)]
+
+
+async def dto_path(items: list[Item]) -> bytes:
+    dtos = [ItemReadDTO(item_id=item.id, item_name=item.name, category_ids=item.category_ids) for item in items]
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=dtos)
+    return JSONResponse(content).body
+
+
+async def fast_path(items: list[Item]) -> bytes:
+    return ItemListJSONResponse(items).body
+
+
+async def measure(path, items: list[Item], repeat: int) -> float:
+    await path(items)   # 1回目(スキーマの準備など)は計測しない
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await path(items)
+    return (time.perf_counter() - start) / repeat
+
+
+async def main(count: int, repeat: int) -> None:
+    items = make_items(count)
+    if await dto_path(items) != await fast_path(items):
+        raise SystemExit("dto/fastでレスポンスのバイト列が違う")
+    results = {name: await measure(path, items, repeat) for name, path in (("dto", dto_path), ("fast", fast_path))}
+    per_10k = {name: round(seconds * 1000 * 10000 / count, 2) for name, seconds in results.items()}
+    print(json.dumps({
+        "items": count,
+        "repeat": repeat,
+        "ms_per_10k_items": per_10k,
+        "speedup": round(results["dto"] / results["fast"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.repeat))
@@ -0,0 +1,33 @@
+# fastapi/tests/conftest.py
+import pytest
+from sqlalchemy import event
+
+from app.db.database import engine, replica_engine
+
+
+@pytest.fixture(autouse=True)
+def reset_connection_pool():
+    # TestClientやasyncio.run()はテストごとに別のイベントループで動くが、
+    # asyncpgの接続は作成したイベントループでしか使えないため、テストが終わるたびにプールを作り直す
+    yield
+    engine.sync_engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.sync_engine.dispose(close=False)
+
+
+@pytest.fixture
+def executed_statements():
+    # テスト中にエンジン(レプリカを含む)で実行したSQLを、実行した順に入れるlist
+    # リクエストの前にclear()しておけば、そのリクエストで実行したSQLだけが残る(まとめ読み込み・pg_notifyの分も含む)
+    # REPOSITORY_BACKEND=asyncpgのときのリポジトリのSQLはエンジンを通らないので入らない
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(statement)
+
+    engines = [e.sync_engine for e in (engine, replica_engine) if e is not None]
+    for e in engines:
+        event.listen(e, "before_cursor_execute", record)
+    yield statements
+    for e in engines:
+        event.remove(e, "before_cursor_execute", record)
@@ -0,0 +1,142 @@
+# fastapi/tests/test_admission_control.py
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers.admission_control import AdmissionControl, AdmissionControlMiddleware, AdmissionLimiter
+from app.settings import ADMISSION_CONNECTION_BUDGET, DB_MAX_OVERFLOW, DB_POOL_SIZE
+
+
+def test_limiter_queues_then_rejects():
+    limiter = AdmissionLimiter(limit=1, queue_size=1, queue_timeout=0.05)
+
+    async def scenario():
+        assert await limiter.acquire()
+        # 1つ目を処理中なので、2つ目は待ち行列に入る
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        # 待ち行列がいっぱいなので、3つ目はすぐに断る
+        assert not await limiter.acquire()
+        # 2つ目はqueue_timeout秒で断る
+        assert not await waiting
+        # 待っている間に1つ目が終われば、順番が回ってくる
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release()
+        assert await waiting
+        limiter.release()
+
+    asyncio.run(scenario())
+    assert (limiter.in_flight, limiter.queued) == (0, 0)
+    assert (limiter.admitted, limiter.rejected_queue_full, limiter.rejected_timeout) == (2, 1, 1)
+
+
+# 接続プールが4つで、1リクエストがSQLに20ミリ秒かかるアプリ
+POOL_SIZE = 4
+SERVICE_SECONDS = 0.02
+REQUESTS = 200
+
+
+def make_app(admission: AdmissionControl | None) -> FastAPI:
+    test_app = FastAPI()
+    pool = asyncio.Semaphore(POOL_SIZE)
+    # 接続を使っている・待っているリクエストの数と、その最大(POOL_SIZEを超えたら、誰かがプールの空きを待った)
+    test_app.state.using_pool = 0
+    test_app.state.peak_using_pool = 0
+
+    # 読み取りも書き込みも同じプールを使う
+    @test_app.api_route("/work", methods=["GET", "POST"])
+    async def work():
+        test_app.state.using_pool += 1
+        test_app.state.peak_using_pool = max(test_app.state.peak_using_pool, test_app.state.using_pool)
+        try:
+            async with pool:
+                await asyncio.sleep(SERVICE_SECONDS)
+        finally:
+            test_app.state.using_pool -= 1
+        return {}
+
+    if admission is not None:
+        test_app.add_middleware(AdmissionControlMiddleware, admission=admission)
+    return test_app
+
+
+def overload(test_app: FastAPI, methods: tuple[str, ...] = ("GET",)) -> tuple[list[httpx.Response], float]:
+    # REQUESTS件を一度に送り(メソッドはmethodsを順に使う)、(レスポンス, レイテンシのp99)を返す
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=test_app), base_url="http://test") as client:
+            async def timed(method: str):
+                started = time.perf_counter()
+                res = await client.request(method, "/work")
+                return res, time.perf_counter() - started
+            return await asyncio.gather(*(timed(methods[i % len(methods)]) for i in range(REQUESTS)))
+
+    results = asyncio.run(scenario())
+    latencies = sorted(seconds for _, seconds in results)
+    return [res for res, _ in results], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def test_overload_keeps_p99_bounded():
+    queue_timeout = 0.1
+    admission = AdmissionControl(read=AdmissionLimiter(POOL_SIZE, POOL_SIZE * 2, queue_timeout),
+                                 write=AdmissionLimiter(POOL_SIZE, POOL_SIZE * 2, queue_timeout), retry_after_seconds=1)
+    responses, p99 = overload(make_app(admission))
+    ok = [res for res in responses if res.status_code == 200]
+    rejected = [res for res in responses if res.status_code == 503]
+    assert len(ok) + len(rejected) == REQUESTS
+    assert len(ok) >= POOL_SIZE
+    assert all(res.headers["Retry-After"] == "1" for res in rejected)
+    read = admission.limiters["read"]
+    assert read.rejected_queue_full + read.rejected_timeout == len(rejected)
+    assert (read.in_flight, read.queued) == (0, 0)
+
+    # 制限がなければ全員がプールを待つので、最後のリクエストは REQUESTS / POOL_SIZE * SERVICE_SECONDS(1秒)かかる
+    # 制限があれば、処理されるリクエストも待ち行列の時間 + 処理時間までで返る
+    _, unlimited_p99 = overload(make_app(None))
+    assert unlimited_p99 > REQUESTS / POOL_SIZE * SERVICE_SECONDS * 0.8
+    assert p99 < queue_timeout + SERVICE_SECONDS * 5
+    assert p99 < unlimited_p99 / 2
+
+
+def test_mixed_overload_stays_within_the_pool():
+    # 書き込みの分を読み取りから切り出せば、読み書きが同時に混んでもプールの空きを待つリクエストは出ない
+    write_limit = 1
+    admission = AdmissionControl(read=AdmissionLimiter(POOL_SIZE - write_limit, POOL_SIZE * 2, 0.1),
+                                 write=AdmissionLimiter(write_limit, POOL_SIZE * 2, 0.1), retry_after_seconds=1,
+                                 connection_budget=POOL_SIZE)
+    test_app = make_app(admission)
+    responses, _ = overload(test_app, methods=("GET", "POST"))
+    assert test_app.state.peak_using_pool <= POOL_SIZE
+    assert all(res.status_code in (200, 503) for res in responses)
+    for method, route_class in (("GET", "read"), ("POST", "write")):
+        ok = [res for res in responses if res.request.method == method and res.status_code == 200]
+        assert len(ok) >= admission.limiters[route_class].limit
+        assert (admission.limiters[route_class].in_flight, admission.limiters[route_class].queued) == (0, 0)
+
+    # それぞれがプール全体を上限にすると、合わせてプールを超え、処理中のリクエストがプールの空きを待つ
+    overcommitted = make_app(AdmissionControl(read=AdmissionLimiter(POOL_SIZE, POOL_SIZE * 2, 0.1),
+                                              write=AdmissionLimiter(POOL_SIZE, POOL_SIZE * 2, 0.1), retry_after_seconds=1))
+    overload(overcommitted, methods=("GET", "POST"))
+    assert overcommitted.state.peak_using_pool > POOL_SIZE
+
+
+def test_limits_must_fit_the_connection_budget():
+    with pytest.raises(ValueError):
+        AdmissionControl(read=AdmissionLimiter(POOL_SIZE, 1, 0.1), write=AdmissionLimiter(1, 1, 0.1),
+                         retry_after_seconds=1, connection_budget=POOL_SIZE)
+    limiters = app.state.admission_control.limiters
+    assert limiters["read"].limit + limiters["write"].limit <= ADMISSION_CONNECTION_BUDGET <= DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+
+def test_metrics_include_admission():
+    with TestClient(app) as client:
+        body = client.get("/metrics").text
+    assert 'http_admission_queue_depth{class="read"} 0' in body
+    assert 'http_admission_rejected_total{class="write",reason="queue_full"} 0' in body
+    assert 'http_admission_queue_wait_seconds_count{class="read"}' in body
@@ -0,0 +1,113 @@
+# fastapi/tests/test_batch_loader.py
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.domain.items import Item
+from app.infrastructure.batching import BatchedItemRepository, BatchLoader
+from app.main import app
+
+
+class FakeItemsTable:
+    def __init__(self, item_ids):
+        self.items = {item_id: Item(item_id, f"item{item_id}", []) for item_id in item_ids}
+        self.calls = []
+
+    async def load(self, item_ids):
+        self.calls.append(sorted(item_ids))
+        return {item_id: self.items[item_id] for item_id in item_ids if item_id in self.items}
+
+
+def test_concurrent_loads_are_coalesced_into_one_batch():
+    table = FakeItemsTable([1, 2, 3])
+    loader = BatchLoader(table.load)
+
+    async def scenario():
+        return await asyncio.gather(*(loader.load(item_id) for item_id in [1, 2, 2, 3, 99]))
+
+    results = asyncio.run(scenario())
+    assert [item.id if item else None for item in results] == [1, 2, 2, 3, None]
+    # 同じIDは1つにまとめ、1回だけ問い合わせる
+    assert table.calls == [[1, 2, 3, 99]]
+
+
+def test_max_batch_size_and_window():
+    table = FakeItemsTable(range(10))
+    loader = BatchLoader(table.load, window_seconds=0.01, max_batch_size=4)
+
+    async def scenario():
+        await asyncio.gather(*(loader.load(item_id) for item_id in range(10)))
+
+    asyncio.run(scenario())
+    assert table.calls == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_batch_error_is_raised_to_every_waiter():
+    async def failing(item_ids):
+        raise RuntimeError("db down")
+
+    loader = BatchLoader(failing)
+
+    async def scenario():
+        return await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cancelled_batch_cancels_every_waiter():
+    async def hanging(item_ids):
+        await asyncio.Event().wait()
+
+    loader = BatchLoader(hanging)
+
+    async def scenario():
+        waiters = asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+        await asyncio.sleep(0.01)
+        # アプリの終了時などにまとめ読み込みのタスクがキャンセルされても、待っているリクエストは止まったままにならない
+        for task in list(loader._tasks):
+            task.cancel()
+        return await asyncio.wait_for(waiters, 1)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+
+
+def test_batched_repository_get_many_keeps_order():
+    table = FakeItemsTable([1, 2, 3])
+    repo = BatchedItemRepository(inner=None, loader=BatchLoader(table.load))
+
+    items = asyncio.run(repo.get_many([3, 99, 1, 3]))
+    assert [item.id for item in items] == [3, 1]
+
+
+def test_batched_repository_reads_on_request_connection_when_it_holds_one():
+    # リクエストがすでに接続を持っていれば、ローダー(別の接続)を使わずにその接続で読む
+    table = FakeItemsTable([1, 2])
+
+    class InnerRepository:
+        async def get_by_id(self, item_id):
+            return table.items.get(item_id)
+
+        async def get_many(self, item_ids):
+            return [table.items[i] for i in item_ids if i in table.items]
+
+    holds = [True]
+    repo = BatchedItemRepository(InnerRepository(), BatchLoader(table.load), holds_connection=lambda: holds[0])  # type: ignore[arg-type]
+
+    async def scenario():
+        assert (await repo.get_by_id(1)).id == 1  # type: ignore[union-attr]
+        assert [item.id for item in await repo.get_many([2, 1])] == [2, 1]
+        assert table.calls == []
+        holds[0] = False
+        await repo.get_by_id(2)
+        assert table.calls == [[2]]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("ids", ["1,a", ",".join(["1"] * 501)])
+def test_get_items_by_ids_rejects_bad_ids(ids):
+    res = TestClient(app).get("/items/", params={"ids": ids})
+    assert res.status_code == 400
@@ -0,0 +1,25 @@
+# fastapi/tests/test_bulk_create_items.py
+import asyncio
+
+from app.usecases.item.bulk_create_items import BulkCreateItemsUseCase
+
+
+class FakeItemRepository:
+    def __init__(self):
+        self.saved = []
+
+    async def next_identifiers(self, count):
+        return list(range(10, 10 + count))
+
+    async def save_many(self, items):
+        self.saved.extend(items)
+
+
+def test_bulk_create_reports_invalid_rows():
+    repo = FakeItemRepository()
+    uc = BulkCreateItemsUseCase(repo)  # type: ignore[arg-type]
+    items, errors = asyncio.run(uc.execute([("  a  ", [1]), ("", []), ("b", [0]), ("c", [2, 3])]))
+
+    assert [(i.id, i.name, i.category_ids) for i in items] == [(10, "a", [1]), (11, "c", [2, 3])]
+    assert repo.saved == items
+    assert [index for index, _ in errors] == [1, 2]
@@ -0,0 +1,39 @@
+# fastapi/tests/test_category_catalog.py
+import json
+
+from fastapi.testclient import TestClient
+
+from app.domain.category import Category
+from app.infrastructure.cache import CategorySnapshot
+from app.main import create_app
+
+
+def test_snapshot_pages_are_preserialized_json():
+    snapshot = CategorySnapshot(1, [Category(3, "c"), Category(1, "a"), Category(2, "b")])
+
+    body, next_after = snapshot.page(None, 2)
+    assert json.loads(body) == [{"category_name": "a", "category_id": 1}, {"category_name": "b", "category_id": 2}]
+    assert next_after == 2
+
+    body, next_after = snapshot.page(2, 2)
+    assert json.loads(body) == [{"category_name": "c", "category_id": 3}]
+    assert next_after is None
+
+
+def test_snapshot_with_category_bumps_version():
+    snapshot = CategorySnapshot(1, [Category(1, "a")])
+    updated = snapshot.with_category(Category(1, "renamed"))
+    assert updated.version == 2
+    assert [c.name for c in updated.categories] == ["renamed"]
+    assert [c.name for c in snapshot.categories] == ["a"]
+
+
+def test_list_categories_is_served_from_catalog():
+    app = create_app()
+    app.state.category_catalog.snapshot = CategorySnapshot(1, [Category(1, "a"), Category(2, "b")])
+
+    resp = TestClient(app).get("/categories/", params={"limit": 1})
+
+    assert resp.status_code == 200
+    assert resp.json() == [{"category_name": "a", "category_id": 1}]
+    assert "x-next-cursor" in resp.headers
@@ -0,0 +1,37 @@
+# fastapi/tests/test_category_items.py
+import asyncio
+
+from app.domain.category import Category
+from app.domain.items import Item
+from app.usecases.category.list_category_items import ListCategoryItemsUseCase
+
+
+class FakeCategoryRepository:
+    async def get_by_id(self, category_id):
+        return Category(category_id, "fruit") if category_id == 1 else None
+
+
+class FakeItemRepository:
+    def __init__(self, items):
+        self.items = items
+
+    async def list_by_category(self, category_id, after=None, limit=None):
+        matched = [i for i in self.items if category_id in i.category_ids and (after is None or i.id > after)]
+        return matched[:limit]
+
+
+def test_list_category_items_pages_with_cursor():
+    items = [Item(i, f"item{i}", [1] if i % 2 else [2]) for i in range(1, 8)]
+    uc = ListCategoryItemsUseCase(FakeCategoryRepository(), FakeItemRepository(items))
+
+    page, next_after = asyncio.run(uc.execute(1, None, 2))
+    assert [i.id for i in page] == [1, 3]
+    assert next_after == 3
+    page, next_after = asyncio.run(uc.execute(1, next_after, 2))
+    assert [i.id for i in page] == [5, 7]
+    assert next_after is None
+
+
+def test_list_category_items_unknown_category():
+    uc = ListCategoryItemsUseCase(FakeCategoryRepository(), FakeItemRepository([]))
+    assert asyncio.run(uc.execute(99, None, 10)) is None
@@ -0,0 +1,112 @@
+# fastapi/tests/test_etag.py
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.domain.category import Category
+from app.domain.items.item import Item
+from app.main import app
+from app.repository.exceptions import VersionConflictError
+from app.routers.etag import expected_version, if_none_match, make_etag
+from app.routers import categories
+from app.routers.items import get_get_uc, get_update_name_uc
+from app.usecases.category.list_categories import ListCategoriesUseCase
+
+
+def test_if_none_match():
+    etag = make_etag("item", 1, 3)
+    assert if_none_match(etag, etag)
+    assert if_none_match(f'"x", W/{etag}', etag)
+    assert if_none_match("*", etag)
+    assert not if_none_match(make_etag("item", 1, 2), etag)
+    assert not if_none_match(None, etag)
+
+
+def test_expected_version():
+    assert expected_version(None, "item", 1) is None
+    assert expected_version("*", "item", 1) is None
+    assert expected_version(make_etag("item", 1, 7), "item", 1) == 7
+    # 別のリソースのETagや弱いETagは一致しない
+    for header in (make_etag("item", 2, 7), make_etag("category", 1, 7), "W/" + make_etag("item", 1, 7)):
+        with pytest.raises(HTTPException) as e:
+            expected_version(header, "item", 1)
+        assert e.value.status_code == 412
+
+
+class FakeGetItemUseCase:
+    def __init__(self):
+        self.loaded = 0
+
+    async def current_version(self, item_id):
+        return 3
+
+    async def execute(self, item_id):
+        self.loaded += 1
+        return Item(item_id, "apple", [], version=3)
+
+
+class FakeUpdateItemNameUseCase:
+    async def execute(self, item_id, new_name, expected_version=None):
+        if expected_version is not None and expected_version != 3:
+            raise VersionConflictError(3)
+        return Item(item_id, new_name, [], version=4)
+
+
+def test_item_conditional_requests():
+    get_uc = FakeGetItemUseCase()
+    app.dependency_overrides[get_get_uc] = lambda: get_uc
+    app.dependency_overrides[get_update_name_uc] = lambda: FakeUpdateItemNameUseCase()
+    try:
+        with TestClient(app) as client:
+            res = client.get("/items/1")
+            assert res.status_code == 200
+            etag = res.headers["ETag"]
+            assert etag == make_etag("item", 1, 3)
+
+            # 同じETagなら本文を読み込まずに304
+            res = client.get("/items/1", headers={"If-None-Match": etag})
+            assert res.status_code == 304
+            assert get_uc.loaded == 1
+
+            res = client.put("/items/1/name_body", json={"new_name": "banana"}, headers={"If-Match": make_etag("item", 1, 2)})
+            assert res.status_code == 412
+            res = client.put("/items/1/name_body", json={"new_name": "banana"}, headers={"If-Match": etag})
+            assert res.status_code == 200
+            assert res.headers["ETag"] == make_etag("item", 1, 4)
+    finally:
+        app.dependency_overrides.clear()
+
+
+class FakeCategoryListRepository:
+    def __init__(self, categories):
+        self.categories = categories
+
+    async def list_all(self, after=None, limit=None):
+        return [c for c in self.categories if after is None or c.id > after][:limit]
+
+
+def test_category_list_from_db_is_conditional():
+    # カテゴリカタログを読み込めていないとき(DBから返す)も、ETagをつけて304を返す
+    repo = FakeCategoryListRepository([Category(1, "a"), Category(2, "b")])
+    app.dependency_overrides[categories.get_list_uc] = lambda: ListCategoriesUseCase(repo)  # type: ignore[arg-type]
+    try:
+        with TestClient(app) as client:
+            catalog = app.state.caches.category_catalog
+            snapshot, catalog.snapshot = catalog.snapshot, None
+            try:
+                res = client.get("/categories/", params={"limit": 2})
+                assert res.status_code == 200
+                etag = res.headers["ETag"]
+                res = client.get("/categories/", params={"limit": 2}, headers={"If-None-Match": etag})
+                assert res.status_code == 304
+                assert res.headers["ETag"] == etag
+                # このページの本文は同じでも、次のページができたら(X-Next-Cursorが変わったら)ETagも変わる
+                repo.categories.append(Category(3, "c"))
+                res = client.get("/categories/", params={"limit": 2}, headers={"If-None-Match": etag})
+                assert res.status_code == 200
+                assert res.headers["ETag"] != etag
+                assert "X-Next-Cursor" in res.headers
+            finally:
+                catalog.snapshot = snapshot
+    finally:
+        app.dependency_overrides.clear()
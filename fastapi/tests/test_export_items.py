@@ -0,0 +1,236 @@
+# fastapi/tests/test_export_items.py
+import asyncio
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+
+from app.db.read_routing import get_read_session_factory
+from app.domain.items import Item
+from app.infrastructure.asyncpg import AsyncpgItemRepository
+from app.infrastructure.asyncpg.pool import fixed_connection
+from app.infrastructure.memory import InMemoryItemRepository, InMemoryStore
+from app.infrastructure.sqlalchemy.repositories.item_repo_impl import SQLAlchemyItemRepository
+from app.main import app
+from app.routers import items
+from app.routers.items import _encode_csv, _encode_ndjson
+from app.usecases.item.export_items import ExportItemsUseCase
+
+
+class StreamingSession:
+    # session.stream()の代わり。DBから受け取る(item_id, item_name, version, category_id)の行を、partitionsの区切りのまま返す
+    def __init__(self, partitions: list[list[tuple]]):
+        self.partitions_ = partitions
+
+    async def stream(self, stmt):
+        return self
+
+    async def partitions(self):
+        for rows in self.partitions_:
+            yield rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+
+class CursorConnection:
+    # asyncpgの接続の代わり。conn.cursor()で行を1行ずつ返し、借りた・返した回数を数える(プールも兼ねる)
+    def __init__(self, rows: list[tuple]):
+        self.rows = rows
+        self.prefetch: int | None = None
+        self.in_transaction = False
+        self.acquired = 0
+        self.released = 0
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        self.in_transaction = True
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.in_transaction = False
+
+    def cursor(self, query: str, prefetch: int | None = None):
+        # カーソルはトランザクションの中でしか使えない
+        assert self.in_transaction
+        self.prefetch = prefetch
+        return self._rows()
+
+    async def _rows(self):
+        for row in self.rows:
+            yield row
+
+    async def pool(self, replica: bool = False):
+        return self
+
+    async def acquire(self, timeout: float | None = None):
+        self.acquired += 1
+        return self
+
+    async def release(self, conn):
+        self.released += 1
+
+
+# Item 2のカテゴリの行が1つ目と2つ目のpartitionにまたがり、Item 3はカテゴリなし(LEFT JOINでcategory_idがNULL)
+PARTITIONS = [
+    [(1, "apple", 1, 10), (1, "apple", 1, 11), (2, "banana", 3, 10)],
+    [(2, "banana", 3, 12), (3, "cherry", 1, None)],
+    [(4, "durian", 2, 11)],
+]
+
+
+def collect(chunks) -> list[list[Item]]:
+    async def scenario():
+        return [chunk async for chunk in chunks]
+
+    return asyncio.run(scenario())
+
+
+def test_stream_all_groups_category_rows_across_partitions():
+    chunks = collect(SQLAlchemyItemRepository(StreamingSession(PARTITIONS)).stream_all(2))
+    assert [[(item.id, item.category_ids, item.version) for item in chunk] for chunk in chunks] == [
+        [(1, [10, 11], 1), (2, [10, 12], 3)],
+        [(3, [], 1), (4, [11], 2)],
+    ]
+
+
+class ChunkedRepository:
+    # stream_allでchunksをそのまま返すだけのリポジトリ
+    def __init__(self, chunks: list[list[Item]]):
+        self.chunks = chunks
+        self.chunk_sizes: list[int] = []
+
+    async def stream_all(self, chunk_size: int):
+        self.chunk_sizes.append(chunk_size)
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_asyncpg_stream_all_groups_category_rows():
+    conn = CursorConnection([row for rows in PARTITIONS for row in rows])
+    chunks = collect(AsyncpgItemRepository(fixed_connection(conn)).stream_all(2))
+    assert [[(item.id, item.category_ids, item.version) for item in chunk] for chunk in chunks] == [
+        [(1, [10, 11], 1), (2, [10, 12], 3)],
+        [(3, [], 1), (4, [11], 2)],
+    ]
+    assert conn.prefetch == 2
+    assert not conn.in_transaction
+
+
+def test_export_usecase_returns_every_chunk():
+    chunks = [[Item(1, "apple", [1]), Item(2, "banana", [])], [Item(3, "cherry", [3])]]
+    repo = ChunkedRepository(chunks)
+    assert collect(ExportItemsUseCase(repo).execute(2)) == chunks
+    assert repo.chunk_sizes == [2]
+
+
+def test_memory_stream_all_returns_every_item_in_chunks():
+    store = InMemoryStore()
+    for item_id in range(1, 6):
+        store.insert_item(item_id, f"item-{item_id}", [item_id] if item_id % 2 else [])
+    chunks = collect(InMemoryItemRepository(store).stream_all(2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [(item.id, item.category_ids) for chunk in chunks for item in chunk] == [
+        (1, [1]), (2, []), (3, [3]), (4, []), (5, [5])]
+
+
+def test_encode_ndjson():
+    body = _encode_ndjson([Item(1, "りんご", [2, 3]), Item(2, "pear", [])]).decode()
+    assert body.endswith("\n")
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {"item_id": 1, "item_name": "りんご", "category_ids": [2, 3]},
+        {"item_id": 2, "item_name": "pear", "category_ids": []},
+    ]
+    # ensure_ascii=Falseなので、日本語はエスケープせずにUTF-8で書く
+    assert "りんご" in body
+
+
+def test_encode_csv_quotes_names():
+    names = ['comma, name', 'say "hi"', "two\nlines", "plain"]
+    body = _encode_csv([Item(i, name, [i, 10] if i % 2 else []) for i, name in enumerate(names, start=1)]).decode()
+    assert body.count("\r\n") == len(names)   # 行の区切りは\r\n。改行を含む名前は""で囲み、その中の\nはそのまま
+    assert '"comma, name"' in body and '"say ""hi"""' in body
+    assert list(csv.reader(io.StringIO(body))) == [
+        ["1", "comma, name", "1;10"],
+        ["2", 'say "hi"', ""],
+        ["3", "two\nlines", "3;10"],
+        ["4", "plain", ""],
+    ]
+
+
+EXPORTED_CSV = [
+    ["item_id", "item_name", "category_ids"],
+    ["1", "apple", "10;11"],
+    ["2", "banana", "10;12"],
+    ["3", "cherry", ""],
+    ["4", "durian", "11"],
+]
+
+
+def test_export_route_streams_csv_with_header():
+    # REPOSITORY_BACKENDによらず、SQLAlchemy版のリポジトリで書き出す
+    app.dependency_overrides[items.get_export_repo_factory] = items.get_sqlalchemy_export_repo_factory
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: StreamingSession(PARTITIONS)
+    try:
+        with TestClient(app) as client:
+            res = client.get("/items/export", params={"format": "csv"})
+    finally:
+        app.dependency_overrides.pop(items.get_export_repo_factory)
+        app.dependency_overrides.pop(get_read_session_factory)
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "text/csv; charset=utf-8"
+    assert res.headers["content-disposition"] == 'attachment; filename="items.csv"'
+    assert list(csv.reader(io.StringIO(res.text))) == EXPORTED_CSV
+
+
+def test_export_route_streams_through_asyncpg():
+    # REPOSITORY_BACKEND=asyncpgのときと同じく、asyncpgのプールから借りた接続で書き出し、終わったら返す
+    conn = CursorConnection([row for rows in PARTITIONS for row in rows])
+    app.dependency_overrides[items.get_export_repo_factory] = items.get_asyncpg_export_repo_factory
+    try:
+        with TestClient(app) as client:
+            pools, app.state.pg_pools = app.state.pg_pools, conn
+            try:
+                res = client.get("/items/export", params={"format": "csv"})
+            finally:
+                app.state.pg_pools = pools
+    finally:
+        app.dependency_overrides.pop(items.get_export_repo_factory)
+    assert res.status_code == 200
+    assert list(csv.reader(io.StringIO(res.text))) == EXPORTED_CSV
+    assert (conn.acquired, conn.released) == (1, 1)
+
+
+def test_export_route_streams_from_memory_store():
+    # REPOSITORY_BACKEND=memoryのときと同じく、DBには接続せずにInMemoryStoreの内容を書き出す
+    app.dependency_overrides[items.get_export_repo_factory] = items.get_memory_export_repo_factory
+    try:
+        with TestClient(app) as client:
+            store, app.state.memory_store = app.state.memory_store, InMemoryStore()
+            try:
+                app.state.memory_store.insert_item(1, "apple", [10, 11])
+                app.state.memory_store.insert_item(2, "banana", [])
+                res = client.get("/items/export")
+            finally:
+                app.state.memory_store = store
+    finally:
+        app.dependency_overrides.pop(items.get_export_repo_factory)
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in res.text.splitlines()] == [
+        {"item_id": 1, "item_name": "apple", "category_ids": [10, 11]},
+        {"item_id": 2, "item_name": "banana", "category_ids": []},
+    ]
+
+
+def test_export_route_rejects_unknown_format():
+    with TestClient(app) as client:
+        res = client.get("/items/export", params={"format": "xml"})
+    assert res.status_code == 422
+    assert res.json()["detail"][0]["loc"] == ["query", "format"]
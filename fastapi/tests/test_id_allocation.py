@@ -0,0 +1,58 @@
+# fastapi/tests/test_id_allocation.py
+import asyncio
+
+import httpx
+
+from app.infrastructure.sqlalchemy.id_allocator import SequenceIdAllocator
+from app.main import app
+
+
+class FakeSequenceIdAllocator(SequenceIdAllocator):
+    def __init__(self, block_size):
+        super().__init__("fake_seq", block_size)
+        self.last = 0
+        self.reserve_calls = 0
+
+    async def _reserve(self, db, size):
+        self.reserve_calls += 1
+        await asyncio.sleep(0)  # 予約中に他のリクエストが割り込めるようにする
+        ids = list(range(self.last + 1, self.last + size + 1))
+        self.last += size
+        return ids
+
+
+def test_block_allocation_reserves_once_per_block():
+    allocator = FakeSequenceIdAllocator(block_size=10)
+
+    async def scenario():
+        return [(await allocator.next_ids(None, 1))[0] for _ in range(25)]  # type: ignore[arg-type]
+
+    assert asyncio.run(scenario()) == list(range(1, 26))
+    assert allocator.reserve_calls == 3
+
+
+def test_concurrent_allocation_has_no_duplicates():
+    allocator = FakeSequenceIdAllocator(block_size=7)
+
+    async def scenario():
+        return await asyncio.gather(*(allocator.next_ids(None, 3) for _ in range(200)))  # type: ignore[arg-type]
+
+    ids = [i for chunk in asyncio.run(scenario()) for i in chunk]
+    assert len(ids) == len(set(ids)) == 600
+
+
+def test_parallel_create_items_have_unique_ids():
+    # POST /items/ を同時に300件投げても、IDが重複せず全件作成できること
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(
+                *(client.post("/items/", json={"item_name": f"concurrent-{i}", "category_ids": []}) for i in range(300))
+            )
+            ids = [r.json()["item_id"] for r in responses if r.status_code == 200]
+            await asyncio.gather(*(client.delete(f"/items/{item_id}") for item_id in ids))
+        return responses, ids
+
+    responses, ids = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * 300
+    assert len(set(ids)) == 300
@@ -0,0 +1,49 @@
+# fastapi/tests/test_invalidation_bus.py
+import asyncio
+import json
+
+import httpx
+
+from app.domain.items import Item
+from app.infrastructure.cache import InvalidationListener, RepositoryCaches
+from app.infrastructure.cache.cached_item_repo import _to_cached
+from app.main import create_app
+
+
+def test_listener_invalidates_items_of_changed_category():
+    caches = RepositoryCaches(max_entries=10, ttl_seconds=60)
+    caches.items.set(1, _to_cached(Item(1, "a", [10])))
+    caches.items.set(2, _to_cached(Item(2, "b", [20])))
+    listener = InvalidationListener(caches, engine=None)  # type: ignore[arg-type]
+
+    listener._on_notify(None, 0, "", json.dumps({"kind": "category", "ids": [10]}))
+
+    assert caches.items.get(1) is None
+    assert caches.items.get(2) is not None
+
+
+def test_update_on_one_app_invalidates_cache_of_another_app():
+    # 同じDBにつながる2つのアプリ(=2つのワーカー)で、片方の更新がもう片方のキャッシュに反映されること
+    app_a, app_b = create_app(), create_app()
+
+    async def scenario():
+        async with app_a.router.lifespan_context(app_a), app_b.router.lifespan_context(app_b):
+            await asyncio.wait_for(app_b.state.invalidation_listener.ready.wait(), timeout=5)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_a), base_url="http://a") as a, \
+                       httpx.AsyncClient(transport=httpx.ASGITransport(app=app_b), base_url="http://b") as b:
+                item_id = (await a.post("/items/", json={"item_name": "before", "category_ids": []})).json()["item_id"]
+                try:
+                    assert (await b.get(f"/items/{item_id}")).json()["item_name"] == "before"  # app_bのキャッシュに載る
+                    await a.put(f"/items/{item_id}", json={"item_name": "after", "category_ids": []})
+
+                    # キャッシュのTTL(30秒)を待たずに、通知でapp_bのキャッシュが消える
+                    for _ in range(100):
+                        if (await b.get(f"/items/{item_id}")).json()["item_name"] == "after":
+                            break
+                        await asyncio.sleep(0.02)
+                    else:
+                        raise AssertionError("app_b still serves the stale item")
+                finally:
+                    await a.delete(f"/items/{item_id}")
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+# fastapi/tests/test_item_filters.py
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.future import select
+
+from app.infrastructure.sqlalchemy.models.item_orm import ItemORM
+from app.infrastructure.sqlalchemy.repositories.item_repo_impl import (_category_filter, _items_with_category_ids, _list_statement,
+                                                                        _row_to_item)
+from app.main import app
+
+
+def compile_filter(*args) -> str:
+    stmt = select(ItemORM.item_id).filter(_category_filter(*args))
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_match_all_groups_in_sql():
+    sql = compile_filter({1, 2}, "all", 10)
+    assert "GROUP BY item_category.item_id" in sql
+    assert "HAVING count(*) = 2" in sql
+    # ページングの条件は集計の前にかける
+    assert "item_category.item_id > 10" in sql
+
+
+def test_match_any_uses_exists():
+    sql = compile_filter({1, 2, 3}, "any")
+    assert "EXISTS (SELECT" in sql
+    assert "GROUP BY" not in sql
+
+
+@pytest.mark.parametrize("match", ["any", "all"])
+def test_list_statement_with_category_filter_compiles(match):
+    # list_allで実際に使う文(中間テーブルを結合済みのSELECT)に絞り込みを入れてもコンパイルできる
+    sql = str(_list_statement(10, 100, [1, 2], match).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "items.item_id > 10" in sql
+    if match == "any":
+        assert "EXISTS (SELECT" in sql
+        assert "FROM item_category AS in_category" in sql
+
+
+def test_read_is_single_grouped_select():
+    # カテゴリIDはselectinloadの2回目のSELECTではなく、同じSELECTのarray_aggで読む
+    sql = str(_items_with_category_ids().compile(dialect=postgresql.dialect()))
+    assert sql.count("SELECT") == 1
+    assert "LEFT OUTER JOIN item_category" in sql
+    assert "GROUP BY items.item_id" in sql
+    assert "FILTER (WHERE item_category.category_id IS NOT NULL)" in sql
+
+
+def test_row_without_categories_becomes_empty_list():
+    # LEFT JOINで中間テーブルの行がないItemは、array_aggがNULLになる
+    row = type("Row", (), {"item_id": 1, "item_name": "a", "version": 2, "category_ids": None})()
+    item = _row_to_item(row)
+    assert (item.id, item.category_ids, item.version) == (1, [], 2)
+
+
+@pytest.mark.parametrize("params", [{"category_ids": "1,x"}, {"category_ids": "1", "match": "some"}])
+def test_invalid_category_filters(params):
+    res = TestClient(app).get("/items/", params=params)
+    assert res.status_code in (400, 422)
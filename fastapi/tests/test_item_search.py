@@ -0,0 +1,63 @@
+# fastapi/tests/test_item_search.py
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.db.database import AsyncSessionLocal, engine
+from app.domain.items import ItemName
+from app.infrastructure.sqlalchemy.repositories.item_repo_impl import _escape_like, _search_statement
+
+
+def test_search_key_matches_stored_name():
+    # 保存時の正規化(NFKC+前後の空白除去)に小文字化を加えたもの
+    assert ItemName("  ＡＢＣ ﾘﾝｺﾞ ").value == "ABC リンゴ"
+    assert ItemName.search_key("ＡＢＣ ﾘﾝｺﾞ") == "abc リンゴ"
+    assert ItemName.search_key(ItemName.normalize(" Apple ")) == "apple"
+
+
+def test_item_name_is_validated_after_normalization():
+    # NFKCで1文字が4文字(株式会社)になるので、保存する形で200文字を超える
+    with pytest.raises(ValueError):
+        ItemName("㍿" * 200)
+    assert len(ItemName("㍿" * 50).value) == 200
+    # 全角スペースだけの名前は、正規化すると空になる
+    with pytest.raises(ValueError):
+        ItemName("\u3000 \u3000")
+
+
+def test_escape_like():
+    assert _escape_like("50%_off!") == "50!%!_off!!"
+
+
+def test_prefix_search_limits_in_index_order():
+    # インデックスと同じ並び(COLLATE "C", item_id)でlimit件を選んでから、カテゴリIDを集める
+    sql = str(_search_statement("app", "prefix", 20).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    matched = sql[sql.index("JOIN (SELECT"):sql.index("AS matched")]
+    assert 'ORDER BY lower(items.item_name) COLLATE "C", items.item_id' in matched
+    assert "LIMIT 20" in matched
+    assert "GROUP BY" not in matched
+
+
+def explain(mode: str, key: str) -> str:
+    # リポジトリが実行するのと同じSELECTの実行計画
+    compiled = _search_statement(key, mode, 20).compile(dialect=engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            # テスト用の小さいテーブルでは全件読んだほうが速いと判断されるので、インデックスが使えるかだけを確認する
+            await db.execute(text("SET LOCAL enable_seqscan = off"))
+            conn = await db.connection()
+            rows = await conn.exec_driver_sql("EXPLAIN " + str(compiled), params)
+            return "\n".join(r[0] for r in rows)
+    return asyncio.run(run())
+
+
+def test_prefix_search_uses_index():
+    assert "items_item_name_prefix_idx" in explain("prefix", "app")
+
+
+def test_fuzzy_search_uses_trigram_index():
+    assert "items_item_name_trgm_idx" in explain("fuzzy", "appel")
@@ -0,0 +1,48 @@
+# fastapi/tests/test_json_response.py
+import json
+
+from fastapi.testclient import TestClient
+
+from app.domain.category import Category
+from app.domain.items.item import Item
+from app.dto.category_dto import CategoryReadDTO
+from app.dto.item_dto import ItemReadDTO
+from app.main import app
+from app.routers.items import get_list_uc
+from app.routers.json_response import encode_categories, encode_items
+from app.routers.pagination import NEXT_CURSOR_HEADER, encode_cursor
+
+ITEMS = [Item(1, "りんご", [1, 2]), Item(2, 'quote " \\ \n', []), Item(3, "no categories", None)]
+
+
+def dto_json(dtos) -> bytes:
+    # いつもの返し方(DTO→response_model→JSONResponse)と同じJSON化
+    return json.dumps([d.model_dump() for d in dtos], ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def test_encoded_bytes_match_dto_path():
+    dtos = [ItemReadDTO(item_id=i.id, item_name=i.name, category_ids=i.category_ids) for i in ITEMS]
+    assert encode_items(ITEMS) == dto_json(dtos)
+    categories = [Category(1, "果物"), Category(2, "野菜")]
+    assert encode_categories(categories) == dto_json([CategoryReadDTO(category_id=c.id, category_name=c.name) for c in categories])
+
+
+class FakeListItemsUseCase:
+    async def execute(self, after, limit, category_ids=None, match="any"):
+        return ITEMS, 3
+
+
+def test_list_keeps_headers_and_schema():
+    app.dependency_overrides[get_list_uc] = lambda: FakeListItemsUseCase()
+    try:
+        with TestClient(app) as client:
+            res = client.get("/items/")
+            assert res.status_code == 200
+            assert res.headers["content-type"] == "application/json"
+            assert res.headers[NEXT_CURSOR_HEADER] == encode_cursor(3)
+            assert res.content == encode_items(ITEMS)
+            # OpenAPIのスキーマはresponse_modelのまま
+            schema = client.get("/openapi.json").json()["paths"]["/items/"]["get"]["responses"]["200"]
+            assert schema["content"]["application/json"]["schema"]["items"] == {"$ref": "#/components/schemas/ItemReadDTO"}
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,17 @@
+# fastapi/tests/test_pagination.py
+import pytest
+from fastapi import HTTPException
+
+from app.routers.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_roundtrip():
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor(None) is None
+
+
+@pytest.mark.parametrize("cursor", ["", "abc", encode_cursor(1)[:-2] + "!!"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
@@ -0,0 +1,46 @@
+# fastapi/tests/test_pool_metrics.py
+import asyncio
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+from app.db.database import create_db_engine
+from app.db.pool_metrics import PoolMetrics, measured_pool_class
+
+
+class FakeDBAPIConnection:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_engine_factory_applies_pool_settings():
+    engine = create_db_engine("postgresql+asyncpg://u:p@localhost/db", PoolMetrics(), pool_size=3, max_overflow=2, pool_timeout=1.5)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 2
+    assert engine.pool._timeout == 1.5
+    assert engine.echo is False
+
+
+def test_measured_pool_counts_checkouts_connects_and_timeouts():
+    metrics = PoolMetrics()
+    pool = measured_pool_class(metrics)(FakeDBAPIConnection, pool_size=1, max_overflow=0, timeout=0.01)
+
+    def scenario():
+        first = pool.connect()
+        # プールが1つだけなので、返すまでは次の取り出しがタイムアウトする
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+        assert metrics.stats(pool)["checked_out"] == 1
+        first.close()
+        pool.connect().close()
+
+    asyncio.run(greenlet_spawn(scenario))
+    stats = metrics.stats(pool)
+    assert stats["checkouts"] == 2
+    assert stats["connects"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["checked_out"] == 0
@@ -0,0 +1,147 @@
+# fastapi/tests/test_query_budget.py
+# ルートごとに、1リクエストで実行してよいSQLの数(クエリの予算)を決めておき、超えたらテストを失敗させる
+# (N+1や、読み直し・確認のためのSELECTが紛れ込んだら、機能のバグと同じようにpytestで気づけるようにする)
+# 予算はDBの行数によらない上限。一覧は1件でも上限件数でも同じ数になることも確認する
+# 新しいルートを追加したら、QUERY_BUDGETSにも予算を書く(書かないとtest_every_route_has_a_budgetが失敗する)
+import time
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.db.database import AsyncSessionLocal
+from app.main import app
+from app.routers.etag import make_etag
+from app.routers.pagination import MAX_PAGE_SIZE
+from app.settings import REPOSITORY_BACKEND
+
+# (メソッド, ルートのパス) → 1リクエストで実行してよいSQLの数
+# 書き込みのルートの予算には、commit直前のpg_notify(キャッシュ無効化の通知)の1文を含む
+QUERY_BUDGETS = {
+    ("GET", "/"): 0,
+    ("GET", "/items/"): 1,
+    ("POST", "/items/"): 4,            # ID予約(予約が尽きたときだけ) + items + item_category + pg_notify
+    ("POST", "/items/bulk"): 5,        # ID予約 + items + item_category(1000行ごと) + カタログにないカテゴリの確認 + pg_notify
+    ("DELETE", "/items/"): 2,
+    ("GET", "/items/search"): 1,
+    ("GET", "/items/export"): 1,
+    ("GET", "/items/{item_id}"): 1,
+    ("PUT", "/items/{item_id}"): 3,    # UPDATE ... RETURNING + カテゴリの差し替え(1文) + pg_notify
+    ("PATCH", "/items/{item_id}"): 3,
+    ("PUT", "/items/{item_id}/name_body"): 2,
+    ("PUT", "/items/{item_id}/name_dto"): 2,
+    ("DELETE", "/items/{item_id}"): 2,
+    ("GET", "/categories/"): 1,
+    ("POST", "/categories/"): 3,
+    ("GET", "/categories/{category_id}"): 1,
+    ("PUT", "/categories/{category_id}"): 2,   # UPDATE ... RETURNING + pg_notify
+    ("GET", "/categories/{category_id}/items"): 2,
+    ("GET", "/internal/cache"): 0,
+    ("GET", "/internal/loader"): 0,
+    ("GET", "/internal/db/pool"): 0,
+    ("GET", "/internal/db/uow"): 0,
+    ("GET", "/metrics"): 0,
+}
+
+SEED_CATEGORIES = 3
+SEED_ITEMS = 600
+
+
+def test_every_route_has_a_budget():
+    routes = {(method, route.path) for route in app.routes if isinstance(route, APIRoute) for method in route.methods}
+    assert routes - QUERY_BUDGETS.keys() == set()
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    # カテゴリSEED_CATEGORIES個と、それぞれ1〜2個のカテゴリに属するItemをSEED_ITEMS件作る(最後に削除する)
+    if REPOSITORY_BACKEND != "sqlalchemy":
+        pytest.skip("SQL is counted through the SQLAlchemy engine")
+    prefix = f"budget-{time.time_ns()}-"
+    with TestClient(app) as client:
+        category_ids = [
+            client.post("/categories/", json={"category_name": f"{prefix}c{i}"}).json()["category_id"]
+            for i in range(SEED_CATEGORIES)
+        ]
+        res = client.post("/items/bulk", json=[
+            {"item_name": f"{prefix}{i}", "category_ids": [category_ids[i % SEED_CATEGORIES], category_ids[(i + 1) % SEED_CATEGORIES]][:1 + i % 2]}
+            for i in range(SEED_ITEMS)
+        ])
+        item_ids = [item["item_id"] for item in res.json()["created"]]
+        data = {"client": client, "prefix": prefix, "category_ids": category_ids, "item_ids": item_ids}
+        try:
+            yield data
+        finally:
+            client.portal.call(cleanup, prefix)
+
+
+async def cleanup(prefix: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("DELETE FROM items WHERE item_name LIKE :p"), {"p": prefix + "%"})
+        await db.execute(text("DELETE FROM categories WHERE category_name LIKE :p"), {"p": prefix + "%"})
+        await db.commit()
+
+
+def request_within_budget(seeded, statements, method: str, route: str, url: str, **kwargs):
+    statements.clear()
+    res = seeded["client"].request(method, url, **kwargs)
+    assert res.status_code < 400, res.text
+    budget = QUERY_BUDGETS[(method, route)]
+    assert len(statements) <= budget, f"{method} {route}: {len(statements)} queries (budget {budget})\n" + "\n---\n".join(statements)
+    return res, len(statements)
+
+
+def test_read_routes_within_budget(seeded, executed_statements):
+    item_ids, category_ids = seeded["item_ids"], seeded["category_ids"]
+    item_id = item_ids[0]
+    cases = [
+        ("GET", "/", "/", {}),
+        ("GET", "/items/", "/items/", {"params": {"limit": MAX_PAGE_SIZE}}),
+        ("GET", "/items/", "/items/", {"params": {"ids": ",".join(map(str, item_ids[:MAX_PAGE_SIZE]))}}),
+        ("GET", "/items/", "/items/", {"params": {"category_ids": f"{category_ids[0]},{category_ids[1]}", "match": "all"}}),
+        ("GET", "/items/", "/items/", {"params": {"category_ids": f"{category_ids[0]},{category_ids[1]}"}}),   # match=any(デフォルト)
+        ("GET", "/items/search", "/items/search", {"params": {"q": seeded["prefix"], "mode": "prefix", "limit": 100}}),
+        ("GET", "/items/search", "/items/search", {"params": {"q": seeded["prefix"] + "1", "mode": "fuzzy"}}),
+        ("GET", "/items/export", "/items/export", {}),
+        ("GET", "/items/{item_id}", f"/items/{item_id}", {}),
+        ("GET", "/items/{item_id}", f"/items/{item_id}", {"headers": {"If-None-Match": make_etag("item", item_id, 1)}}),
+        ("GET", "/categories/", "/categories/", {}),
+        ("GET", "/categories/{category_id}", f"/categories/{category_ids[0]}", {}),
+        ("GET", "/categories/{category_id}/items", f"/categories/{category_ids[0]}/items", {"params": {"limit": MAX_PAGE_SIZE}}),
+        *(("GET", path, path, {}) for path in ("/internal/cache", "/internal/loader", "/internal/db/pool", "/internal/db/uow", "/metrics")),
+    ]
+    for method, route, url, kwargs in cases:
+        request_within_budget(seeded, executed_statements, method, route, url, **kwargs)
+
+
+def test_list_query_count_does_not_depend_on_rows(seeded, executed_statements):
+    for route, url in (("/items/", "/items/"), ("/categories/{category_id}/items", f"/categories/{seeded['category_ids'][0]}/items")):
+        counts = {
+            limit: request_within_budget(seeded, executed_statements, "GET", route, url, params={"limit": limit})[1]
+            for limit in (1, MAX_PAGE_SIZE)
+        }
+        assert counts[1] == counts[MAX_PAGE_SIZE], f"{route}: {counts}"
+
+
+def test_write_routes_within_budget(seeded, executed_statements):
+    prefix, category_ids = seeded["prefix"], seeded["category_ids"]
+    item_id, other_id, *_ = seeded["item_ids"][-3:]
+    category_id = category_ids[0]
+    cases = [
+        ("POST", "/items/", "/items/", {"json": {"item_name": f"{prefix}new", "category_ids": category_ids}}),
+        ("POST", "/items/bulk", "/items/bulk", {"json": [{"item_name": f"{prefix}bulk{i}", "category_ids": category_ids[:2]} for i in range(100)]}),
+        ("PUT", "/items/{item_id}", f"/items/{item_id}", {"json": {"item_name": f"{prefix}put", "category_ids": category_ids[1:]}}),
+        ("PATCH", "/items/{item_id}", f"/items/{item_id}", {"json": {"category_ids": category_ids[:1]}}),
+        ("PATCH", "/items/{item_id}", f"/items/{item_id}", {"json": {"item_name": f"{prefix}patch"}}),
+        ("PUT", "/items/{item_id}/name_body", f"/items/{item_id}/name_body", {"json": {"new_name": f"{prefix}body"}}),
+        ("PUT", "/items/{item_id}/name_dto", f"/items/{item_id}/name_dto", {"json": {"item_name": f"{prefix}dto"}}),
+        ("DELETE", "/items/{item_id}", f"/items/{item_id}", {}),
+        ("DELETE", "/items/", "/items/", {"params": {"ids": f"{other_id},{item_id}"}}),
+        ("POST", "/categories/", "/categories/", {"json": {"category_name": f"{prefix}new"}}),
+        ("PUT", "/categories/{category_id}", f"/categories/{category_id}", {"json": {"category_name": f"{prefix}c0-renamed"}}),
+        ("PUT", "/categories/{category_id}", f"/categories/{category_id}",
+         {"json": {"category_name": f"{prefix}c0-etag"}, "headers": {"If-Match": make_etag("category", category_id, 2)}}),
+    ]
+    for method, route, url, kwargs in cases:
+        request_within_budget(seeded, executed_statements, method, route, url, **kwargs)
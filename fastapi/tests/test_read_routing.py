@@ -0,0 +1,78 @@
+# fastapi/tests/test_read_routing.py
+import time
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.db import read_routing, unit_of_work
+from app.db.read_routing import LAST_WRITE_COOKIE, LAST_WRITE_HEADER, ReadYourWritesMiddleware, is_sticky, use_replica
+from app.db.unit_of_work import UnitOfWork, get_uow
+
+
+def make_request(headers: dict[str, str]) -> Request:
+    return Request({"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+
+def test_recent_writer_is_sticky_to_primary():
+    now = time.time()
+    assert not is_sticky(make_request({}), now)
+    assert is_sticky(make_request({LAST_WRITE_HEADER: str(now - 1)}), now)
+    assert is_sticky(make_request({"Cookie": f"{LAST_WRITE_COOKIE}={now - 1}"}), now)
+    assert not is_sticky(make_request({LAST_WRITE_HEADER: str(now - 3600)}), now)
+    assert not is_sticky(make_request({LAST_WRITE_HEADER: "garbage"}), now)
+
+
+def test_replica_is_used_only_when_configured_and_not_sticky(monkeypatch):
+    monkeypatch.setattr(read_routing, "ReplicaSessionLocal", None)
+    assert not use_replica(make_request({}))
+
+    monkeypatch.setattr(read_routing, "ReplicaSessionLocal", object())
+    assert use_replica(make_request({}))
+    assert not use_replica(make_request({LAST_WRITE_HEADER: str(time.time())}))
+
+
+class NothingToCommitSession:
+    # get_uowが使う部分だけ(トランザクションは始まっていない)
+    sync_session = type("SyncSession", (), {"info": {}})()
+
+    def in_transaction(self):
+        return False
+
+    async def rollback(self):
+        pass
+
+
+def test_only_committed_2xx_writes_are_marked(monkeypatch):
+    monkeypatch.setattr(read_routing, "ReplicaSessionLocal", object())
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    async def fake_db():
+        yield NothingToCommitSession()
+
+    app.dependency_overrides[unit_of_work.get_db] = fake_db
+
+    @app.post("/ok")
+    async def ok(uow: UnitOfWork = Depends(get_uow)):
+        return {}
+
+    @app.post("/failed")
+    async def failed(uow: UnitOfWork = Depends(get_uow)):
+        raise HTTPException(409)
+
+    @app.post("/not-2xx")
+    async def not_2xx(uow: UnitOfWork = Depends(get_uow)):
+        return JSONResponse({}, status_code=422)
+
+    client = TestClient(app)
+    before = time.time()
+    res = client.post("/ok")
+    # 時刻はcommitの後に取る
+    assert float(res.headers[LAST_WRITE_HEADER]) >= before
+    assert LAST_WRITE_COOKIE in res.headers["set-cookie"]
+    for path in ("/failed", "/not-2xx"):
+        res = client.post(path)
+        assert LAST_WRITE_HEADER not in res.headers
+        assert "set-cookie" not in res.headers
@@ -0,0 +1,69 @@
+# fastapi/tests/test_repository_cache.py
+import asyncio
+
+from app.domain.category import Category
+from app.domain.items import Item
+from app.infrastructure.cache import CachedCategoryRepository, CachedItemRepository, LRUTTLCache, RepositoryCaches
+
+
+class FakeItemRepository:
+    def __init__(self, items):
+        self.items = {item.id: item for item in items}
+        self.get_calls = 0
+
+    async def get_by_id(self, item_id):
+        self.get_calls += 1
+        item = self.items.get(item_id)
+        return Item(item.id, item.name, list(item.category_ids or [])) if item else None
+
+    async def update(self, item, expected_version=None):
+        self.items[item.id] = item
+
+
+class FakeCategoryRepository:
+    async def update(self, category, expected_version=None):
+        pass
+
+
+def test_lru_ttl_cache_eviction_and_expiry():
+    now = [0.0]
+    cache = LRUTTLCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.set(1, "a")
+    cache.set(2, "b")
+    assert cache.get(1) == "a"
+    cache.set(3, "c")  # 一番使われていない2が追い出される
+    assert cache.get(2) is None
+    now[0] = 11
+    assert cache.get(1) is None
+    assert cache.stats() == {
+        "size": 1, "max_entries": 2, "ttl_seconds": 10,
+        "hits": 1, "misses": 2, "evictions": 1, "expirations": 1, "invalidations": 0,
+    }
+
+
+def test_cached_item_repository_read_through_and_invalidation():
+    inner = FakeItemRepository([Item(1, "a", [10]), Item(2, "b", [20])])
+    caches = RepositoryCaches(max_entries=10, ttl_seconds=60)
+    published = []
+    repo = CachedItemRepository(inner, caches, publish=lambda kind, ids: published.append((kind, ids)))  # type: ignore[arg-type]
+    category_repo = CachedCategoryRepository(FakeCategoryRepository(), caches)  # type: ignore[arg-type]
+
+    async def scenario():
+        item = await repo.get_by_id(1)
+        assert item is not None
+        item.name = "changed"  # 取得したItemを書き換えてもキャッシュには影響しない
+        assert (await repo.get_by_id(1)).name == "a"  # type: ignore[union-attr]
+        assert inner.get_calls == 1
+
+        await repo.update(Item(1, "new", [10]))
+        assert published == [("item", [1])]
+        assert (await repo.get_by_id(1)).name == "new"  # type: ignore[union-attr]
+        assert inner.get_calls == 2
+
+        await repo.get_by_id(2)
+        await category_repo.update(Category(10, "cat"))  # カテゴリ10を参照するItem 1だけ消える
+        await repo.get_by_id(1)
+        await repo.get_by_id(2)
+        assert inner.get_calls == 4
+
+    asyncio.run(scenario())
@@ -0,0 +1,203 @@
+# fastapi/tests/test_repository_contract.py
+# ②の抽象リポジトリの約束ごと。SQLAlchemy版・asyncpg版・メモリ内版のすべてで同じテストを実行する
+# 各テストは1つのトランザクションの中で行い、最後にロールバックする(DBには何も残さない。メモリ内版はテストごとに空の置き場を使う)
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import asyncpg
+import pytest
+
+from app.db.database import DATABASE_URL, AsyncSessionLocal
+from app.domain.category import Category
+from app.domain.items import Item
+from app.infrastructure.asyncpg import AsyncpgCategoryRepository, AsyncpgItemRepository
+from app.infrastructure.asyncpg.pool import fixed_connection, to_asyncpg_dsn
+from app.infrastructure.memory import InMemoryCategoryRepository, InMemoryItemRepository, InMemoryStore
+from app.infrastructure.sqlalchemy.repositories.category_repo_impl import SQLAlchemyCategoryRepository
+from app.infrastructure.sqlalchemy.repositories.item_repo_impl import SQLAlchemyItemRepository
+from app.repository.exceptions import VersionConflictError
+
+MISSING_ID = 2_000_000_000
+
+
+@pytest.fixture(params=["sqlalchemy", "asyncpg", "memory"])
+def backend(request):
+    return request.param
+
+
+@asynccontextmanager
+async def open_repositories(backend: str):
+    if backend == "sqlalchemy":
+        async with AsyncSessionLocal() as db:
+            yield SQLAlchemyItemRepository(db), SQLAlchemyCategoryRepository(db)
+            await db.rollback()
+    elif backend == "memory":
+        store = InMemoryStore()
+        yield InMemoryItemRepository(store), InMemoryCategoryRepository(store)
+    else:
+        conn = await asyncpg.connect(to_asyncpg_dsn(DATABASE_URL))
+        try:
+            transaction = conn.transaction()
+            await transaction.start()
+            yield AsyncpgItemRepository(fixed_connection(conn)), AsyncpgCategoryRepository(fixed_connection(conn))
+            await transaction.rollback()
+        finally:
+            await conn.close()
+
+
+def run(backend: str, scenario):
+    async def main():
+        async with open_repositories(backend) as (items, categories):
+            await scenario(items, categories)
+    asyncio.run(main())
+
+
+async def create_category(categories, name: str) -> Category:
+    category = Category(await categories.next_identifier(), f"{name}-{uuid.uuid4().hex[:8]}")
+    await categories.save(category)
+    return category
+
+
+async def create_item(items, name: str, category_ids: list[int]) -> Item:
+    item = Item(await items.next_identifier(), name, category_ids)
+    await items.save(item)
+    return item
+
+
+def test_save_and_get(backend):
+    async def scenario(items, categories):
+        c1 = await create_category(categories, "contract")
+        a = await create_item(items, "contract-a", [c1.id, c1.id, MISSING_ID])
+        # 存在しないカテゴリIDは紐づけず、重複は1つにまとめる
+        assert a.category_ids == [c1.id]
+        b = await create_item(items, "contract-b", [])
+
+        got = await items.get_by_id(a.id)
+        assert (got.id, got.name, got.category_ids, got.version) == (a.id, "contract-a", [c1.id], 1)
+        assert (await items.get_by_id(b.id)).category_ids == []
+        assert await items.get_by_id(MISSING_ID) is None
+        assert [i.id for i in await items.get_many([b.id, a.id, MISSING_ID, b.id])] == [b.id, a.id]
+        assert await items.get_version(a.id) == 1
+        assert await items.get_version(MISSING_ID) is None
+    run(backend, scenario)
+
+
+def test_save_many(backend):
+    async def scenario(items, categories):
+        c1 = await create_category(categories, "contract")
+        ids = await items.next_identifiers(3)
+        assert len(set(ids)) == 3
+        new = [Item(ids[0], "contract-x", [c1.id, MISSING_ID]), Item(ids[1], "contract-y", None), Item(ids[2], "contract-z", [c1.id])]
+        await items.save_many(new)
+        assert [i.category_ids for i in new] == [[c1.id], [], [c1.id]]
+        assert [(i.id, i.category_ids) for i in await items.get_many(ids)] == [(ids[0], [c1.id]), (ids[1], []), (ids[2], [c1.id])]
+    run(backend, scenario)
+
+
+def test_list_and_filters(backend):
+    async def scenario(items, categories):
+        c1 = await create_category(categories, "contract")
+        c2 = await create_category(categories, "contract")
+        a = await create_item(items, "contract-a", [c1.id, c2.id])
+        b = await create_item(items, "contract-b", [c1.id])
+        await create_item(items, "contract-c", [])
+
+        assert [i.id for i in await items.list_all(category_ids=[c1.id])] == [a.id, b.id]
+        assert [i.id for i in await items.list_all(category_ids=[c1.id, c2.id], match="all")] == [a.id]
+        assert [i.id for i in await items.list_all(category_ids=[c1.id, c2.id], match="all", after=a.id)] == []
+        assert [i.id for i in await items.list_all(category_ids=[c1.id], limit=1)] == [a.id]
+        assert [i.id for i in await items.list_all(category_ids=[c1.id], after=a.id)] == [b.id]
+        page = await items.list_all(after=a.id - 1, limit=2)
+        assert [(i.id, i.category_ids) for i in page] == [(a.id, sorted([c1.id, c2.id])), (b.id, [c1.id])]
+
+        assert [i.id for i in await items.list_by_category(c1.id)] == [a.id, b.id]
+        by_category = await items.list_by_category(c1.id, after=a.id, limit=10)
+        # 絞り込みに使ったカテゴリだけでなく、そのItemのカテゴリIDをすべて返す
+        assert [(i.id, i.category_ids) for i in by_category] == [(b.id, [c1.id])]
+        assert [(i.id, i.category_ids) for i in await items.list_by_category(c2.id)] == [(a.id, sorted([c1.id, c2.id]))]
+    run(backend, scenario)
+
+
+def test_search_by_name(backend):
+    async def scenario(items, categories):
+        token = f"contract{uuid.uuid4().hex[:8]}"
+        a = await create_item(items, f"{token} apple", [])
+        b = await create_item(items, f"{token} apricot", [])
+        c = await create_item(items, f"{token}_x", [])
+
+        assert [i.id for i in await items.search_by_name(f"{token} ap", "prefix", 10)] == [a.id, b.id]
+        assert [i.id for i in await items.search_by_name(f"{token} ap", "prefix", 1)] == [a.id]
+        # 「_」はLIKEのワイルドカードとしては扱わない
+        assert [i.id for i in await items.search_by_name(f"{token}_", "prefix", 10)] == [c.id]
+        assert (await items.search_by_name(f"{token} apple", "fuzzy", 10))[0].id == a.id
+    run(backend, scenario)
+
+
+def test_update_and_patch(backend):
+    async def scenario(items, categories):
+        c1 = await create_category(categories, "contract")
+        c2 = await create_category(categories, "contract")
+        a = await create_item(items, "contract-a", [c1.id])
+
+        # 名前だけの一部更新ではカテゴリは変わらない
+        patched, rejected = await items.patch(a.id, name="contract-a2")
+        assert (patched.name, patched.category_ids, patched.version, rejected) == ("contract-a2", [c1.id], 2, [])
+
+        patched, rejected = await items.patch(a.id, category_ids=[c2.id, MISSING_ID], expected_version=2)
+        assert (patched.name, patched.category_ids, patched.version, rejected) == ("contract-a2", [c2.id], 3, [MISSING_ID])
+
+        item = Item(a.id, "contract-a3", [c1.id, c2.id])
+        assert await items.update(item, expected_version=3) == []
+        assert (item.category_ids, item.version) == ([c1.id, c2.id], 4)
+        got = await items.get_by_id(a.id)
+        assert (got.name, got.category_ids, got.version) == ("contract-a3", [c1.id, c2.id], 4)
+
+        with pytest.raises(VersionConflictError) as conflict:
+            await items.patch(a.id, name="stale", expected_version=3)
+        assert conflict.value.current_version == 4
+        with pytest.raises(ValueError):
+            await items.update(Item(MISSING_ID, "missing", []))
+        with pytest.raises(ValueError):
+            await items.patch(MISSING_ID, name="missing", expected_version=1)
+    run(backend, scenario)
+
+
+def test_delete(backend):
+    async def scenario(items, categories):
+        a = await create_item(items, "contract-a", [])
+        b = await create_item(items, "contract-b", [])
+        c = await create_item(items, "contract-c", [])
+
+        with pytest.raises(VersionConflictError):
+            await items.delete(a.id, expected_version=2)
+        await items.delete(a.id, expected_version=1)
+        assert await items.get_by_id(a.id) is None
+        with pytest.raises(ValueError):
+            await items.delete(a.id)
+
+        assert await items.delete_many([c.id, MISSING_ID, b.id, c.id]) == [c.id, b.id]
+        assert await items.delete_many([b.id]) == []
+    run(backend, scenario)
+
+
+def test_category_repository(backend):
+    async def scenario(items, categories):
+        category = await create_category(categories, "contract")
+        got = await categories.get_by_id(category.id)
+        assert (got.id, got.name, got.version) == (category.id, category.name, 1)
+        assert await categories.get_by_id(MISSING_ID) is None
+        assert [c.id for c in await categories.list_all(after=category.id - 1, limit=1)] == [category.id]
+
+        category.name = category.name + "-renamed"
+        await categories.update(category, expected_version=1)
+        assert category.version == 2
+        assert (await categories.get_by_id(category.id)).name == category.name
+        with pytest.raises(VersionConflictError):
+            await categories.update(category, expected_version=1)
+        # 存在しないカテゴリの更新はValueError(Itemと同じ)
+        with pytest.raises(ValueError):
+            await categories.update(Category(MISSING_ID, "missing"))
+        with pytest.raises(ValueError):
+            await categories.update(Category(MISSING_ID, "missing"), expected_version=1)
+    run(backend, scenario)
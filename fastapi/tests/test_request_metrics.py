@@ -0,0 +1,49 @@
+# fastapi/tests/test_request_metrics.py
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.db.query_timing import current_timing, end_request_timing, instrument_engine, record_pool_wait, start_request_timing
+from app.domain.items.item import Item
+from app.main import app
+from app.routers.items import get_list_uc
+
+
+def test_engine_events_count_queries_of_current_request():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.connect() as conn:
+        # リクエストの外で実行したSQLは数えない
+        conn.execute(text("SELECT 1"))
+        timing, token = start_request_timing()
+        try:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+            record_pool_wait(0.5)
+        finally:
+            end_request_timing(token)
+    assert current_timing() is None
+    assert timing.queries == 2
+    assert timing.db_seconds > 0
+    assert timing.pool_wait_seconds == 0.5
+
+
+class FakeListItemsUseCase:
+    async def execute(self, after, limit, category_ids=None, match="any"):
+        return [Item(1, "apple", [])], None
+
+
+def test_server_timing_header_and_metrics():
+    app.dependency_overrides[get_list_uc] = lambda: FakeListItemsUseCase()
+    try:
+        with TestClient(app) as client:
+            res = client.get("/items/")
+            assert res.status_code == 200
+            metrics = [m.split(";")[0] for m in res.headers["Server-Timing"].split(", ")]
+            assert metrics == ["db", "pool", "handler"]
+
+            body = client.get("/metrics").text
+            assert 'http_request_duration_seconds_count{method="GET",route="/items/"}' in body
+            assert 'http_request_duration_seconds_bucket{method="GET",route="/items/",le="+Inf"}' in body
+            assert 'http_request_db_queries_total{method="GET",route="/items/"} 0' in body
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,162 @@
+# fastapi/tests/test_unit_of_work.py
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.db.unit_of_work import UnitOfWork, get_uow, uow_metrics
+from app.domain.category import Category
+from app.domain.items import Item
+from app.infrastructure.cache import CachedCategoryRepository, CachedItemRepository, CategoryCatalog, CategorySnapshot, RepositoryCaches
+from app.infrastructure.sqlalchemy.repositories.item_repo_impl import SQLAlchemyItemRepository
+
+
+class FakeSyncSession:
+    def __init__(self):
+        self.info = {}
+
+
+class FakeSession:
+    # AsyncSessionのうち、UnitOfWorkとリポジトリが使う部分だけ
+    def __init__(self):
+        self.sync_session = FakeSyncSession()
+        self.calls = []
+        self.started = False
+
+    def in_transaction(self):
+        return self.started
+
+    async def execute(self, stmt):
+        self.started = True
+        self.calls.append("execute")
+        return FakeResult()
+
+    async def commit(self):
+        self.calls.append("commit")
+        self.sync_session.info["commit_count"] = self.sync_session.info.get("commit_count", 0) + 1
+        self.started = False
+
+    async def rollback(self):
+        self.calls.append("rollback")
+        self.started = False
+
+
+class FakeResult:
+    def scalars(self):
+        return self
+
+    def all(self):
+        return [1, 2]
+
+
+def run_request(session, endpoint, request=None):
+    async def scenario():
+        dependency = get_uow(request or Request({"type": "http", "headers": []}), session)
+        uow = await dependency.__anext__()
+        try:
+            await endpoint(uow)
+        except Exception as e:
+            with pytest.raises(type(e)):
+                await dependency.athrow(e)
+        else:
+            with pytest.raises(StopAsyncIteration):
+                await dependency.__anext__()
+    asyncio.run(scenario())
+
+
+def test_repository_writes_are_committed_once_per_request():
+    session = FakeSession()
+
+    async def endpoint(uow: UnitOfWork):
+        repo = SQLAlchemyItemRepository(uow.session)
+        await repo.save_many([Item(1, "a"), Item(2, "b")])
+        await repo.delete_many([1, 2])
+
+    before = uow_metrics.requests
+    run_request(session, endpoint)
+    assert session.calls.count("commit") == 1
+    assert session.calls[-1] == "commit"
+    assert uow_metrics.requests == before + 1
+
+
+def test_error_rolls_back_everything():
+    session = FakeSession()
+
+    async def endpoint(uow: UnitOfWork):
+        await SQLAlchemyItemRepository(uow.session).delete_many([1, 2])
+        raise RuntimeError("boom")
+
+    run_request(session, endpoint)
+    assert "commit" not in session.calls
+    assert session.calls[-1] == "rollback"
+
+
+def test_read_only_request_does_not_commit():
+    session = FakeSession()
+
+    async def endpoint(uow: UnitOfWork):
+        pass
+
+    run_request(session, endpoint)
+    assert session.calls == []
+
+
+class FakeCategoryRepository:
+    async def save(self, category):
+        pass
+
+
+def test_category_catalog_is_updated_only_after_commit():
+    async def no_reload():
+        return []
+
+    for fails in (False, True):
+        session = FakeSession()
+        catalog = CategoryCatalog(no_reload)
+        catalog.snapshot = CategorySnapshot(1, [Category(1, "a")])
+        caches = RepositoryCaches(category_catalog=catalog)
+
+        async def endpoint(uow: UnitOfWork):
+            repo = CachedCategoryRepository(FakeCategoryRepository(), caches, on_commit=uow.after_commit)  # type: ignore[arg-type]
+            await repo.save(Category(2, "b"))
+            # commitするまではカタログに入れない
+            assert catalog.known_ids({2}) == set()
+            if fails:
+                raise RuntimeError("boom")
+
+        run_request(session, endpoint)
+        # ロールバックしたカテゴリはカタログに残らない
+        assert catalog.known_ids({2}) == (set() if fails else {2})
+
+
+class UncommittedItemRepository:
+    # updateしても、commitまでは他のリクエストから古い行(committed)が見える
+    def __init__(self, committed: Item):
+        self.committed = committed
+
+    async def get_by_id(self, item_id):
+        return Item(self.committed.id, self.committed.name, list(self.committed.category_ids or []))
+
+    async def update(self, item, expected_version=None):
+        return []
+
+
+def test_item_cache_is_invalidated_again_after_commit():
+    for fails in (False, True):
+        session = FakeSession()
+        caches = RepositoryCaches()
+        inner = UncommittedItemRepository(Item(1, "old", [10]))
+
+        async def endpoint(uow: UnitOfWork):
+            repo = CachedItemRepository(inner, caches, on_commit=uow.after_commit)  # type: ignore[arg-type]
+            await repo.update(Item(1, "new", [10]))
+            assert caches.items.get(1) is None
+            # commitまでの間に、同じワーカーの別のリクエストが古い行を読んでキャッシュに入れる
+            await CachedItemRepository(inner, caches).get_by_id(1)  # type: ignore[arg-type]
+            assert caches.items.get(1) is not None
+            if fails:
+                raise RuntimeError("boom")
+
+        run_request(session, endpoint)
+        # commitできたら古い内容は消える。ロールバックしたときはDBの行が変わっていないので、そのままでよい
+        assert (caches.items.get(1) is None) is not fails
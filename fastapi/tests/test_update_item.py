@@ -0,0 +1,137 @@
+# fastapi/tests/test_update_item.py
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.domain.items import Item
+from app.infrastructure.sqlalchemy.repositories.item_repo_impl import _replace_categories_statement
+from app.main import app
+from app.routers.items import get_delete_many_uc, get_patch_uc, get_update_name_uc
+from app.usecases.item.create_item import CreateItemUseCase
+from app.usecases.item.delete_items import DeleteItemsUseCase
+from app.usecases.item.patch_item import PatchItemUseCase
+from app.usecases.item.update_item import UpdateItemUseCase
+from app.usecases.item.update_item_name import UpdateItemNameUseCase
+
+
+class FakeItemRepository:
+    def __init__(self, existing_item_ids, existing_category_ids):
+        self.existing_item_ids = existing_item_ids
+        self.existing_category_ids = existing_category_ids
+        self.calls = []
+
+    async def get_by_id(self, item_id):
+        self.calls.append("get_by_id")
+
+    async def update(self, item, expected_version=None):
+        self.calls.append("update")
+        if item.id not in self.existing_item_ids:
+            raise ValueError("not found")
+        requested = item.category_ids or []
+        item.category_ids = [c for c in requested if c in self.existing_category_ids]
+        item.version = 2
+        return [c for c in requested if c not in self.existing_category_ids]
+
+    async def patch(self, item_id, name=None, category_ids=None, expected_version=None):
+        self.calls.append("patch")
+        if item_id not in self.existing_item_ids:
+            raise ValueError("not found")
+        return Item(item_id, name, [], version=2), []
+
+    async def next_identifier(self):
+        self.calls.append("next_identifier")
+        return 1
+
+    async def save(self, item):
+        self.calls.append("save")
+
+
+def test_update_does_not_load_item_first_and_reports_rejected_categories():
+    repo = FakeItemRepository({1}, {10, 20})
+    item, rejected = asyncio.run(UpdateItemUseCase(repo).execute(1, " ｐｅｎ ", [10, 99, 20]))
+    assert repo.calls == ["update"]
+    assert item.name == "pen"
+    assert item.category_ids == [10, 20]
+    assert rejected == [99]
+
+
+def test_update_missing_item_returns_none():
+    repo = FakeItemRepository(set(), set())
+    assert asyncio.run(UpdateItemUseCase(repo).execute(1, "pen", [])) is None
+
+
+@pytest.mark.parametrize("write", [
+    lambda repo, name: CreateItemUseCase(repo).execute(name, []),
+    lambda repo, name: UpdateItemUseCase(repo).execute(1, name, []),
+    lambda repo, name: PatchItemUseCase(repo).execute(1, name, None),
+    lambda repo, name: UpdateItemNameUseCase(repo).execute(1, name),
+])
+def test_every_write_path_validates_the_normalized_name(write):
+    # 空白だけの名前・正規化で200文字を超える名前は、リポジトリを呼ぶ前にValueError
+    for name in ("  \u3000 ", "㍿" * 200):
+        repo = FakeItemRepository({1}, set())
+        with pytest.raises(ValueError):
+            asyncio.run(write(repo, name))
+        assert repo.calls == []
+
+
+def test_update_name_route_tells_invalid_name_from_missing_item():
+    app.dependency_overrides[get_update_name_uc] = lambda: UpdateItemNameUseCase(FakeItemRepository({1}, set()))
+    try:
+        client = TestClient(app)
+        assert client.put("/items/1/name_body", json={"new_name": "   "}).status_code == 422
+        assert client.put("/items/2/name_body", json={"new_name": "pen"}).status_code == 404
+        res = client.put("/items/1/name_dto", json={"item_name": " ｐｅｎ "})
+    finally:
+        app.dependency_overrides.clear()
+    assert res.status_code == 200
+    assert res.json()["item_name"] == "pen"
+
+
+def test_category_diff_is_one_statement():
+    sql = str(_replace_categories_statement(1, [10, 20]).compile(dialect=postgresql.dialect()))
+    # 存在するカテゴリだけを対象に、外れたものだけ削除し、増えたものだけ追加する
+    assert sql.count("DELETE FROM item_category") == 1
+    assert sql.count("INSERT INTO item_category") == 1
+    assert "ON CONFLICT DO NOTHING" in sql
+
+
+class FakePatchItemUseCase:
+    def __init__(self):
+        self.calls = []
+
+    async def execute(self, item_id, name, category_ids, expected_version=None):
+        self.calls.append((name, category_ids))
+        return Item(item_id, name or "old", category_ids if category_ids is not None else [1]), []
+
+
+@pytest.mark.parametrize("body, expected", [
+    ({"item_name": "new"}, ("new", None)),
+    ({"category_ids": None}, (None, [])),
+    ({"category_ids": [2, 3]}, (None, [2, 3])),
+])
+def test_patch_only_changes_sent_fields(body, expected):
+    uc = FakePatchItemUseCase()
+    app.dependency_overrides[get_patch_uc] = lambda: uc
+    try:
+        res = TestClient(app).patch("/items/1", json=body)
+    finally:
+        app.dependency_overrides.clear()
+    assert res.status_code == 200
+    assert uc.calls == [expected]
+
+
+class FakeDeleteManyRepository:
+    async def delete_many(self, item_ids):
+        return [item_id for item_id in item_ids if item_id < 10]
+
+
+def test_bulk_delete_reports_missing_ids():
+    app.dependency_overrides[get_delete_many_uc] = lambda: DeleteItemsUseCase(FakeDeleteManyRepository())
+    try:
+        res = TestClient(app).delete("/items/", params={"ids": "1,2,42"})
+    finally:
+        app.dependency_overrides.clear()
+    assert res.json() == {"deleted": [1, 2], "not_found": [42]}
@@ -2,6 +2,23 @@
 -- なお、publicスキーマはデフォルトで存在するものになるので、CREATE TABLE public.categoriesのように、publicスキーマを指定してテーブルを作成することは可能です。
 -- また、CREATE TABLE categoriesのようにpublicスキーマを省略しても、publicスキーマにテーブルが作成されるので、問題ないです。(public以外のスキーマを利用することはないので。)
 
+-- ID採番用のシーケンス
+-- アプリは「テーブルの最大ID+1」ではなく、このシーケンスのnextvalでIDを採番する(同時作成でもIDが重複しない)
+-- アプリ側で複数個まとめて予約(SELECT nextval(...) FROM generate_series(1, n))してメモリから払い出すので、INCREMENTは1のままでよい
+-- ※ 既存のDBに追加する場合は、シーケンス作成後に現在の最大IDまで進めておくこと
+--   SELECT setval('public.categories_category_id_seq', COALESCE((SELECT MAX(category_id) FROM public.categories), 0) + 1, false);
+--   SELECT setval('public.items_item_id_seq', COALESCE((SELECT MAX(item_id) FROM public.items), 0) + 1, false);
+-- ※ 既存のDBには、version列も追加すること
+--   ALTER TABLE public.categories ADD COLUMN "version" int4 NOT NULL DEFAULT 1;
+--   ALTER TABLE public.items ADD COLUMN "version" int4 NOT NULL DEFAULT 1;
+
+-- 名前のあいまい検索(GET /items/search?mode=fuzzy)に使う拡張
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE SEQUENCE public.categories_category_id_seq AS int4 START WITH 1 INCREMENT BY 1;
+CREATE SEQUENCE public.items_item_id_seq AS int4 START WITH 1 INCREMENT BY 1;
+
+
 -- public.categories definition
 
 -- Drop table
@@ -9,8 +26,9 @@
 -- DROP TABLE public.categories;
 
 CREATE TABLE public.categories (
-	category_id int4 NOT NULL,
+	category_id int4 NOT NULL DEFAULT nextval('public.categories_category_id_seq'),
 	category_name varchar NOT NULL,
+	"version" int4 NOT NULL DEFAULT 1, -- 更新のたびに+1する(ETagと楽観的排他制御に使う)
 	CONSTRAINT categories_pk PRIMARY KEY (category_id),
 	CONSTRAINT categoryies_unique UNIQUE (category_name)
 );
@@ -23,11 +41,24 @@ CREATE TABLE public.categories (
 -- DROP TABLE public.items;
 
 CREATE TABLE public.items (
-	item_id int4 NOT NULL,
+	item_id int4 NOT NULL DEFAULT nextval('public.items_item_id_seq'),
 	item_name varchar NOT NULL,
+	"version" int4 NOT NULL DEFAULT 1, -- 名前・カテゴリの更新のたびに+1する(ETagと楽観的排他制御に使う)
 	CONSTRAINT item_pk PRIMARY KEY (item_id)
 );
 
+-- 名前検索(GET /items/search)用
+-- アプリは検索語をItemName.search_keyで小文字にそろえ、lower(item_name)と比べるので、インデックスも同じ式に張る
+-- 前方一致(LIKE 'abc%')はCの照合順序のB-tree(ロケールに関係なく範囲検索に使える)、あいまい検索(%)はpg_trgmのGINを使う
+-- 前方一致は名前順(同じ名前はitem_id順)で先頭のlimit件を返すので、その並びのままインデックスから読めるようitem_idも入れる
+-- (text_pattern_opsのインデックスは範囲検索には使えるが、ORDER BYの並べ替えには使えない)
+CREATE INDEX items_item_name_prefix_idx ON public.items (lower(item_name) COLLATE "C", item_id);
+CREATE INDEX items_item_name_trgm_idx ON public.items USING gin (lower(item_name) gin_trgm_ops);
+
+
+ALTER SEQUENCE public.categories_category_id_seq OWNED BY public.categories.category_id;
+ALTER SEQUENCE public.items_item_id_seq OWNED BY public.items.item_id;
+
 
 -- public.item_category definition
 
@@ -41,4 +72,10 @@ CREATE TABLE public.item_category (
 	CONSTRAINT item_category_pk PRIMARY KEY (item_id, category_id),
 	CONSTRAINT item_category_categories_fk FOREIGN KEY (category_id) REFERENCES public.categories(category_id) ON DELETE CASCADE,
 	CONSTRAINT item_category_items_fk FOREIGN KEY (item_id) REFERENCES public.items(item_id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+-- カテゴリ→Itemの逆引き(GET /categories/{id}/items)用
+-- 主キー(item_id, category_id)は先頭がitem_idなので、category_idでの絞り込みには使えない
+-- (category_id, item_id)の順にすると、カテゴリで絞り込んだうえでitem_id順のページングまでインデックスだけで済む
+-- ※ 既存のDBには CREATE INDEX CONCURRENTLY で追加すると、作成中も書き込みを止めない
+CREATE INDEX item_category_category_id_item_id_idx ON public.item_category (category_id, item_id);
\ No newline at end of file